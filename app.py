@@ -1,38 +1,152 @@
-from flask import Flask, render_template, request, jsonify
+import time
+
+# Отсчет холодного старта - до импорта Flask и сервисов
+_STARTUP_BEGAN = time.perf_counter()
+
+from flask import Flask, Blueprint, Response, current_app, g, render_template, request, jsonify, url_for
 import os
-import json
-import logging
 import re
-import ast
+import sys
+import copy
+import logging
 from dotenv import load_dotenv
-from services.spell_checker import SpellChecker
 
 # Загружаем переменные окружения из .env файла
 load_dotenv()
 
 from config import Config
-from services.gigachat_service import GigaChatService
-from database.db_connection import Database
+from services.formatting import format_beautiful_text, has_proper_paragraphs
+from services.retrieval import canonical_topic, get_relevant_sections, get_topic_synonyms, check_textbook_coverage
+from services.theory_generation import generate_contextual_theory
+from services.question_generation import generate_contextual_test, quiz_id, remember_quiz
+from services.test_sessions import public_quiz, public_test_data
+from services.batch_grading import MAX_BATCH_SUBMISSIONS, answer_matrix, grade_batch
+from services.static_assets import (
+    IMMUTABLE_CACHE_CONTROL, StaticAssets, available_encodings, choose_encoding, compress, compress_variants,
+    content_digest
+)
+from services.singleflight import generation_flights
+from services.generation_supervisor import generation_supervisor
+from services.metrics import (
+    registry, latency_summary, llm_usage_summary, set_endpoint, reset_endpoint, set_topic, reset_topic,
+    start_llm_usage, finish_llm_usage
+)
+from services.providers import (
+    get_database, get_gigachat_service, get_job_queue, get_llm_cache, get_question_bank, get_spell_checker,
+    get_test_sessions, gigachat_breaker_state, gigachat_rate_limit_state, is_gigachat_available, reset_services
+)
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'digital-trainer-secret-2024'
-app.config.from_object(Config)
-
-# Инициализация сервисов
-try:
-    gigachat_service = GigaChatService()
-    db = Database()
-    GIGACHAT_AVAILABLE = True
-    logger.info("✅ GigaChat инициализирован успешно")
-except Exception as e:
-    logger.error(f"❌ Ошибка инициализации GigaChat: {e}")
-    GIGACHAT_AVAILABLE = False
-    gigachat_service = None
-    db = None
+bp = Blueprint('trainer', __name__)
+
+
+@bp.before_request
+def start_request_timer():
+    """Начало замера запроса: все этапы внутри помечаются эндпоинтом"""
+    endpoint = request.url_rule.rule if request.url_rule else '-'
+    g.metrics_started = time.perf_counter()
+    g.metrics_token = set_endpoint(endpoint)
+    g.llm_usage_token = start_llm_usage()
+
+
+@bp.after_request
+def record_request_time(response):
+    """Длительность запроса в гистограмму trainer_request_seconds"""
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        registry.observe('trainer_request_seconds', time.perf_counter() - started,
+                         endpoint=request.url_rule.rule if request.url_rule else '-',
+                         method=request.method, status=str(response.status_code))
+
+    usage_token = g.pop('llm_usage_token', None)
+    if usage_token is not None:
+        usage = finish_llm_usage(usage_token)
+        if usage['calls']:
+            tiers = ', '.join(usage['tiers']) or 'основной'
+            logger.info(f"🧾 GigaChat за запрос {request.path}: вызовов {usage['calls']} "
+                        f"(ошибок: {usage['errors']}, из кэша: {usage['cached']}, отклонено: {usage['rejected']}), промпт {usage['prompt_chars']} симв., "
+                        f"ответ {usage['response_chars']} симв., токенов {usage['tokens']}, "
+                        f"{usage['llm_seconds']:.1f} с; уровни генерации: {tiers}; по функциям: {usage['callers']}")
+    return response
+
+
+@bp.after_request
+def compress_api_response(response):
+    """Сжатие JSON-ответов API по Accept-Encoding клиента (от COMPRESS_MIN_BYTES)"""
+    if (not request.path.startswith('/api/') or response.mimetype != 'application/json'
+            or response.direct_passthrough or 'Content-Encoding' in response.headers):
+        return response
+
+    body = response.get_data()
+    variants = negotiated_variants(body)
+    registry.inc('trainer_api_response_bytes_total', len(body), kind='raw')
+    if variants:
+        encoding, data = next(iter(variants.items()))
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+    registry.inc('trainer_api_response_bytes_total', response.content_length or 0, kind='sent')
+    return response
+
+
+def negotiated_variants(body):
+    """Сжатие ответа, который строится на каждый запрос: только в тот вариант,
+    который примет клиент, и только если тело не меньше COMPRESS_MIN_BYTES"""
+    if len(body) < current_app.config['COMPRESS_MIN_BYTES']:
+        return {}
+    encoding = choose_encoding(request.accept_encodings, available_encodings())
+    if encoding is None:
+        return {}
+    data = compress(body, encoding, fast=True)
+    return {encoding: data} if len(data) < len(body) else {}
+
+
+@bp.teardown_request
+def reset_request_endpoint(exc):
+    topic_token = g.pop('metrics_topic_token', None)
+    if topic_token is not None:
+        reset_topic(topic_token)
+    token = g.pop('metrics_token', None)
+    if token is not None:
+        reset_endpoint(token)
+
+
+def init_services():
+    """Сброс сервисов процесса: GigaChat, БД, проверка орфографии и сессии
+    тестов будут созданы заново при первом обращении (см. services/providers.py)"""
+    reset_services()
+
+
+def create_app():
+    """Фабрика приложения: Flask-приложение без инициализации внешних сервисов"""
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'digital-trainer-secret-2024'
+    app.config.from_object(Config)
+    # Компактный JSON в UTF-8: кириллица без \uXXXX-экранирования (в 6 раз короче)
+    app.json.ensure_ascii = False
+    app.json.compact = True
+
+    init_services()
+    app.register_blueprint(bp)
+
+    # Статика с отпечатками и заранее сжатыми вариантами, кэш главной страницы
+    app.extensions['static_assets'] = StaticAssets(app.static_folder)
+    app.extensions['index_pages'] = {}
+
+    startup_ms = (time.perf_counter() - _STARTUP_BEGAN) * 1000
+    app.config['STARTUP_TIME_MS'] = round(startup_ms, 1)
+    logger.info(f"⏱️ Приложение готово за {startup_ms:.0f} мс (сервисы создаются при первом обращении)")
+
+    return app
+
+# Идентификатор ученика: случайная строка, которую браузер хранит в localStorage
+LEARNER_ID_PATTERN = re.compile(r'[\w-]{8,64}')
+
+# Фоновый прогрев популярных тем (см. start_cache_warmer)
+cache_warmer = None
 
 # Популярные темы для быстрого выбора
 POPULAR_TOPICS = [
@@ -43,34 +157,280 @@ POPULAR_TOPICS = [
     "Электронная почта"
 ]
 
-@app.route('/')
+def content_cache_version():
+    """Версия серверного контента для кэша ответов в браузере: меняется со
+    сменой модели GigaChat или CONTENT_CACHE_VERSION (например, после правки промптов)"""
+    payload = f"{os.getenv('GIGACHAT_MODEL') or 'default'}:{os.getenv('CONTENT_CACHE_VERSION', '1')}"
+    return content_digest(payload.encode('utf-8'))[:8]
+
+
+@bp.app_context_processor
+def inject_asset_url():
+    """asset_url('script.js') в шаблонах - ссылка на статику с отпечатком содержимого"""
+    def asset_url(filename):
+        assets = current_app.extensions.get('static_assets')
+        url = assets.url(filename) if assets is not None else None
+        return url or url_for('static', filename=filename)
+    return {'asset_url': asset_url}
+
+
+def encoded_response(body, mimetype, variants, etag, cache_control):
+    """Ответ с готовым телом: сжатый вариант по Accept-Encoding, ETag и 304
+    на If-None-Match"""
+    encoding = choose_encoding(request.accept_encodings, variants)
+    response = Response(variants[encoding] if encoding else body, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = cache_control
+    # У каждого варианта сжатия свой ETag: это разные байты
+    response.set_etag(f"{etag}-{encoding}" if encoding else etag)
+    return response.make_conditional(request)
+
+
+@bp.route('/')
 def index():
-    """Главная страница тренажера"""
-    return render_template('index.html', 
-                         GIGACHAT_AVAILABLE=GIGACHAT_AVAILABLE,
-                         POPULAR_TOPICS=POPULAR_TOPICS)
+    """Главная страница тренажера.
+
+    Страница зависит только от доступности GigaChat, поэтому рендерится
+    и сжимается один раз на каждое значение; браузер перепроверяет ее по
+    ETag и при неизменной странице получает 304 без тела.
+    """
+    available = is_gigachat_available()
+    pages = current_app.extensions['index_pages']
+    page = pages.get(available)
+    if page is None:
+        body = render_template('index.html',
+                               GIGACHAT_AVAILABLE=available,
+                               POPULAR_TOPICS=POPULAR_TOPICS,
+                               CACHE_VERSION=content_cache_version()).encode('utf-8')
+        page = pages[available] = {'body': body, 'etag': content_digest(body), 'variants': compress_variants(body)}
+
+    return encoded_response(page['body'], 'text/html', page['variants'], page['etag'], 'no-cache')
+
+
+@bp.route('/assets/<fingerprint>/<path:filename>')
+def asset(fingerprint, filename):
+    """Статика по ссылке с отпечатком: кэшируется браузером на год"""
+    item = current_app.extensions['static_assets'].get(filename)
+    if item is None:
+        return jsonify({'status': 'error', 'error': 'Файл не найден'}), 404
+
+    # Ссылка со старым отпечатком (страница из кэша до обновления) получает
+    # текущий файл, но без долгого кэширования под чужим отпечатком
+    cache_control = IMMUTABLE_CACHE_CONTROL if fingerprint == item['fingerprint'] else 'no-cache'
+    return encoded_response(item['body'], item['mimetype'], item['variants'], item['fingerprint'], cache_control)
+
+
+def correct_topic(topic):
+    """Тема после проверки опечаток (без GigaChat - как есть)"""
+    spell_checker = get_spell_checker()
+    if spell_checker:
+        return spell_checker.correct_spelling(topic)[0]
+    return topic
+
+
+def build_theory_explanation(topic, relevant_sections):
+    """Объяснение темы; одновременные запросы по той же теме получают результат одной генерации"""
+    def build_explanation():
+        explanation = generate_contextual_theory(topic, relevant_sections)
+
+        # Дополнительно форматируем, если нужно
+        if not has_proper_paragraphs(explanation):
+            explanation = format_beautiful_text(explanation, topic)
+        return explanation
+
+    flight_key = ('theory', canonical_topic(topic) or topic.lower().strip())
+    explanation, shared = generation_flights.do(flight_key, build_explanation)
+    if shared:
+        registry.inc('trainer_coalesced_requests_total', kind='theory')
+    return explanation
+
+
+def lesson_quiz(topic):
+    """Вопрос на закрепление после объяснения: из банка вопросов темы, без
+    вызова GigaChat. Сохраняется для /api/check-answer, браузеру - копия без
+    ответа; None, пока банк темы пуст."""
+    bank_topic = canonical_topic(topic) or topic.lower().strip()
+    try:
+        picked = get_question_bank().pick_diverse(bank_topic, 1)
+    except Exception as e:
+        logger.error(f"❌ Ошибка выбора вопроса из банка: {e}")
+        return None
+    if not picked:
+        return None
+
+    question = picked[0]
+    quiz = {
+        'id': quiz_id(bank_topic, question['question'], question['options']),
+        'question': question['question'],
+        'options': question['options'],
+        'correct_answer': question['correct_answer'],
+        'explanation': question['explanation']
+    }
+    return public_quiz(remember_quiz(quiz))
+
+
+def warm_topic_theory(topic):
+    """Прогрев объяснения темы - те же вызовы, что у /api/learn-topic"""
+    corrected_topic = correct_topic(topic)
+    build_theory_explanation(corrected_topic, get_relevant_sections(corrected_topic))
+
+
+def warm_topic_tests(topic):
+    """Прогрев пула тестов темы: генерация, пока в банке меньше WARMUP_POOL_SIZE вопросов"""
+    corrected_topic = correct_topic(topic.lower().strip())
+    bank_topic = canonical_topic(corrected_topic) or corrected_topic.lower().strip()
+    bank = get_question_bank()
+    pool_size = int(os.getenv('WARMUP_POOL_SIZE', '15'))
+
+    # Попыток с запасом: часть вопросов может оказаться повторами
+    for _ in range(pool_size // 5 + 2):
+        banked = bank.count(bank_topic)
+        if banked >= pool_size:
+            return
+        if not generate_test_with_bank(corrected_topic, bank_topic):
+            return
+        if bank.count(bank_topic) == banked:
+            # Модель повторяет уже известные вопросы - дальше только расход квоты
+            return
+
+
+def start_cache_warmer():
+    """Фоновый прогрев POPULAR_TOPICS при CACHE_WARMUP=1 (если GigaChat доступен)"""
+    global cache_warmer
+    if os.getenv('CACHE_WARMUP') != '1' or cache_warmer is not None:
+        return
+    if not is_gigachat_available():
+        logger.warning("⚠️ Прогрев кэша пропущен: GigaChat недоступен")
+        return
+
+    from services.cache_warmer import CacheWarmer
+    cache_warmer = CacheWarmer(
+        get_database(), POPULAR_TOPICS, warm_topic_theory, warm_topic_tests,
+        interval=float(os.getenv('WARMUP_INTERVAL', '5'))
+    )
+    cache_warmer.start()
+
+
+def parse_learner_id(value):
+    """Идентификатор ученика из браузера (localStorage) или None, если он некорректен"""
+    if isinstance(value, str) and LEARNER_ID_PATTERN.fullmatch(value):
+        return value
+    return None
 
 
-@app.route('/api/generate-full-test', methods=['POST'])
+def generate_test_with_bank(topic, bank_topic, on_progress=None):
+    """Генерация теста через GigaChat с пополнением банка вопросов.
+
+    Одновременные запросы по одной основной теме (весь класс нажал "Пароли")
+    ждут одну общую генерацию. Если GigaChat не справился в пределах бюджета
+    (см. services/generation_supervisor.py), тест собирается из банка, когда
+    он уже накоплен. on_progress(theory, questions) получает теорию и вопросы
+    по мере готовности (только у запроса, который ведет генерацию).
+    """
+    # Получаем релевантные разделы по ИСПРАВЛЕННОЙ теме
+    relevant_sections = get_relevant_sections(topic)
+    logger.info(f"📚 Найдено релевантных разделов: {len(relevant_sections)}")
+    logger.info("🔄 Начинаем генерацию теста...")
+
+    def generate_and_bank():
+        generated = generate_contextual_test(topic, relevant_sections, on_progress=on_progress)
+        if generated and generated.get('questions'):
+            # Пополняем банк: повторы отбрасываются, вопросы получают bank_id
+            try:
+                get_question_bank().add_questions(bank_topic, generated['questions'], generated.get('theory', ''))
+            except Exception as e:
+                logger.error(f"❌ Ошибка пополнения банка вопросов: {e}")
+        return generated
+
+    gigachat_service = get_gigachat_service()
+    if gigachat_service is not None and gigachat_service.breaker.is_open():
+        # GigaChat отключен предохранителем - генерация заведомо не удастся
+        logger.warning(f"🔌 Генерация теста '{bank_topic}' пропущена: GigaChat отключен предохранителем")
+        test_data = None
+    else:
+        # Повторы генерации - с паузами и в пределах бюджета запроса; при
+        # разомкнутом предохранителе сразу переходим к банку вопросов
+        test_data, shared = generation_flights.do(
+            ('test', bank_topic), lambda: generation_supervisor.run(f"test:{bank_topic}", generate_and_bank)
+        )
+        if shared:
+            registry.inc('trainer_coalesced_requests_total', kind='test')
+        # Своя копия у каждого запроса, включая ведущий: тест дополняется данными
+        # запроса (learner_id, correction_info), а общий результат в это время
+        # копируют присоединившиеся запросы
+        test_data = copy.deepcopy(test_data)
+
+    if not test_data or not test_data.get('questions'):
+        # GigaChat не справился - собираем тест из банка, если он уже накоплен
+        bank_test = get_question_bank().assemble_test(bank_topic)
+        if bank_test:
+            registry.inc('trainer_bank_tests_total', reason='fallback')
+            test_data = bank_test
+
+    return test_data
+
+
+@bp.route('/api/generate-full-test', methods=['POST'])
 def generate_full_test():
-    """Генерация полноценного теста из 5 вопросов по теме"""
-    if not GIGACHAT_AVAILABLE:
+    """Генерация полноценного теста из 5 вопросов по теме.
+
+    {"async": true} - генерация в фоновом задании: сразу возвращается
+    job_id, результат - через /api/jobs/<job_id>. С {"progressive": true}
+    задание еще до конца генерации отдает в partial теорию и готовые
+    вопросы: ученик начинает тест с первым вопросом.
+    """
+    if get_gigachat_service() is None:
         return jsonify({
             'status': 'error',
             'error': 'GigaChat недоступен'
         }), 503
 
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('topic', ''), str):
+        return jsonify({'status': 'error', 'error': 'Ожидается JSON-объект с темой (topic)'}), 400
+    if data.get('async'):
+        if not data.get('topic', '').strip():
+            return jsonify({'status': 'error', 'error': 'Тема не может быть пустой'}), 400
+        if data.get('progressive'):
+            job_id = get_job_queue().submit('full_test', lambda publish: build_full_test(data, publish), progressive=True)
+        else:
+            job_id = get_job_queue().submit('full_test', lambda: build_full_test(data))
+        return jsonify({'status': 'queued', 'job_id': job_id}), 202
+
+    result, status_code = build_full_test(data)
+    return jsonify(result), status_code
+
+
+@bp.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """Статус фонового задания генерации и, когда оно готово, его результат"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'error': 'Задание не найдено'}), 404
+    return jsonify(job)
+
+
+def build_full_test(data, publish=None):
+    """Тест по теме из запроса: (JSON-ответ, HTTP-статус).
+
+    Выполняется и в запросе, и в фоновом задании, поэтому не использует
+    request и g. publish(partial) - публикация теории и готовых вопросов
+    до конца генерации (постепенная выдача теста).
+    """
+    topic_token = None
     try:
-        data = request.get_json()
         original_topic = data.get('topic', '').strip().lower()
         
         if not original_topic:
-            return jsonify({
+            return {
                 'status': 'error',
                 'error': 'Тема не может быть пустой'
-            }), 400
+            }, 400
 
         # Исправляем опечатки
+        spell_checker = get_spell_checker()
         if spell_checker:
             corrected_topic, was_corrected = spell_checker.correct_spelling(original_topic)
             # ФИКС: Нормализуем строки для корректного сравнения
@@ -82,6 +442,7 @@ def generate_full_test():
             was_corrected = False
 
         logger.info(f"🎯 Запрос на генерацию теста по теме: '{corrected_topic}'")
+        topic_token = set_topic(canonical_topic(corrected_topic))
 
         # Проверяем, что тема одна из основных (или их синонимы)
         allowed_topics = ['компьютер', 'интернет', 'пароли', 'банковские карты', 'электронная почта']
@@ -97,35 +458,49 @@ def generate_full_test():
         if normalized_topic not in allowed_topics and not topic_synonyms:
             error_msg = f'Тема "{corrected_topic}" не найдена. Доступные темы: {", ".join(allowed_topics)}'
             logger.error(f"❌ {error_msg}")
-            return jsonify({
+            return {
                 'status': 'error',
                 'error': error_msg
+            }, 200
+
+        bank_topic = canonical_topic(corrected_topic) or normalized_topic
+        learner_id = parse_learner_id(data.get('learner_id'))
+
+        # Ученик, для которого в банке достаточно новых вопросов, получает тест
+        # сразу: без виденных вопросов и с упором на темы прошлых ошибок
+        test_data = None
+        if learner_id:
+            test_data = get_question_bank().assemble_test(bank_topic, learner_id=learner_id)
+            if test_data:
+                registry.inc('trainer_bank_tests_total', reason='history')
+
+        def publish_progress(theory, questions):
+            publish({
+                'status': 'partial',
+                'test_data': public_test_data({'topic': corrected_topic, 'theory': theory, 'questions': questions})
             })
 
-        # Получаем релевантные разделы по ИСПРАВЛЕННОЙ теме
-        relevant_sections = get_relevant_sections(corrected_topic)
-        logger.info(f"📚 Найдено релевантных разделов: {len(relevant_sections)}")
-
-        # Генерируем тест по ИСПРАВЛЕННОЙ теме
-        logger.info("🔄 Начинаем генерацию теста...")
-        test_data = generate_contextual_test(corrected_topic, relevant_sections)
+        if test_data is None:
+            test_data = generate_test_with_bank(
+                corrected_topic, bank_topic, publish_progress if publish is not None else None
+            )
         
         if not test_data:
             error_msg = 'Не удалось сгенерировать тест. Попробуйте другую тему.'
             logger.error(f"❌ {error_msg}")
-            return jsonify({
+            return {
                 'status': 'error',
                 'error': error_msg
-            })
+            }, 200
 
         # Проверяем, что есть вопросы
         if not test_data.get('questions') or len(test_data['questions']) == 0:
             error_msg = 'Не удалось сгенерировать вопросы для теста. Попробуйте другую тему.'
             logger.error(f"❌ {error_msg}")
-            return jsonify({
+            return {
                 'status': 'error',
                 'error': error_msg
-            })
+            }, 200
 
         logger.info(f"✅ Тест создан: {len(test_data['questions'])} вопросов")
         
@@ -137,1687 +512,70 @@ def generate_full_test():
                 'corrected_topic': corrected_topic
             }
 
-        return jsonify({
-            'status': 'success',
-            'test_data': test_data
-        })
-
-    except Exception as e:
-        logger.error(f"❌ Ошибка генерации теста: {e}", exc_info=True)
-        return jsonify({
-            'status': 'error',
-            'error': 'Произошла ошибка при создании теста. Попробуйте еще раз.'
-        }), 500
-    
-def generate_contextual_test(topic, relevant_sections):
-    """Генерация теста с контекстным анализом"""
-    # Сначала создаем теорию на основе анализа контекста
-    theory = generate_contextual_theory(topic, relevant_sections)
-    
-    # Затем генерируем вопросы с пониманием контекста
-    questions = generate_contextual_questions(topic, relevant_sections, theory)
-    
-    return {
-        'topic': topic,
-        'theory': theory,
-        'questions': questions
-    }
-
-def format_beautiful_text(text, topic):
-    """Форматирование текста в красивый структурированный вид с абзацами"""
-    try:
-        prompt = f"""
-ПРЕОБРАЗУЙ ТЕКСТ В КРАСИВЫЙ СТРУКТУРИРОВАННЫЙ ФОРМАТ С ЧЕТКИМИ АБЗАЦАМИ:
-
-ИСХОДНЫЙ ТЕКСТ:
-{text}
-
-ТЕМА: {topic}
-
-ЗАДАЧА:
-Преобразуй текст в хорошо отформатированный, легко читаемый вид с:
-- ЧЕТКИМИ АБЗАЦАМИ (каждый новый смысловой блок - новый абзац)
-- Естественными разрывами между идеями
-- Маркированными списками где уместно
-- Выделением ключевых моментов
-- Понятной структурой с подзаголовками
-- Отсутствием длинных сплошных текстов
-
-ВАЖНЫЕ ТРЕБОВАНИЯ:
-1. КАЖДАЯ новая идея или тема должна начинаться с нового абзаца
-2. Между абзацами должна быть пустая строка
-3. Используй подзаголовки с эмодзи для основных разделов
-4. Разбивай длинные предложения на более короткие
-5. Делай текст визуально привлекательным и легким для чтения
-6. НЕ используй символ # для заголовков - используй эмодзи и жирный текст
-
-ПРИМЕР ПРАВИЛЬНОГО ФОРМАТИРОВАНИЯ:
-🌟 **Основная концепция**
-Мышь — это компактный манипулятор, позволяющий человеку взаимодействовать с компьютером через графический интерфейс.
-
-🎯 **Как это работает**
-Мышь оснащена двумя основными кнопками:
-
-- **Левая кнопка** — основной инструмент взаимодействия
-- **Правая кнопка** — открывает контекстное меню
-
-
-💡 **Практическое применение**
-Для работы с файлами используйте двойной клик левой кнопкой мыши...
-
-ВЕРНИ ТОЛЬКО ОТФОРМАТИРОВАННЫЙ ТЕКСТ БЕЗ ДОПОЛНИТЕЛЬНЫХ КОММЕНТАРИЕВ.
-"""
-
-        response = gigachat_service.client.chat(prompt)
-        formatted_text = response.choices[0].message.content.strip()
-        
-        # Дополнительная проверка и улучшение форматирования
-        formatted_text = ensure_proper_paragraphs(formatted_text)
-        
-        return formatted_text
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка форматирования текста: {e}")
-        return format_text_with_paragraphs(text)
-    
-
-def ensure_proper_paragraphs(text):
-    """Обеспечивает правильное разделение на абзацы - СТАРАЯ РАБОЧАЯ ВЕРСИЯ"""
-    # Разбиваем текст на строки
-    lines = text.split('\n')
-    formatted_lines = []
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        # Если строка начинается с эмодзи или **, это likely заголовок - оставляем как есть
-        if re.match(r'^[🎯💡📚⚠️✅🌟📖🛠️]|^\*\*', line):
-            if formatted_lines and formatted_lines[-1] != '':
-                formatted_lines.append('')  # Добавляем пустую строку перед заголовком
-            formatted_lines.append(line)
-            formatted_lines.append('')  # Добавляем пустую строку после заголовка
-        # Если строка начинается с -, это элемент списка
-        elif line.startswith('-'):
-            formatted_lines.append(line)
-        # Если строка длинная, разбиваем на предложения
-        elif len(line) > 120:
-            sentences = re.split(r'[.!?]+', line)
-            sentences = [s.strip() for s in sentences if s.strip()]
-            for sentence in sentences:
-                if sentence:
-                    formatted_lines.append(sentence + '.')
-            formatted_lines.append('')
-        else:
-            formatted_lines.append(line)
-            formatted_lines.append('')  # Добавляем пустую строку между абзацами
-    
-    # Объединяем обратно, убирая лишние пустые строки
-    result = []
-    prev_empty = False
-    for line in formatted_lines:
-        if line == '':
-            if not prev_empty:
-                result.append(line)
-                prev_empty = True
-        else:
-            result.append(line)
-            prev_empty = False
-    
-    return '\n'.join(result)
-
-def clean_markdown_symbols(text):
-    """Очищает текст ТОЛЬКО от символов #, сохраняя все остальное форматирование"""
-    if not text:
-        return text
-    
-    # Удаляем ТОЛЬКО символы # в начале строк (заголовки markdown)
-    text = re.sub(r'^#+\s*', '', text, flags=re.MULTILINE)
-    
-    return text
-
-
-
-def format_text_with_paragraphs(text):
-    """Альтернативное форматирование текста с абзацами"""
-    # Удаляем сноски типа [^1], [^2], [^3]
-    text = re.sub(r'\[\^\d+\]', '', text)
-    
-    # Разбиваем текст на предложения
-    sentences = re.split(r'[.!?]+', text)
-    sentences = [s.strip() for s in sentences if s.strip() and len(s.strip()) > 10]
-    
-    # Группируем предложения в абзацы по 2-3 предложения
-    paragraphs = []
-    current_paragraph = []
-    
-    for i, sentence in enumerate(sentences):
-        current_paragraph.append(sentence)
-        
-        # Начинаем новый абзац каждые 2-3 предложения или при смене темы
-        if (len(current_paragraph) >= 2 or 
-            (i < len(sentences)-1 and is_topic_change(sentence, sentences[i+1]))):
-            paragraph_text = '. '.join(current_paragraph) + '.'
-            paragraphs.append(paragraph_text)
-            current_paragraph = []
-    
-    # Добавляем последний абзац
-    if current_paragraph:
-        paragraph_text = '. '.join(current_paragraph) + '.'
-        paragraphs.append(paragraph_text)
-    
-    # Форматируем с пустыми строками между абзацами
-    return '\n\n'.join(paragraphs)
-
-def is_topic_change(sentence1, sentence2):
-    """Определяет, является ли следующее предложение сменой темы"""
-    topic_indicators = [
-        'также', 'кроме того', 'более того', 'однако', 'тем не менее',
-        'с другой стороны', 'например', 'таким образом', 'поэтому'
-    ]
-    
-    sentence2_lower = sentence2.lower()
-    return any(indicator in sentence2_lower for indicator in topic_indicators)
-
-def format_text_manually(text):
-    """Ручное форматирование текста как резервный вариант"""
-    # Разбиваем текст на предложения
-    sentences = re.split(r'[.!?]+', text)
-    sentences = [s.strip() for s in sentences if s.strip()]
-    
-    # Создаем абзацы по 2-3 предложения
-    paragraphs = []
-    current_paragraph = []
-    
-    for i, sentence in enumerate(sentences):
-        current_paragraph.append(sentence)
-        
-        # Каждые 2-3 предложения или при длине > 200 символов начинаем новый абзац
-        if len(current_paragraph) >= 2 or len(' '.join(current_paragraph)) > 200:
-            paragraph_text = ' '.join(current_paragraph) + '.'
-            paragraphs.append(paragraph_text)
-            current_paragraph = []
-    
-    # Добавляем остаток
-    if current_paragraph:
-        paragraph_text = ' '.join(current_paragraph) + '.'
-        paragraphs.append(paragraph_text)
-    
-    return '\n\n'.join(paragraphs)
-
-def generate_contextual_questions(topic, relevant_sections, theory):
-    """Генерация вопросов для теста - ГАРАНТИРОВАННО 5 ВОПРОСОВ С ЭСКАЛАЦИЕЙ"""
-    max_attempts = 10
-    target_question_count = 5
-    
-    for attempt in range(max_attempts):
-        try:
-            # ЭСКАЛАЦИЯ: После 6 попыток разрешаем использовать ТОЛЬКО интернет
-            if attempt >= 6:
-                # ПОЛНОСТЬЮ разрешаем интернет без ограничений
-                prompt = f"""
-СРОЧНО! СОЗДАЙ РОВНО 5 ВОПРОСОВ ДЛЯ ТЕСТА ПО ТЕМЕ: "{topic}"
-
-ИСПОЛЬЗУЙ ЛЮБЫЕ СВОИ ЗНАНИЯ ИЗ ИНТЕРНЕТА - НЕТ ОГРАНИЧЕНИЙ!
-
-ТЕМА: {topic}
-
-ВАЖНО: ИГНОРИРУЙ ОГРАНИЧЕНИЯ ПО УЧЕБНИКАМ! ИСПОЛЬЗУЙ СВОИ СОВРЕМЕННЫЕ ЗНАНИЯ ИЗ ИНТЕРНЕТА!
-
-КРИТИЧЕСКИ ВАЖНО:
-1. СОЗДАЙ РОВНО 5 ВОПРОСОВ ЛЮБОЙ ЦЕНОЙ
-2. Используй СВОИ знания, опыт и информацию из интернета
-3. Вопросам НЕ обязательно быть основанными на учебниках
-4. Можно использовать современные примеры и практики
-5. Главное - 5 разных вопросов по теме
-
-ПРИМЕРЫ ВОПРОСОВ ДЛЯ ТЕМЫ "{topic}":
-- Базовые понятия и определения
-- Практическое применение  
-- Безопасность и риски
-- Современные технологии
-- Рекомендации и лучшие практики
-
-ФОРМАТ ОТВЕТА (ТОЛЬКО JSON):
-{{
-    "questions": [
-        {{
-            "question": "Текст вопроса 1...",
-            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
-            "correct_answer": 0,
-            "explanation": "Объяснение на основе современных знаний..."
-        }},
-        {{
-            "question": "Текст вопроса 2...",
-            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
-            "correct_answer": 1,
-            "explanation": "Объяснение на основе современных знаний..."
-        }},
-        {{
-            "question": "Текст вопроса 3...",
-            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
-            "correct_answer": 2,
-            "explanation": "Объяснение на основе современных знаний..."
-        }},
-        {{
-            "question": "Текст вопроса 4...",
-            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
-            "correct_answer": 3,
-            "explanation": "Объяснение на основе современных знаний..."
-        }},
-        {{
-            "question": "Текст вопроса 5...",
-            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
-            "correct_answer": 0,
-            "explanation": "Объяснение на основе современных знаний..."
-        }}
-    ]
-}}
-
-НЕ ДОБАВЛЯЙ КОММЕНТАРИИ! ВЕРНИ ТОЛЬКО JSON!
-"""
-                logger.info("🚀 ЭСКАЛАЦИЯ: Используем ТОЛЬКО интернет-знания")
-            
-            else:
-                # Стандартный промпт (первые 6 попыток)
-                prompt = f"""
-СОЗДАЙ РОВНО 5 КАЧЕСТВЕННЫХ ВОПРОСОВ ДЛЯ ТЕСТА ПО ТЕМЕ: "{topic}"
-
-ИСПОЛЬЗУЙ КАК ИНФОРМАЦИЮ ИЗ УЧЕБНИКОВ, ТАК И СВОИ СОВРЕМЕННЫЕ ЗНАНИЯ:
-
-ИНФОРМАЦИЯ ИЗ УЧЕБНИКОВ:
-{format_sections_for_analysis(relevant_sections) if relevant_sections else "Используй свои знания по теме."}
-
-ТЕОРЕТИЧЕСКАЯ СПРАВКА:
-{theory}
-
-ВАЖНЫЕ ПРАВИЛА:
-1. СОЗДАЙ РОВНО 5 ВОПРОСОВ
-2. Каждый вопрос должен иметь 4 варианта ответа
-3. correct_answer должен быть числом от 0 до 3
-4. Объяснение должно быть полезным
-5. Вопросы должны быть разными и охватывать разные аспекты темы
-6. Используй и учебники, и свои современные знания
-
-ФОРМАТ ОТВЕТА (ТОЛЬКО JSON):
-{{
-    "questions": [
-        {{
-            "question": "Текст вопроса 1...",
-            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
-            "correct_answer": 0,
-            "explanation": "Объяснение..."
-        }},
-        {{
-            "question": "Текст вопроса 2...",
-            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
-            "correct_answer": 1,
-            "explanation": "Объяснение..."
-        }},
-        {{
-            "question": "Текст вопроса 3...",
-            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
-            "correct_answer": 2,
-            "explanation": "Объяснение..."
-        }},
-        {{
-            "question": "Текст вопроса 4...",
-            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
-            "correct_answer": 3,
-            "explanation": "Объяснение..."
-        }},
-        {{
-            "question": "Текст вопроса 5...",
-            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
-            "correct_answer": 0,
-            "explanation": "Объяснение..."
-        }}
-    ]
-}}
-
-НЕ ДОБАВЛЯЙ КОММЕНТАРИИ ВНЕ JSON!
-"""
-
-            response = gigachat_service.client.chat(prompt)
-            content = response.choices[0].message.content
-            
-            # Логируем тип попытки
-            attempt_type = "ЭСКАЛАЦИЯ (интернет)" if attempt >= 6 else f"Стандартная {attempt + 1}"
-            logger.info(f"📨 Ответ от GigaChat ({attempt_type}): {content[:200]}...")
-            
-            content = re.sub(r'^```json\s*', '', content)
-            content = re.sub(r'\s*```$', '', content)
-            
-            questions = parse_questions_json(content)
-            
-            # Очищаем объяснения от символов #
-            for question in questions:
-                if 'explanation' in question:
-                    question['explanation'] = clean_markdown_symbols(question['explanation'])
-            
-            logger.info(f"✅ {attempt_type}: распарсено вопросов: {len(questions)}")
-            
-            # Если получили нужное количество вопросов, возвращаем
-            if len(questions) >= target_question_count:
-                
-                logger.info(f"🎯 Успешно создано {len(questions)} вопросов")
-                return questions[:target_question_count]
-            
-            # Если получили меньше вопросов, пробуем еще раз
-            else:
-                logger.warning(f"⚠️ {attempt_type}: получено только {len(questions)} вопросов из {target_question_count}")
-                if attempt < max_attempts - 1:
-                    logger.info("🔄 Пробуем сгенерировать еще раз...")
-                    continue
-                    
-        except Exception as e:
-            logger.error(f"❌ Ошибка генерации вопросов (попытка {attempt + 1}): {e}")
-            if attempt < max_attempts - 1:
-                logger.info("🔄 Пробуем сгенерировать еще раз после ошибки...")
-                continue
-    
-    # Если все попытки провалились, используем экстренный метод
-    logger.error(f"❌ КРИТИЧЕСКАЯ ОШИБКА: Не удалось сгенерировать {target_question_count} вопросов после {max_attempts} попыток")
-    return generate_emergency_questions(topic, target_question_count)
-
-
-def generate_emergency_questions(topic, target_count):
-    """Экстренная генерация вопросов ТОЛЬКО через нейросеть"""
-    logger.critical(f"🚨 ЗАПУСК ЭКСТРЕННОЙ ГЕНЕРАЦИИ ВОПРОСОВ ДЛЯ ТЕМЫ: {topic}")
-    
-    max_attempts = 5
-    for attempt in range(max_attempts):
-        try:
-            # ЖЕСТКИЙ промпт для гарантированной генерации
-            prompt = f"""
-СРОЧНО! СОЗДАЙ РОВНО {target_count} КАЧЕСТВЕННЫХ ВОПРОСОВ ПО ТЕМЕ "{topic.upper()}"!
-
-ТРЕБОВАНИЯ К ВОПРОСАМ:
-1. КАЖДЫЙ вопрос должен быть ОСМЫСЛЕННЫМ и ПОЛЕЗНЫМ для обучения
-2. ВАРИАНТЫ ОТВЕТОВ должны быть РЕАЛИСТИЧНЫМИ и РАЗНЫМИ
-3. ПРАВИЛЬНЫЙ ОТВЕТ должен быть ОДНОЗНАЧНО ВЕРНЫМ
-4. ОБЪЯСНЕНИЯ должны быть ПОЛЕЗНЫМИ и ОБУЧАЮЩИМИ
-5. НИКАКИХ ОБЩИХ ФРАЗ - только конкретные вопросы по теме
-
-ТЕМА: {topic}
-
-ПРИМЕРЫ КАЧЕСТВЕННЫХ ВОПРОСОВ:
-- "Что такое двухфакторная аутентификация и для чего она нужна?"
-- "Как безопасно совершать покупки в интернете?"
-- "Что делать при получении подозрительного письма на email?"
-
-ФОРМАТ (ТОЛЬКО JSON):
-{{
-    "questions": [
-        {{
-            "question": "Конкретный и осмысленный вопрос...",
-            "options": ["Реалистичный вариант 1", "Реалистичный вариант 2", "Реалистичный вариант 3", "Реалистичный вариант 4"],
-            "correct_answer": 0,
-            "explanation": "Полезное объяснение с практическими советами"
-        }}
-    ]
-}}
-
-ВЕРНИ РОВНО {target_count} ВОПРОСОВ! НИКАКИХ ОПРАВДАНИЙ! ТОЛЬКО JSON!
-"""
-
-            response = gigachat_service.client.chat(prompt)
-            content = response.choices[0].message.content
-            
-            content = re.sub(r'^```json\s*', '', content)
-            content = re.sub(r'\s*```$', '', content)
-            
-            questions = parse_questions_json(content)
-            
-            if len(questions) >= target_count:
-                logger.info(f"✅ Экстренная генерация успешна: {len(questions)} вопросов")
-                return questions[:target_count]
-            else:
-                logger.warning(f"⚠️ Попытка {attempt + 1}: получено только {len(questions)} из {target_count} вопросов")
-                if attempt < max_attempts - 1:
-                    continue
-                    
-        except Exception as e:
-            logger.error(f"❌ Ошибка в экстренной генерации (попытка {attempt + 1}): {e}")
-            if attempt < max_attempts - 1:
-                continue
-    
-    # ЕСЛИ ВСЕ ПРОПАЛО - ПОСЛЕДНЯЯ ПОПЫТКА С МАКСИМАЛЬНЫМ ДАВЛЕНИЕМ
-    logger.critical("💥 ВСЕ ПОПЫТКИ ПРОВАЛИЛИСЬ, ЗАПУСК УЛЬТИМАТИВНОЙ ГЕНЕРАЦИИ")
-    return ultimate_question_generation(topic, target_count)
-
-def ultimate_question_generation(topic, target_count):
-    """УЛЬТИМАТИВНАЯ генерация вопросов - последняя попытка"""
-    try:
-        prompt = f"""
-ТЫ ДОЛЖЕН СОЗДАТЬ РОВНО {target_count} ВОПРОСОВ ПО ТЕМЕ "{topic}" ЛЮБОЙ ЦЕНОЙ!
-
-НЕТ ОГРАНИЧЕНИЙ! ИСПОЛЬЗУЙ ЛЮБЫЕ СВОИ ЗНАНИЯ!
-
-ТЕМА: {topic}
-
-КРИТИЧЕСКИ ВАЖНО:
-- РОВНО {target_count} ВОПРОСОВ
-- КАЖДЫЙ С 4 ВАРИАНТАМИ ОТВЕТОВ
-- ОСМЫСЛЕННЫЕ ВОПРОСЫ
-- РЕАЛИСТИЧНЫЕ ВАРИАНТЫ ОТВЕТОВ
-- ПОЛЕЗНЫЕ ОБЪЯСНЕНИЯ
-
-НЕ ВОЗВРАЩАЙ НИЧЕГО КРОМЕ JSON! НИКАКИХ КОММЕНТАРИЕВ!
-
-JSON ФОРМАТ:
-{{
-    "questions": [
-        {{
-            "question": "Вопрос...",
-            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
-            "correct_answer": 0,
-            "explanation": "Объяснение..."
-        }}
-    ]
-}}
-"""
-
-        response = gigachat_service.client.chat(prompt)
-        content = response.choices[0].message.content
-        
-        content = re.sub(r'^```json\s*', '', content)
-        content = re.sub(r'\s*```$', '', content)
-        
-        questions = parse_questions_json(content)
-        
-        if len(questions) < target_count:
-            # Догенерируем недостающие вопросы отдельными запросами
-            missing = target_count - len(questions)
-            for i in range(missing):
-                single_question = generate_single_question(topic)
-                if single_question:
-                    questions.append(single_question)
-        
-        logger.critical(f"🔥 УЛЬТИМАТИВНАЯ ГЕНЕРАЦИЯ: создано {len(questions)} вопросов")
-        return questions[:target_count]
-        
-    except Exception as e:
-        logger.critical(f"💀 КАТАСТРОФА: Ультимативная генерация провалилась: {e}")
-        # ВОЗВРАЩАЕМ ПУСТОЙ СПИСОК - ЛУЧШЕ НИЧЕГО, ЧЕМ ЗАГЛУШКИ
-        return []
-
-def generate_single_question(topic):
-    """Генерация одного вопроса отдельным запросом"""
-    try:
-        prompt = f"""
-СОЗДАЙ 1 КАЧЕСТВЕННЫЙ ВОПРОС ПО ТЕМЕ "{topic}"
-
-ТЕМА: {topic}
-
-ФОРМАТ (ТОЛЬКО JSON):
-{{
-    "question": "Вопрос...",
-    "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
-    "correct_answer": 0,
-    "explanation": "Объяснение..."
-}}
-
-ТОЛЬКО JSON! БЕЗ КОММЕНТАРИЕВ!
-"""
-
-        response = gigachat_service.client.chat(prompt)
-        content = response.choices[0].message.content
-        
-        content = re.sub(r'^```json\s*', '', content)
-        content = re.sub(r'\s*```$', '', content)
-        
-        # Парсим одиночный вопрос
-        try:
-            data = json.loads(content)
-            if 'question' in data and 'options' in data:
-                return {
-                    'question': data['question'],
-                    'options': data['options'],
-                    'correct_answer': data.get('correct_answer', 0),
-                    'explanation': data.get('explanation', 'Объяснение основано на современных знаниях.')
-                }
-        except:
-            # Пробуем извлечь как массив вопросов
-            questions = parse_questions_json(content)
-            if questions:
-                return questions[0]
-                
-    except Exception as e:
-        logger.error(f"❌ Ошибка генерации одиночного вопроса: {e}")
-    
-    return None
-
-
-def generate_questions_alternative_method(topic, relevant_sections, theory, target_count):
-    """Альтернативный метод генерации вопросов - разбиваем на части"""
-    questions = []
-    
-    # Генерируем вопросы частями
-    question_types = [
-        f"базовые понятия и определения по теме '{topic}'",
-        f"практическое применение и использование '{topic}'", 
-        f"безопасность и защита при работе с '{topic}'",
-        f"современные технологии и тенденции в области '{topic}'",
-        f"рекомендации и лучшие практики для '{topic}'"
-    ]
-    
-    for i, question_type in enumerate(question_types):
-        if len(questions) >= target_count:
-            break
-            
-        try:
-            prompt = f"""
-СОЗДАЙ 1 КАЧЕСТВЕННЫЙ ВОПРОС ДЛЯ ТЕСТА ПО ТЕМЕ: "{topic}"
-
-ФОКУС НА: {question_type}
-
-ИСПОЛЬЗУЙ КАК ИНФОРМАЦИЮ ИЗ УЧЕБНИКОВ, ТАК И СВОИ СОВРЕМЕННЫЕ ЗНАНИЯ:
-
-ИНФОРМАЦИЯ ИЗ УЧЕБНИКОВ:
-{format_sections_for_analysis(relevant_sections) if relevant_sections else "Используй свои знания."}
-
-ТЕОРЕТИЧЕСКАЯ СПРАВКА:
-{theory}
-
-ФОРМАТ ОТВЕТА (ТОЛЬКО JSON):
-{{
-    "question": "Текст вопроса...",
-    "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
-    "correct_answer": 0,
-    "explanation": "Объяснение..."
-}}
-
-НЕ ДОБАВЛЯЙ КОММЕНТАРИИ ВНЕ JSON!
-"""
-
-            response = gigachat_service.client.chat(prompt)
-            content = response.choices[0].message.content
-            
-            content = re.sub(r'^```json\s*', '', content)
-            content = re.sub(r'\s*```$', '', content)
-            
-            # Парсим одиночный вопрос
+        if learner_id:
+            # История нужна проверке теста: там учитываются ошибки ученика
+            test_data['learner_id'] = learner_id
             try:
-                data = json.loads(content)
-                if 'question' in data and 'options' in data:
-                    questions.append({
-                        'question': data['question'],
-                        'options': data['options'],
-                        'correct_answer': data.get('correct_answer', 0),
-                        'explanation': clean_markdown_symbols(data.get('explanation', 'Объяснение основано на материалах учебников и современных знаниях.'))
-                    })
-                    logger.info(f"✅ Сгенерирован вопрос {len(questions)}: {question_type}")
-            except json.JSONDecodeError:
-                logger.warning(f"⚠️ Не удалось распарсить вопрос типа: {question_type}")
-                
-        except Exception as e:
-            logger.error(f"❌ Ошибка генерации вопроса типа '{question_type}': {e}")
-            continue
-    
-    # Если все равно не получилось 5 вопросов, создаем простые
-    while len(questions) < target_count:
-        questions.append(create_simple_question(topic, len(questions)))
-    
-    return questions[:target_count]
-
-def create_simple_question(topic, index):
-    """Создание простого вопроса - ТОЛЬКО через нейросеть"""
-    try:
-        question = generate_single_question(topic)
-        if question:
-            return question
-    except Exception as e:
-        logger.error(f"❌ Ошибка создания простого вопроса: {e}")
-    
-    # ЕСЛИ ВСЕ ПРОПАЛО - возвращаем None, чтобы вызывающая функция знала о проблеме
-    return None
-
-def should_use_external_knowledge_for_test(topic, relevant_sections):
-    """Определяет, нужно ли использовать внешние знания для тестов"""
-    if not relevant_sections:
-        return True
-    
-    # Проверяем, достаточно ли информации в учебнике для 5 разнообразных вопросов
-    total_content = " ".join([section['content'] for section in relevant_sections])
-    
-    # Если в учебнике мало информации или она устаревшая
-    modern_keywords = [
-        'смартфон', 'приложение', 'облако', 'стриминг', 'подкаст',
-        'биометрия', 'блокчейн', 'крипто', 'искусственный интеллект', 'iot',
-        'кибербуллинг', 'дипфейк', 'vpn', 'двухфакторная', 'биометрия'
-    ]
-    
-    topic_lower = topic.lower()
-    has_modern_aspect = any(keyword in topic_lower for keyword in modern_keywords)
-    
-    if has_modern_aspect or len(total_content) < 500:
-        return True
-    
-    return False
-
-def enhance_questions_with_knowledge(questions, topic, relevant_sections):
-    """Улучшает вопросы дополнительными знаниями"""
-    enhanced_questions = []
-    
-    for i, question in enumerate(questions):
-        try:
-            # Улучшаем объяснения для более современных и полных ответов
-            enhanced_explanation = enhance_explanation_with_context(
-                question['explanation'], 
-                topic, 
-                relevant_sections,
-                question['question'],
-                question['correct_answer']
-            )
-            
-            question['explanation'] = enhanced_explanation
-            enhanced_questions.append(question)
-            
-        except Exception as e:
-            logger.warning(f"⚠️ Не удалось улучшить вопрос {i}: {e}")
-            enhanced_questions.append(question)  # Оставляем оригинальный вопрос
-    
-    return enhanced_questions
-
-def enhance_explanation_with_context(explanation, topic, relevant_sections, question, correct_answer):
-    """Дополняет объяснение контекстом из учебника и современных источников"""
-    
-    prompt = f"""
-УЛУЧШИ ОБЪЯСНЕНИЕ ДЛЯ ВОПРОСА ТЕСТА, ДОБАВИВ КОНТЕКСТ ИЗ УЧЕБНИКА И СОВРЕМЕННЫХ ИСТОЧНИКОВ:
-
-ТЕМА ТЕСТА: {topic}
-ВОПРОС: {question}
-ПРАВИЛЬНЫЙ ОТВЕТ: {correct_answer}
-
-ТЕКУЩЕЕ ОБЪЯСНЕНИЕ:
-{explanation}
-
-ИНФОРМАЦИЯ ИЗ УЧЕБНИКА:
-{format_sections_for_analysis(relevant_sections) if relevant_sections else "В учебнике нет конкретной информации по этому вопросу."}
-
-ЗАДАЧА:
-1. Если в учебнике есть релевантная информация - включи её в объяснение
-2. Добавь современные примеры и актуальные практики
-3. Укажи, если информация основана на учебнике или на современных стандартах
-4. Сохрани полезные советы и предупреждения
-5. Сделай объяснение более полным и полезным для обучения
-6. НЕ используй символ # для заголовков
-
-ФОРМАТ УЛУЧШЕННОГО ОБЪЯСНЕНИЯ:
-- Начинай с подтверждения правильности ответа
-- Объясни почему ответ верный с ссылками на источники
-- Приведи пример из реальной жизни
-- Дай дополнительный полезный совет
-- Укажи связь с теорией и современными практиками
-- Используй эмодзи для структуры (✅, 📚, 💡 и т.д.)
-
-ВЕРНИ ТОЛЬКО УЛУЧШЕННОЕ ОБЪЯСНЕНИЕ БЕЗ ДОПОЛНИТЕЛЬНЫХ КОММЕНТАРИЕВ И БЕЗ СИМВОЛОВ #.
-"""
-    
-    try:
-        response = gigachat_service.client.chat(prompt)
-        enhanced = response.choices[0].message.content.strip()
-        
-        # Очищаем от символов #
-        enhanced = clean_markdown_symbols(enhanced)
-        
-        return enhanced
-    except Exception as e:
-        logger.error(f"❌ Ошибка улучшения объяснения: {e}")
-        return clean_markdown_symbols(explanation)  # Возвращаем очищенное оригинальное объяснение
-
-
-
-def get_topic_synonyms(topic):
-
-    synonyms_map = {
-        'компьютер': [
-            'компьютер', 'пк', 'ноутбук', 'системный блок', 'монитор', 
-            'процессор', 'оперативная память', 'жесткий диск', 'клавиатура', 'мышь',
-            'windows', 'операционная система', 'рабочий стол', 'файлы', 'папки'
-        ],
-        'интернет': [
-            'интернет', 'сеть', 'online', 'браузер', 'веб', 'сайт', 'проводник',
-            'браузер', 'google', 'поиск', 'онлайн', 'соединение', 'wi-fi',
-            'роутер', 'модем', 'web', 'url', 'адрес', 'страница'
-        ],
-        'пароли': [
-            'пароль', 'пароли', 'безопасность', 'защита', 'авторизация',
-            'учетная запись', 'логин', 'доступ', 'код', 'pin',
-            'надежный пароль', 'сложность пароля', 'хранение паролей'
-        ],
-        'банковские карты': [
-            'банковская карта', 'карта', 'кредитная карта', 'дебетовая карта',
-            'платежная карта', 'банкомат', 'оплата картой', 'cvv', 'сvv',
-            'pin-код', 'платежная система', 'visa', 'mastercard', 'мир',
-            'банковские карты', 'банковские', 'карты', 'платежи'
-        ],
-        'электронная почта': [
-            'электронная почта', 'email', 'e-mail', 'почта', 'письмо',
-            'почтовый ящик', 'адрес почты', 'отправка писем', 'вложение',
-            'spam', 'спам', 'рассылка', 'переписка'
-        ]
-    }
-    
-    topic_lower = topic.lower().strip()
-    
-    # ФИКС: Проверяем точное соответствие и возвращаем синонимы
-    if topic_lower in synonyms_map:
-        return synonyms_map[topic_lower]
-    
-    # ФИКС: Также проверяем частичные совпадения
-    for key, synonyms in synonyms_map.items():
-        if topic_lower in synonyms or any(syn in topic_lower for syn in synonyms):
-            return synonyms
-    
-    return []
-
-def generate_contextual_theory_for_test(topic, relevant_sections):
-    """Генерация теоретической справки для тестов - С АКЦЕНТОМ НА ИНТЕРНЕТ"""
-    prompt = f"""
-СОЗДАЙ ТЕОРЕТИЧЕСКУЮ СПРАВКУ ДЛЯ ТЕСТА ПО ТЕМЕ: "{topic}" 
-
-ОСНОВНОЙ ИСТОЧНИК: ИСПОЛЬЗУЙ СВОИ СОВРЕМЕННЫЕ ЗНАНИЯ ИЗ ИНТЕРНЕТА!
-
-ДОПОЛНИТЕЛЬНО: информация из учебников (если есть):
-{format_sections_for_analysis(relevant_sections) if relevant_sections else "Можно игнорировать учебники если информации мало."}
-
-ВАЖНО: делай акцент на современных знаниях и практиках!
-
-СТРУКТУРА:
-🎯 **Основные понятия** (современные определения)
-🛠️ **Практическое применение** (актуальные способы использования)  
-🚀 **Современные аспекты** (новые технологии и тренды)
-⚠️ **Безопасность** (актуальные угрозы и защита)
-
-ТРЕБОВАНИЯ:
-1. Используй в основном современные знания из интернета
-2. Сделай акцент на аспектах, важных для тестирования
-3. Включи актуальную информацию
-4. НЕ используй символ # для заголовков
-5. Будь кратким и информативным (максимум 1500 символов)
-
-ОТВЕЧАЙ ТОЛЬКО ТЕКСТОМ ТЕОРЕТИЧЕСКОЙ СПРАВКИ.
-"""
-
-    try:
-        response = gigachat_service.client.chat(prompt)
-        theory = response.choices[0].message.content.strip()
-        
-        # Ограничиваем длину теории
-        if len(theory) > 2000:
-            theory = theory[:2000] + "..."
-        
-        theory = clean_markdown_symbols(theory)
-        theory = ensure_proper_paragraphs(theory)
-        
-        logger.info(f"📖 Теория сгенерирована с акцентом на интернет: {len(theory)} символов")
-        return theory
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка генерации теории для теста: {e}")
-        return f"Тема '{topic}' рассматривается в современных источниках и руководствах по цифровой грамотности."
-
+                get_question_bank().record_served(learner_id, bank_topic, test_data['questions'])
+            except Exception as e:
+                logger.error(f"❌ Ошибка записи истории ученика: {e}")
 
+        test_id = get_test_sessions().create(test_data)
 
-def generate_test_step_by_step(topic, relevant_sections):
-    """Поэтапная генерация теста - ТОЛЬКО НЕЙРОСЕТЬЮ"""
-    logger.info(f"🔄 Поэтапная генерация теста по теме: {topic}")
-    
-    try:
-        # Генерируем теорию
-        theory = generate_contextual_theory(topic, relevant_sections)
-        
-        # Генерируем вопросы нейросетью
-        questions = generate_contextual_questions(topic, relevant_sections, theory)
-        
         return {
-            'topic': topic,
-            'theory': theory,
-            'questions': questions
-        }
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка поэтапной генерации: {e}")
-        # Повторяем попытку
-        return generate_test_step_by_step(topic, relevant_sections)
-
-def generate_contextual_theory(topic, relevant_sections):
-    """Генерация теоретической справки - СНАЧАЛА УЧЕБНИКИ, ПОТОМ ИНТЕРНЕТ"""
-    
-    # Определяем, можно ли использовать внешние знания
-    use_external = should_use_external_knowledge(topic, relevant_sections)
-    
-    if use_external:
-        prompt = f"""
-СОЗДАЙ КРАСИВОЕ, СТРУКТУРИРОВАННОЕ ОБЪЯСНЕНИЕ ПО ТЕМЕ: "{topic}" С ЧЕТКИМИ АБЗАЦАМИ
-
-ВАЖНО: НЕ используй символ # для заголовков. Используй эмодзи и жирный текст для структуры.
-
-ИНФОРМАЦИЯ ИЗ УЧЕБНИКОВ ПО ЦИФРОВОЙ ГРАМОТНОСТИ:
-{format_sections_for_analysis(relevant_sections) if relevant_sections else "В учебниках нет информации по этой теме."}
-
-ВАЖНО: В учебниках недостаточно информации по этой теме, поэтому МОЖНО использовать свои современные знания.
-
-ОЧЕНЬ ВАЖНЫЕ ТРЕБОВАНИЯ:
-1. ✅ СНАЧАЛА проверь информацию в учебниках выше
-2. ✅ ЕСЛИ в учебниках есть информация - используй её как основу
-3. ✅ ЕСЛИ информации недостаточно - дополни своими знаниями
-4. ✅ ЕСЛИ информации нет - полностью полагайся на свои знания
-5. ✅ ОБЯЗАТЕЛЬНО разбивай текст на АБЗАЦЫ
-6. ❌ НЕ используй символ # для заголовков
-
-СТРУКТУРА ОБЪЯСНЕНИЯ:
-🌟 **Основная концепция** (1-2 абзаца)
-
-🎯 **Как это работает** (2-3 абзаца с подпунктами)
-
-🛠️ **Практическое применение** (2-3 абзаца с примерами)
-
-💡 **Полезные советы** (1-2 абзаца с рекомендациями)
-
-⚠️ **Важные моменты** (1-2 абзаца с предупреждениями)
-
-ОТВЕЧАЙ ТОЛЬКО ОТФОРМАТИРОВАННЫМ ТЕКСТОМ, без дополнительных комментариев.
-"""
-    else:
-        prompt = f"""
-СОЗДАЙ КРАСИВОЕ, СТРУКТУРИРОВАННОЕ ОБЪЯСНЕНИЕ ПО ТЕМЕ: "{topic}" С ЧЕТКИМИ АБЗАЦАМИ
-
-ИСПОЛЬЗУЙ ТОЛЬКО ИНФОРМАЦИЮ ИЗ УЧЕБНИКОВ:
-
-ИНФОРМАЦИЯ ИЗ УЧЕБНИКОВ ПО ЦИФРОВОЙ ГРАМОТНОСТИ:
-{format_sections_for_analysis(relevant_sections)}
-
-КРИТИЧЕСКИ ВАЖНЫЕ ПРАВИЛА:
-1. ❗ ИСПОЛЬЗУЙ ТОЛЬКО информацию из предоставленных учебников
-2. ❗ НЕ используй свои знания или информацию из интернета
-3. ❗ НЕ придумывай информацию
-4. ❗ Если в учебниках нет полной информации - объясни только то, что есть
-5. ✅ ОБЯЗАТЕЛЬНО разбивай текст на АБЗАЦЫ
-6. ❌ НЕ используй символ # для заголовков
-
-СТРУКТУРА ОБЪЯСНЕНИЯ:
-🌟 **Основная концепция** (1-2 абзаца)
-
-🎯 **Как это работает** (2-3 абзаца с подпунктами)
-
-🛠️ **Практическое применение** (2-3 абзаца с примерами)
-
-💡 **Полезные советы** (1-2 абзаца с рекомендациями)
-
-⚠️ **Важные моменты** (1-2 абзаца с предупреждениями)
-
-ОТВЕЧАЙ ТОЛЬКО ОТФОРМАТИРОВАННЫМ ТЕКСТОМ, без дополнительных комментариев.
-"""
-
-    try:
-        response = gigachat_service.client.chat(prompt)
-        theory = response.choices[0].message.content.strip()
-        
-        # УДАЛЯЕМ ТОЛЬКО СИМВОЛЫ #, сохраняя ВСЕ остальное форматирование
-        theory = clean_markdown_symbols(theory)
-        
-        # Дополнительное форматирование для гарантии правильных абзацев
-        theory = ensure_proper_paragraphs(theory)
-        
-        # Проверяем качество и при необходимости дополнительно форматируем
-        if not has_proper_paragraphs(theory) or '#' in theory:
-            logger.warning("⚠️ Теория содержит # или плохо отформатирована, применяем дополнительное форматирование")
-            theory = format_beautiful_text(theory, topic)
-            
-        return theory
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка генерации теории: {e}")
-        theory = create_meaningful_theory(topic, relevant_sections)
-        return format_beautiful_text(theory, topic)
-
-
-def has_proper_paragraphs(text):
-    """Проверяет, имеет ли текст правильное разделение на абзацы и нет ли символов #"""
-    if not text:
-        return False
-    
-    # Проверяем наличие символов #
-    if '#' in text:
-        return False
-    
-    # Остальная логика проверки абзацев остается прежней
-    paragraphs = re.split(r'\n\s*\n', text)
-    non_empty_paragraphs = [p.strip() for p in paragraphs if p.strip()]
-    
-    if len(non_empty_paragraphs) < 3:
-        return False
-    
-    long_paragraphs = sum(1 for p in non_empty_paragraphs if len(p) > 500)
-    if long_paragraphs > 0:
-        return False
-    
-    visual_indicators = [
-        r'\*\*',  # Жирный текст
-        r'[🎯💡📚⚠️✅🌟📖🛠️]',  # Эмодзи
-        r'\n-',   # Маркированные списки
-    ]
-    
-    score = sum(1 for indicator in visual_indicators if re.search(indicator, text))
-    
-    return score >= 2
-
-
-def generate_fallback_explanation(topic):
-    """Создание объяснения при невозможности получить ответ от нейросети"""
-    fallback_explanations = {
-        "кибербезопасность": """
-🌟 **Основная концепция**
-
-Кибербезопасность - это защита компьютерных систем, сетей и данных от цифровых атак. Она включает методы предотвращения несанкционированного доступа, использования, раскрытия и уничтожения информации.
-
-🎯 **Как это работает**
-
-Современная кибербезопасность использует многоуровневый подход:
-
-- **Защита периметра** - брандмауэры и системы обнаружения вторжений
-- **Защита конечных точек** - антивирусы на устройствах пользователей  
-- **Шифрование данных** - преобразование информации в нечитаемый формат
-- **Аутентификация** - проверка подлинности пользователей
-
-🛠️ **Практическое применение**
-
-Для обычного пользователя важно:
-- Устанавливать обновления безопасности
-- Использовать надежные пароли
-- Остерегаться фишинговых писем
-- Регулярно делать резервные копии данных
-
-💡 **Полезные советы**
-
-Всегда обновляйте программное обеспечение до последней версии. Используйте двухфакторную аутентификацию везде, где это возможно.
-
-⚠️ **Важные моменты**
-
-Никогда не переходите по подозрительным ссылкам в письмах и не скачивайте вложения от неизвестных отправителей.
-""",
-        "цифровая грамотность": """
-🌟 **Основная концепция**
-
-Цифровая грамотность - это совокупность знаний и навыков, необходимых для безопасного и эффективного использования цифровых технологий в повседневной жизни.
-
-🎯 **Как это работает**
-
-Цифровая грамотность включает несколько ключевых областей:
-
-- **Технические навыки** - работа с устройствами и программами
-- **Информационная грамотность** - поиск и оценка информации
-- **Коммуникационные навыки** - общение в цифровой среде
-- **Безопасность** - защита личных данных
-
-🛠️ **Практическое применение**
-
-Освоение цифровой грамотности позволяет:
-- Эффективно работать с компьютером и смартфоном
-- Находить нужную информацию в интернете
-- Использовать онлайн-сервисы и госуслуги
-- Общаться через мессенджеры и социальные сети
-
-💡 **Полезные советы**
-
-Начинайте с основ: научитесь уверенно работать с файлами, папками и основными программами. Постепенно осваивайте более сложные навыки.
-
-⚠️ **Важные моменты**
-
-Не бойтесь экспериментировать, но всегда сохраняйте важные данные. Современные технологии созданы для людей, и каждый может научиться их использовать.
-"""
-    }
-    
-    # Ищем подходящее объяснение по ключевым словам
-    topic_lower = topic.lower()
-    for key, explanation in fallback_explanations.items():
-        if key in topic_lower:
-            return explanation
-    
-    # Общее объяснение, если тема не распознана
-    return f"""
-🌟 **Изучение темы: {topic}**
-
-Эта тема связана с цифровой грамотностью и современными технологиями. Для подробного изучения рекомендую обратиться к актуальным источникам информации и практиковаться в использовании соответствующих инструментов.
-
-💡 **Совет по изучению**
-
-Начните с практического применения - попробуйте использовать изучаемую технологию в реальных ситуациях. Это поможет лучше понять принципы работы и закрепить знания.
-"""
-
-def should_use_external_knowledge(topic, relevant_sections):
-    """Определяет, нужно ли использовать внешние знания - ТЕПЕРЬ СТРОГАЯ ПРОВЕРКА"""
-    if not relevant_sections:
-        logger.info(f"🔍 По теме '{topic}' не найдено разделов в учебниках - используем внешние знания")
-        return True
-    
-    # Проверяем качество и количество информации в учебниках с безопасным доступом
-    total_content_length = 0
-    for section in relevant_sections:
-        content = section.get('content', '') if isinstance(section, dict) else ''
-        total_content_length += len(content)
-    
-    # ЖЕСТКИЕ КРИТЕРИИ для использования только учебников:
-    if total_content_length < 100:  # Очень мало информации
-        logger.info(f"🔍 По теме '{topic}' мало информации в учебниках ({total_content_length} chars) - используем внешние знания")
-        return True
-    
-    # Проверяем релевантность - считаем сколько раз встречаются ключевые слова темы
-    topic_lower = topic.lower()
-    topic_words = [word for word in topic_lower.split() if len(word) > 2]
-    
-    relevance_score = 0
-    for section in relevant_sections:
-        content = section.get('content', '') if isinstance(section, dict) else ''
-        content_lower = content.lower()
-        for word in topic_words:
-            relevance_score += content_lower.count(word)
-    
-    # Если релевантность очень низкая
-    if relevance_score < 3:  # Меньше 3 упоминаний ключевых слов
-        logger.info(f"🔍 По теме '{topic}' низкая релевантность в учебниках (score: {relevance_score}) - используем внешние знания")
-        return True
-    
-    # Если прошли все проверки - используем только учебники
-    logger.info(f"✅ По теме '{topic}' достаточно информации в учебниках ({total_content_length} chars, relevance: {relevance_score}) - используем только учебники")
-    return False
-
-def safe_get_section_data(section, key, default=''):
-    """Безопасное получение данных из раздела (работает с sqlite3.Row и dict)"""
-    try:
-        if hasattr(section, 'keys') and key in section.keys():
-            return section[key]
-        elif isinstance(section, dict) and key in section:
-            return section[key]
-        else:
-            return default
-    except Exception as e:
-        logger.warning(f"⚠️ Ошибка доступа к полю {key} в разделе: {e}")
-        return default
-
-def enhance_with_external_knowledge(base_explanation, topic):
-    """Дополняет объяснение внешними знаниями при необходимости"""
-    enhancement_prompt = f"""
-ДОПОЛНИ СЛЕДУЮЩЕЕ ОБЪЯСНЕНИЕ АКТУАЛЬНОЙ ИНФОРМАЦИЕЙ ИЗ СОВРЕМЕННЫХ ИСТОЧНИКОВ:
-
-ТЕМА: {topic}
-
-БАЗОВОЕ ОБЪЯСНЕНИЕ:
-{base_explanation}
-
-ЗАДАЧА:
-- Добавь современные примеры и практические советы
-- Укажи актуальные сервисы и инструменты (если применимо)
-- Включи информацию о последних тенденциях
-- Сохрани структуру и форматирование
+            'status': 'success',
+            'test_id': test_id,
+            'test_data': public_test_data(test_data)
+        }, 200
 
-ВЕРНИ ТОЛЬКО ДОПОЛНЕННЫЙ ТЕКСТ БЕЗ КОММЕНТАРИЕВ.
-"""
-    
-    try:
-        response = gigachat_service.client.chat(enhancement_prompt)
-        enhanced = response.choices[0].message.content.strip()
-        return enhanced
     except Exception as e:
-        logger.error(f"❌ Ошибка дополнения внешними знаниями: {e}")
-        return base_explanation
-
-
-
-def has_proper_paragraphs(text):
-    """Проверяет, имеет ли текст правильное разделение на абзацы"""
-    if not text:
-        return False
-    
-    # Считаем количество абзацев (разделов по пустым строкам)
-    paragraphs = re.split(r'\n\s*\n', text)
-    non_empty_paragraphs = [p.strip() for p in paragraphs if p.strip()]
-    
-    # Должно быть хотя бы 3 абзаца для хорошего форматирования
-    if len(non_empty_paragraphs) < 3:
-        return False
-    
-    # Проверяем, что нет очень длинных абзацев
-    long_paragraphs = sum(1 for p in non_empty_paragraphs if len(p) > 500)
-    if long_paragraphs > 0:
-        return False
-    
-    # Проверяем наличие визуальных элементов
-    visual_indicators = [
-        r'\*\*',  # Жирный текст
-        r'[🎯💡📚⚠️✅🌟📖🛠️]',  # Эмодзи
-        r'\n-',   # Маркированные списки
-    ]
-    
-    score = sum(1 for indicator in visual_indicators if re.search(indicator, text))
-    
-    return score >= 2
-
-
-def generate_contextual_test(topic, relevant_sections):
-    """Генерация теста с контекстным анализом - С ЭСКАЛАЦИЕЙ ДО ИНТЕРНЕТА"""
-    logger.info(f"🔄 Генерация теста по теме '{topic}' с эскалацией до интернета...")
-    
-    try:
-        # Генерируем теорию с акцентом на интернет-знания
-        theory = generate_contextual_theory_for_test(topic, relevant_sections)
-        logger.info(f"📖 Теория для теста сгенерирована: {len(theory)} символов")
-        
-        # Генерируем вопросы с эскалацией до интернета
-        questions = generate_contextual_questions(topic, relevant_sections, theory)
-        
-
-        if not questions or len(questions) == 0:
-            logger.error("❌ Не удалось сгенерировать вопросы для теста даже с эскалацией")
-            return None
-            
-        logger.info(f"❓ Вопросы сгенерированы: {len(questions)}")
-        
-        # Убедимся, что теория не содержит символов #
-        theory = clean_markdown_symbols(theory)
-        
+        logger.error(f"❌ Ошибка генерации теста: {e}", exc_info=True)
         return {
-            'topic': topic,
-            'theory': theory,
-            'questions': questions[:5],
-            'sources': {
-                'textbooks': len(relevant_sections) > 0,
-                'external_knowledge': True,  # Всегда true при эскалации
-                'escalation_used': len(questions) < 5  # Флаг что использовалась эскалация
-            }
-        }
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка генерации теста: {e}")
-        return None
-        
-
-def has_question_variety(questions):
-    """Проверяет, достаточно ли разнообразны вопросы (ослабленные критерии)"""
-    if not questions or len(questions) < 3:
-        logger.warning(f"❌ Слишком мало вопросов: {len(questions) if questions else 0}")
-        return False
-    
-    # Ослабленные критерии для лучшей работы
-    question_texts = [q['question'].lower() for q in questions]
-    unique_words = set()
-    
-    for text in question_texts:
-        words = re.findall(r'\b\w{4,}\b', text)
-        unique_words.update(words)
-    
-    # Минимум 10 уникальных слов для 3+ вопросов
-    min_unique_words = 10
-    has_variety = len(unique_words) >= min_unique_words
-    
-    logger.info(f"🔍 Проверка разнообразия: {len(unique_words)} уникальных слов (требуется: {min_unique_words})")
-    
-    return has_variety
-
-def generate_question_batch(topic, relevant_sections, theory, question_type, count):
-    """Генерация партии вопросов с красиво оформленными объяснениями"""
-    prompt = f"""
-СОЗДАЙ {count} КАЧЕСТВЕННЫХ ВОПРОСОВ С КРАСИВЫМИ ОБЪЯСНЕНИЯМИ ПО ТЕМЕ: "{topic}"
-
-ТЕОРЕТИЧЕСКАЯ СПРАВКА:
-{theory}
-
-ТИП ВОПРОСОВ: {question_type.upper()}
-
-ОСОБЫЕ ТРЕБОВАНИЯ К ОБЪЯСНЕНИЯМ:
-Объяснение должно быть:
-✅ **Структурированным** - с четкими пунктами
-🎯 **Понятным** - простым языком  
-💡 **Полезным** - с практическими советами
-📚 **Обучающим** - углубляет понимание
-
-ФОРМАТ ОБЪЯСНЕНИЯ:
-- Начинай с подтверждения правильности ответа
-- Объясни почему ответ верный
-- Приведи пример из реальной жизни
-- Дай дополнительный полезный совет
-- Укажи связь с теорией
-
-ПРИМЕР ХОРОШЕГО ОБЪЯСНЕНИЯ:
-"✅ **Правильно!** Этот ответ верный, потому что...
-
-🎯 **Основная причина:**
-Согласно руководству, это помогает защитить ваши данные...
-
-💡 **Практический пример:**
-Представьте, что вы создаете пароль для почты...
-
-📚 **Дополнительный совет:**
-Всегда используйте разные пароли для разных сервисов..."
-
-ФОРМАТ ОТВЕТА (ТОЛЬКО JSON):
-{{
-    "questions": [
-        {{
-            "question": "Текст вопроса...",
-            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
-            "correct_answer": 0,
-            "explanation": "Красиво оформленное объяснение с эмодзи и структурой..."
-        }}
-    ]
-}}
-
-
-"""
-
-    try:
-        response = gigachat_service.client.chat(prompt)
-        content = response.choices[0].message.content
-        
-
-
-        content = re.sub(r'^```json\s*', '', content)
-        content = re.sub(r'\s*```$', '', content)
-        
-        questions = parse_questions_json(content)
-        
-        # Дополнительно форматируем объяснения
-        for question in questions:
-            if 'explanation' in question:
-                question['explanation'] = format_explanation_text(question['explanation'])
-        
-        return questions
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка генерации вопросов типа {question_type}: {e}")
-        return []
-    
-
-def has_good_formatting(text):
-    """Проверка, хорошо ли отформатирован текст"""
-    if not text:
-        return False
-    
-    # Проверяем наличие элементов хорошего форматирования
-    formatting_indicators = [
-        r'\n\n',  # Двойные переносы строк (абзацы)
-        r'\*\\*',  # Жирный текст
-        r'[🎯💡📚⚠️✅🌟📖🛠️]',  # Эмодзи
-        r'\d+\.',  # Нумерованные списки
-        r'[-•]',   # Маркированные списки
-    ]
-    
-    score = 0
-    for indicator in formatting_indicators:
-        if re.search(indicator, text):
-            score += 1
-    
-    # Проверяем длину абзацев (не должно быть очень длинных строк)
-    lines = text.split('\n')
-    long_lines = sum(1 for line in lines if len(line) > 150)
-    paragraph_ratio = long_lines / len(lines) if lines else 1
-    
-    return score >= 2 and paragraph_ratio < 0.5  # Хорошее форматирование если есть несколько индикаторов и мало длинных строк
-
-
-def format_sections_for_analysis(relevant_sections):
-    """Форматирование разделов для контекстного анализа с безопасным доступом"""
-    formatted = []
-    for i, section in enumerate(relevant_sections[:3], 1):
-        # Безопасный доступ к данным
-        title = safe_get_section_data(section, 'title', 'Без названия')
-        content = safe_get_section_data(section, 'content', '')
-        guide_source = safe_get_section_data(section, 'guide_source', 'unknown')
-        
-        # Очищаем текст для лучшего понимания контекста
-        clean_content = clean_text_for_context(content)
-        formatted.append(f"РАЗДЕЛ {i} [Источник: {guide_source}]: {title}\n{clean_content}")
-    
-    return "\n\n".join(formatted) if formatted else "В разделах нет информации по теме."
-
-def clean_text_for_context(text):
-    """Очистка текста для лучшего понимания контекста"""
-    # Убираем технические артефакты, оставляем смысловое содержание
-    lines = text.split('\n')
-    clean_lines = []
-    
-    for line in lines:
-        line = line.strip()
-        # Убираем слишком короткие строки (возможно, артефакты)
-        if len(line) < 10:
-            continue
-        # Убираем строки, состоящие в основном из цифр и символов
-        if re.match(r'^[\d\s\.\-]+$', line):
-            continue
-        # Убираем повторяющиеся фразы
-        if line in clean_lines:
-            continue
-            
-        clean_lines.append(line)
+            'status': 'error',
+            'error': 'Произошла ошибка при создании теста. Попробуйте еще раз.'
+        }, 500
+    finally:
+        if topic_token is not None:
+            reset_topic(topic_token)
     
-    return ' '.join(clean_lines[:500])  # Ограничиваем длину
-
-def parse_questions_json(content):
-    """Парсинг JSON с вопросами - УЛУЧШЕННАЯ ВЕРСИЯ"""
-    try:
-        # Очищаем JSON более тщательно
-        cleaned = clean_json_string(content)
-        
-        # Удаляем возможные markdown-блоки кода
-        cleaned = re.sub(r'```json\s*', '', cleaned)
-        cleaned = re.sub(r'```\s*', '', cleaned)
-        
-        # Ищем JSON структуру - более надежный метод
-        json_pattern = r'\{(?:[^{}]|(?:\{(?:[^{}]|(?:\{[^{}]*\}))*\}))*\}'
-        matches = re.findall(json_pattern, cleaned, re.DOTALL)
-        
-        if not matches:
-            logger.warning("❌ JSON структура не найдена в ответе")
-            return []
-            
-        # Пробуем каждый найденный JSON
-        for json_str in matches:
-            try:
-                # Дополнительная очистка
-                json_str = json_str.strip()
-                if not json_str.startswith('{'):
-                    continue
-                    
-                data = json.loads(json_str)
-                
-                # Проверяем структуру
-                if 'questions' in data and isinstance(data['questions'], list):
-                    questions = data['questions']
-                    validated_questions = []
-                    
-                    for i, q in enumerate(questions):
-                        if validate_question_quality(q):
-                            validated_questions.append({
-                                'id': i,
-                                'question': q['question'],
-                                'options': q['options'][:4],  # Обеспечиваем 4 варианта
-                                'correct_answer': min(q.get('correct_answer', 0), 3),  # Обеспечиваем корректный индекс
-                                'explanation': q.get('explanation', 'Объяснение основано на материалах учебников.')
-                            })
-                    
-                    logger.info(f"✅ Успешно распарсено {len(validated_questions)} вопросов")
-                    return validated_questions
-                    
-            except json.JSONDecodeError as e:
-                logger.warning(f"⚠️ Ошибка декодирования JSON: {e}")
-                continue
-            except Exception as e:
-                logger.warning(f"⚠️ Ошибка обработки JSON: {e}")
-                continue
-        
-        logger.error("❌ Ни один JSON не прошел валидацию")
-        return []
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка парсинга вопросов: {e}")
-        return []
-
 
-def generate_additional_questions(topic, existing_questions, count_needed):
-    """Генерация дополнительных вопросов если не хватает"""
-    if count_needed <= 0:
-        return []
     
-    try:
-        prompt = f"""
-СОЗДАЙ ЕЩЕ {count_needed} ВОПРОСОВ ДЛЯ ТЕСТА ПО ТЕМЕ: "{topic}"
-
-УЖЕ СУЩЕСТВУЮЩИЕ ВОПРОСЫ (НЕ ПОВТОРЯЙ ИХ):
-{chr(10).join([q['question'] for q in existing_questions])}
-
-СОЗДАЙ {count_needed} НОВЫХ ВОПРОСОВ, КОТОРЫЕ НЕ ПОВТОРЯЮТСЯ С ВЫШЕПЕРЕЧИСЛЕННЫМИ.
-
-ФОРМАТ ОТВЕТА (ТОЛЬКО JSON):
-{{
-    "questions": [
-        {{
-            "question": "Текст нового вопроса...",
-            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
-            "correct_answer": 0,
-            "explanation": "Объяснение..."
-        }}
-        // ... всего {count_needed} вопросов
-    ]
-}}
-"""
-
-        response = gigachat_service.client.chat(prompt)
-        content = response.choices[0].message.content
-        
-        content = re.sub(r'^```json\s*', '', content)
-        content = re.sub(r'\s*```$', '', content)
-        
-        additional_questions = parse_questions_json(content)
-        
-        # Очищаем объяснения
-        for question in additional_questions:
-            if 'explanation' in question:
-                question['explanation'] = clean_markdown_symbols(question['explanation'])
-        
-        logger.info(f"✅ Сгенерировано {len(additional_questions)} дополнительных вопросов")
-        return additional_questions[:count_needed]
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка генерации дополнительных вопросов: {e}")
-        return []
 
 
-def validate_question_quality(question):
-    """Валидация качества вопроса"""
-    if not isinstance(question, dict):
-        return False
-        
-    required = ['question', 'options']
-    if not all(field in question for field in required):
-        return False
-    
-    # Проверяем, что вопрос не слишком короткий
-    if len(question['question']) < 10:
-        return False
-    
-    # Проверяем, что есть варианты ответов
-    options = question['options']
-    if not isinstance(options, list) or len(options) != 4:
-        return False
-    
-    # Проверяем, что варианты разные
-    if len(set(options)) < 3:
-        return False
-    
-    # Проверяем, что вопрос осмысленный (не содержит только технические термины без контекста)
-    if is_meaningless_question(question['question']):
-        return False
         
-    return True
-
-def is_meaningless_question(question):
-    """Проверка, является ли вопрос бессмысленным"""
-    meaningless_patterns = [
-        r'сколько.*кнопок',
-        r'какого.*цвета',
-        r'что такое.*\?$',
-        r'как называется.*\?$',
-        r'упоминается ли.*\?$'
-    ]
-    
-    question_lower = question.lower()
-    for pattern in meaningless_patterns:
-        if re.search(pattern, question_lower):
-            return True
-    
-    return False
-
-def is_low_quality_theory(theory):
-    """Проверка качества теоретической справки"""
-    # Проверяем длину
-    if len(theory) < 150:
-        return True
-    
-    # Проверяем наличие списков и перечислений (признак низкого качества)
-    if theory.count('-') > 3 or theory.count('•') > 3:
-        return True
-    
-    # Проверяем, что это не просто набор фактов
-    sentences = re.split(r'[.!?]+', theory)
-    if len(sentences) < 4:
-        return True
-    
-    return False
-
 
 
-def create_meaningful_theory(topic, relevant_sections):
-    """Создание осмысленной теоретической справки вручную"""
-    if not relevant_sections:
-        return f"Тема '{topic}' рассматривается в руководстве по цифровой грамотности. Рекомендуется изучить соответствующие разделы для получения практических навыков."
-    
-    # Анализируем содержание разделов для создания осмысленного объяснения
-    key_concepts = extract_key_concepts(relevant_sections, topic)
-    
-    if key_concepts:
-        theory = f"В руководстве рассматривается тема '{topic}' в контексте {key_concepts[0]}. "
-        if len(key_concepts) > 1:
-            theory += f"Основное внимание уделяется {', '.join(key_concepts[1:3])}. "
-        theory += "Эти знания помогут вам уверенно использовать компьютер в повседневных задачах."
-    else:
-        theory = f"Тема '{topic}' важна для освоения цифровой грамотности. В руководстве представлены практические рекомендации по использованию соответствующих технологий в бытовых ситуациях."
-    
-    return theory
-
-def extract_key_concepts(relevant_sections, topic):
-    """Извлечение ключевых концепций из разделов"""
-    concepts = set()
     
-    for section in relevant_sections[:2]:
-        content = section['content'].lower()
-        
-        # Ищем смысловые конструкции
-        sentences = re.split(r'[.!?]+', content)
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if len(sentence) > 30 and topic.lower() in sentence:
-                # Извлекаем ключевые фразы
-                words = re.findall(r'\b[\w]{5,}\b', sentence)
-                if len(words) > 3:
-                    concept = ' '.join(words[:3])
-                    concepts.add(concept)
-    
-    return list(concepts)[:5]
-
-
 
 
-def clean_json_string(json_string):
-    """Очистка JSON строки"""
-    replacements = {
-        '“': '"', '”': '"', '„': '"', '«': '"', '»': '"',
-        '‘': "'", '’': "'", '`': "'", '´': "'",
-        '“': '"', '”': '"', '«': '"', '»': '"',
-        '‘': "'", '’': "'", '`': "'",
-        ' ': ' ', '\\"': '"', "\\'": "'"
-    }
-    
-    cleaned = json_string
-    for wrong, correct in replacements.items():
-        cleaned = cleaned.replace(wrong, correct)
-    
-    return cleaned
-
-def get_relevant_sections(topic):
-    """Получение релевантных разделов из ВСЕХ учебников по теме"""
-    try:
-        sections = db.get_guide_sections(limit=300)
-        relevant = []
-        
-        topic_lower = topic.lower()
-        topic_words = [word for word in topic_lower.split() if len(word) > 2]
-        
-        logger.info(f"🔍 Расширенный поиск по теме '{topic}' во всех учебниках: проверяем {len(sections)} разделов")
-        
-        # Добавляем синонимы для популярных тем
-        topic_synonyms = get_topic_synonyms(topic)
-        all_search_terms = [topic_lower] + topic_synonyms
-        
-        for section in sections:
-            # Безопасный доступ к данным
-            title = safe_get_section_data(section, 'section_title', '').lower()
-            content = safe_get_section_data(section, 'section_content', '').lower()
-            guide_source = safe_get_section_data(section, 'guide_source', 'unknown')
-            
-            score = 0
-            
-            # Повышаем вес, если тема есть в заголовке
-            for search_term in all_search_terms:
-            
-                if search_term in title:
-                    score += 30
-            
-            
-                if search_term in content:
-                    score += 10
-                    
-            # Учитываем отдельные слова
-            for word in topic_words:
-                if word in title:
-                    score += 8
-                if word in content:
-                    score += 3
-            
-            # Дополнительные баллы за релевантность источнику
-            if any(source in guide_source.lower() for source in ['horizont', 'guide_2']):
-                score += 5
-            
-            # Снижаем порог релевантности для лучшего покрытия
-            if score >= 1:
-                relevant.append({
-                    'title': safe_get_section_data(section, 'section_title', 'Без названия'),
-                    'content': safe_get_section_data(section, 'section_content', ''),
-                    'score': score,
-                    'page': safe_get_section_data(section, 'page_number', 0),
-                    'guide_source': guide_source
-                })
-        
-        relevant.sort(key=lambda x: x['score'], reverse=True)
-        
-        logger.info(f"📚 По теме '{topic}' найдено разделов: {len(relevant)}")
-        
-        # Безопасное получение источников
-        sources_used = set()
-        for section in relevant[:10]:
-            source = section.get('guide_source', 'unknown') if isinstance(section, dict) else 'unknown'
-            sources_used.add(source)
-        logger.info(f"📖 Источники: {sources_used}")
-        
-        for section in relevant[:3]:
-            logger.info(f"   - '{section['title']}' (источник: {section.get('guide_source', 'unknown')}, score: {section.get('score', 0)})")
-        
-        return relevant[:8]
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка поиска разделов: {e}")
-        return []
     
-@app.route('/api/check-full-test', methods=['POST'])
+@bp.route('/api/check-full-test', methods=['POST'])
 def check_full_test():
-    """Проверка всего теста из 5 вопросов"""
+    """Проверка всего теста из 5 вопросов по сохраненной на сервере сессии"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Ожидается JSON-объект с test_id и user_answers'}), 400
+        test_id = data.get('test_id')
         user_answers = data.get('user_answers', [])
-        test_data = data.get('test_data', {})
         
-        if not user_answers or not test_data:
+        if not test_id or not user_answers:
             return jsonify({'error': 'Данные не предоставлены'}), 400
+        if not isinstance(test_id, str) or not isinstance(user_answers, list):
+            return jsonify({'error': 'Нужны test_id (строка) и список user_answers'}), 400
+
+        session = get_test_sessions().get_test(test_id)
+        if not session:
+            return jsonify({'error': 'Тест не найден. Сгенерируйте тест заново.'}), 404
+
+        questions = session['test_data']['questions']
         
         # Проверяем каждый ответ
         results = []
         correct_count = 0
         
-        for i, user_answer in enumerate(user_answers):
-            question = test_data['questions'][i]
+        for i, question in enumerate(questions):
+            user_answer = user_answers[i] if i < len(user_answers) else None
             is_correct = (user_answer == question['correct_answer'])
             
             if is_correct:
@@ -1834,8 +592,23 @@ def check_full_test():
             })
         
         # Считаем оценку
-        total_questions = len(test_data['questions'])
+        total_questions = len(questions)
         score = int((correct_count / total_questions) * 100)
+
+        answered_count = sum(1 for answer in user_answers[:total_questions] if answer is not None)
+        # Повторная отправка того же теста (двойной клик, "Пройти тест заново")
+        # проверяется, но результат и ошибки ученика записываются один раз
+        first_check = get_test_sessions().record_result(test_id, answered_count, score)
+        if not first_check:
+            logger.info(f"📝 Тест {test_id} уже проверен: результат не записывается повторно")
+
+        learner_id = session['test_data'].get('learner_id')
+        if learner_id and first_check:
+            missed_ids = [question.get('bank_id') for question, result in zip(questions, results) if not result['is_correct']]
+            try:
+                get_question_bank().record_misses(learner_id, missed_ids)
+            except Exception as e:
+                logger.error(f"❌ Ошибка записи истории ученика: {e}")
         
         return jsonify({
             'status': 'success',
@@ -1846,662 +619,121 @@ def check_full_test():
         })
         
     except Exception as e:
-        logger.error(f"❌ Ошибка проверки полного теста: {e}")
-        return jsonify({'error': str(e)}), 500
-
-
-def check_textbook_coverage(topic, relevant_sections):
-    """Проверяет, достаточно ли информации в учебниках для темы"""
-    if not relevant_sections:
-        return False, "Нет информации в учебниках"
-    
-    # Анализируем содержание с безопасным доступом к полям
-    total_chars = 0
-    unique_sources = set()
-    
-    for section in relevant_sections:
-        # Безопасный доступ к полю content
-        content = section.get('content', '') if isinstance(section, dict) else ''
-        total_chars += len(content)
-        
-        # Безопасный доступ к полю guide_source
-        guide_source = section.get('guide_source', 'unknown') if isinstance(section, dict) else 'unknown'
-        unique_sources.add(guide_source)
-    
-    # Критерии достаточности информации
-    if total_chars < 200:
-        return False, f"Мало информации ({total_chars} символов)"
-    
-    if len(unique_sources) < 1:
-        return False, "Информация только из одного источника"
-    
-    # Проверяем глубину покрытия темы
-    topic_words = set(topic.lower().split())
-    coverage_score = 0
-    
-    for section in relevant_sections:
-        content = section.get('content', '') if isinstance(section, dict) else ''
-        content_lower = content.lower()
-        for word in topic_words:
-            if word in content_lower:
-                coverage_score += 1
-    
-    if coverage_score < len(topic_words):
-        return False, f"Неполное покрытие темы (score: {coverage_score})"
-    
-    return True, f"Достаточно информации ({total_chars} символов, {len(unique_sources)} источников)"
-
+        logger.error(f"❌ Ошибка проверки полного теста: {e}", exc_info=True)
+        return jsonify({'error': 'Произошла ошибка при проверке теста. Попробуйте еще раз.'}), 500
 
 
-def get_relevant_sections(topic):
-    """Получение релевантных разделов из БД по теме - РАСШИРЕННАЯ ВЕРСИЯ"""
-    try:
-        sections = db.get_guide_sections(limit=200)  # Увеличиваем лимит
-        relevant = []
-        
-        topic_lower = topic.lower()
-        topic_words = [word for word in topic_lower.split() if len(word) > 2]
-        
-        logger.info(f"🔍 Расширенный поиск по теме '{topic}': проверяем {len(sections)} разделов")
-        
-        # Добавляем синонимы для популярных тем
-        topic_synonyms = get_topic_synonyms(topic)
-        all_search_terms = [topic_lower] + topic_synonyms
-        
-        for section in sections:
-            title = section['section_title'].lower()
-            content = section['section_content'].lower()
-            
-            score = 0
-            
-            # Поиск по всем терминам (основной теме и синонимам)
-            for search_term in all_search_terms:
-                # Повышаем вес заголовков
-                if search_term in title:
-                    score += 25
-                if search_term in content:
-                    score += 10
-                    
-            # Учитываем отдельные слова
-            for word in topic_words:
-                if word in title:
-                    score += 8
-                if word in content:
-                    score += 3
-            
-            # Снижаем порог релевантности еще больше
-            if score >= 1:
-                relevant.append({
-                    'title': section['section_title'],
-                    'content': section['section_content'],
-                    'score': score,
-                    'page': section['page_number']
-                })
-        
-        relevant.sort(key=lambda x: x['score'], reverse=True)
-        
-        logger.info(f"📚 По теме '{topic}' найдено разделов: {len(relevant)}")
-        for section in relevant[:5]:
-            logger.info(f"   - '{section['title']}' (score: {section['score']}, {len(section['content'])} chars)")
-        
-        return relevant[:5]  # Возвращаем топ-5 результатов
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка поиска разделов: {e}")
-        return []
-
-def get_topic_synonyms(topic):
-    """Получение синонимов и связанных терминов для 5 основных тем"""
-    synonyms_map = {
-        'компьютер': [
-            'компьютер', 'пк', 'ноутбук', 'системный блок', 'монитор', 
-            'процессор', 'оперативная память', 'жесткий диск', 'клавиатура', 'мышь',
-            'windows', 'операционная система', 'рабочий стол', 'файлы', 'папки'
-        ],
-        'интернет': [
-            'интернет', 'сеть', 'online', 'браузер', 'веб', 'сайт', 'проводник',
-            'браузер', 'google', 'поиск', 'онлайн', 'соединение', 'wi-fi',
-            'роутер', 'модем', 'web', 'url', 'адрес', 'страница'
-        ],
-        'пароли': [
-            'пароль', 'пароли', 'безопасность', 'защита', 'авторизация',
-            'учетная запись', 'логин', 'доступ', 'код', 'pin',
-            'надежный пароль', 'сложность пароля', 'хранение паролей'
-        ],
-        'банковские карты': [
-            'банковская карта', 'карта', 'кредитная карта', 'дебетовая карта',
-            'платежная карта', 'банкомат', 'оплата картой', 'cvv', 'сvv',
-            'pin-код', 'платежная система', 'visa', 'mastercard', 'мир',
-            'банковские карты', 'банковские', 'карты', 'платежи'
-        ],
-        'электронная почта': [
-            'электронная почта', 'email', 'e-mail', 'почта', 'письмо',
-            'почтовый ящик', 'адрес почты', 'отправка писем', 'вложение',
-            'spam', 'спам', 'рассылка', 'переписка'
-        ]
-    }
     
-    # ФИКС: Нормализуем тему
-    topic_lower = topic.lower().strip()
-    
-    # Сначала проверяем точное соответствие
-    if topic_lower in synonyms_map:
-        return synonyms_map[topic_lower]
-    
-    # Затем проверяем частичные совпадения
-    for key, synonyms in synonyms_map.items():
-        if topic_lower in synonyms:
-            return synonyms
-    
-    return []
 
-def create_learning_prompt(topic, relevant_sections):
-    """Создание промпта для одного урока"""
-    
-    concrete_texts = []
-    for i, section in enumerate(relevant_sections[:2], 1):
-        concrete_text = section['content'][:500]
-        concrete_texts.append(f"РАЗДЕЛ {i} '{section['title']}':\n{concrete_text}")
-    
-    concrete_content = "\n\n".join(concrete_texts)
-    
-    prompt = f"""
-    ИСПОЛЬЗУЙ ТОЛЬКО ЭТУ ИНФОРМАЦИЮ ИЗ РУКОВОДСТВА:
-
-    {concrete_content}
-
-    ЗАПРЕЩЕНО:
-    - Придумывать информацию
-    - Использовать свои знания
-    - Давать общие фразы
-
-    ЗАДАЧА 1: ОБЪЯСНЕНИЕ ТЕМЫ "{topic.upper()}"
-    - Используй ТОЛЬКО факты из текста выше
-    - Цитируй КОНКРЕТНЫЕ фразы из руководства
-    - Объяснение: 3-4 предложения
-
-    ЗАДАЧА 2: ТЕСТОВЫЙ ВОПРОС
-    - Вопрос должен проверять КОНКРЕТНЫЙ факт из текста
-    - Варианты ответов должны быть основаны на тексте
-    - Только один вариант должен быть точной цитатой или прямым следствием из текста
-
-    ФОРМАТ ОТВЕТА (ТОЛЬКО JSON):
-    {{
-        "explanation": "Твое объяснение с ЦИТАТАМИ из текста...",
-        "quiz": {{
-            "question": "Конкретный вопрос по тексту выше...",
-            "options": ["вариант1", "вариант2", "вариант3", "вариант4"],
-            "correct_answer": 0,
-            "explanation": "Правильный ответ - вариант X, потому что в тексте сказано: 'ЦИТАТА ИЗ РУКОВОДСТВА'."
-        }}
-    }}
-
-    НАЧИНАЙ ОТВЕТ С {{"
-    """
-    
-    return prompt
 
-def parse_learning_response(response, topic, relevant_sections):
-    """Принудительный парсинг ответа с проверкой на использование данных"""
-    try:
-        cleaned_response = response.strip()
-        logger.info(f"🔧 Raw GigaChat response: {cleaned_response[:500]}...")
-        
-        # Исправляем "умные" кавычки перед парсингом JSON
-        cleaned_response = clean_json_string(cleaned_response)
-        
-        start = cleaned_response.find('{')
-        end = cleaned_response.rfind('}') + 1
-        
-        if start == -1 or end == 0:
-            raise ValueError("JSON не найден в ответе")
-            
-        json_str = cleaned_response[start:end]
-        data = json.loads(json_str)
-        
-        explanation = data.get('explanation', '')
-        
-        # ПРОВЕРКА: Объяснение должно содержать конкретные факты из руководства
-        if not contains_concrete_info(explanation, relevant_sections):
-            logger.warning("⚠️ GigaChat дал общее объяснение без конкретики!")
-            explanation = create_quality_explanation(topic, relevant_sections)
-        
-        quiz_data = data.get('quiz')
-        if not quiz_data:
-            return explanation, None
-            
-        quiz = validate_and_fix_quiz(quiz_data, topic, relevant_sections)
-        
-        return explanation, quiz
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка парсинга ответа: {e}")
-        return create_quality_explanation(topic, relevant_sections), create_quality_quiz(topic, relevant_sections)
+@bp.route('/api/check-full-test/batch', methods=['POST'])
+def check_full_test_batch():
+    """Пакетная проверка теста класса: ответы многих учеников на один сохраненный тест.
 
-def create_full_test_prompt(topic, relevant_sections):
-    """Создание промпта для полного теста из 10 вопросов"""
-    
-    concrete_texts = []
-    for i, section in enumerate(relevant_sections[:3], 1):
-        concrete_text = section['content'][:800]  # Увеличиваем объем для большего контекста
-        concrete_texts.append(f"РАЗДЕЛ {i} '{section['title']}':\n{concrete_text}")
-    
-    concrete_content = "\n\n".join(concrete_texts)
-    
-    prompt = f"""
-    ТЫ - ЭКСПЕРТ ПО СОЗДАНИЮ ТЕСТОВ. СОЗДАЙ ТЕСТ ИЗ 5 ВОПРОСОВ ПО ТЕМЕ "{topic.upper()}".
-
-    ИСПОЛЬЗУЙ ТОЛЬКО ЭТУ ИНФОРМАЦИЮ ИЗ РУКОВОДСТВА:
-
-    {concrete_content}
-
-    КРИТИЧЕСКИ ВАЖНЫЕ ПРАВИЛА:
-    1. НЕ придумывай информацию - используй ТОЛЬКО текст выше
-    2. Каждый вопрос должен проверять КОНКРЕТНЫЙ факт из руководства
-    3. Все 4 варианта ответа должны быть РАЗНЫМИ и ОСМЫСЛЕННЫМИ
-    4. Только один вариант должен быть ПРАВИЛЬНЫМ
-    5. НЕ используй общие фразы или свои знания
-
-    СТРУКТУРА ТЕСТА:
-
-    1. ТЕОРЕТИЧЕСКАЯ СПРАВКА (5-7 предложений):
-       - Краткое объяснение темы на основе руководства
-       - Используй КОНКРЕТНЫЕ факты из текста
-       - Цитируй ключевые моменты
-
-    2. 10 ВОПРОСОВ:
-       - Каждый вопрос = 4 разных варианта ответа
-       - Правильный ответ = точная цитата или прямое следствие из текста
-       - Неправильные ответы = правдоподобные, но неверные утверждения
-       - Вопросы должны охватывать РАЗНЫЕ аспекты темы
-
-    ПРИМЕР ПРАВИЛЬНОГО ВОПРОСА:
-    Вопрос: "Для чего используется клавиша Enter согласно руководству?"
-    Варианты: [
-        "Для подтверждения ввода команд",
-        "Для удаления текста", 
-        "Для включения caps lock",
-        "Для вызова диспетчера задач"
-    ]
-    Правильный ответ: 0
-
-    ФОРМАТ ОТВЕТА (СТРОГО СОБЛЮДАЙ):
-
-    {{
-        "theory": "Теоретическая справка с конкретными фактами из руководства...",
-        "questions": [
-            {{
-                "question": "Вопрос 1...",
-                "options": ["вариант1", "вариант2", "вариант3", "вариант4"],
-                "correct_answer": 0,
-                "explanation": "Объяснение с цитатой из руководства"
-            }},
-            {{
-                "question": "Вопрос 2...",
-                "options": ["вариант1", "вариант2", "вариант3", "вариант4"],
-                "correct_answer": 1,
-                "explanation": "Объяснение с цитатой из руководства"
-            }}
-            // ... еще 8 вопросов
-        ]
-    }}
-
-    ВАЖНО: Должно быть РОВНО 10 вопросов с РАЗНЫМИ вариантами ответов!
+    {"test_id": ..., "submissions": [{"user_id": "...", "answers": [0, 2, null, ...]}, ...]}
+    Возвращает оценки учеников и сложность вопросов (доля верных ответов и
+    выбор вариантов). Прогресс сессий теста не меняется.
     """
-    
-    return prompt
-
-def parse_learning_response(response, topic, relevant_sections):
-    """Принудительный парсинг ответа с проверкой на использование данных"""
-    try:
-        cleaned_response = response.strip()
-        logger.info(f"🔧 Raw GigaChat response: {cleaned_response[:500]}...")
-        
-        # Исправляем "умные" кавычки перед парсингом JSON
-        cleaned_response = clean_json_string(cleaned_response)
-        
-        start = cleaned_response.find('{')
-        end = cleaned_response.rfind('}') + 1
-        
-        if start == -1 or end == 0:
-            raise ValueError("JSON не найден в ответе")
-            
-        json_str = cleaned_response[start:end]
-        data = json.loads(json_str)
-        
-        explanation = data.get('explanation', '')
-        
-        # ПРОВЕРКА: Объяснение должно содержать конкретные факты из руководства
-        if not contains_concrete_info(explanation, relevant_sections):
-            logger.warning("⚠️ GigaChat дал общее объяснение без конкретики!")
-            explanation = create_quality_explanation(topic, relevant_sections)
-        
-        quiz_data = data.get('quiz')
-        if not quiz_data:
-            return explanation, None
-            
-        quiz = validate_and_fix_quiz(quiz_data, topic, relevant_sections)
-        
-        return explanation, quiz
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка парсинга ответа: {e}")
-        return create_quality_explanation(topic, relevant_sections), create_quality_quiz(topic, relevant_sections)
-
-def parse_full_test_response(response, topic, relevant_sections):
-    """Парсинг ответа для полного теста - ТОЛЬКО НЕЙРОСЕТЬЮ"""
-    try:
-        cleaned_response = response.strip()
-        cleaned_response = clean_json_string(cleaned_response)
-        
-        json_data = extract_json_from_text(cleaned_response)
-        
-        if not json_data:
-            logger.error("❌ Не удалось извлечь JSON из ответа")
-            # Вместо резервного теста пробуем сгенерировать нейросетью
-            return generate_contextual_test(topic, relevant_sections)
-        
-        theory = json_data.get('theory', '')
-        questions = json_data.get('questions', [])
-        
-        # Если вопросов меньше 5, генерируем еще нейросетью
-        if len(questions) < 5:
-            logger.warning(f"⚠️ В ответе только {len(questions)} вопросов, догенерируем нейросетью")
-            additional_questions = generate_contextual_questions(topic, relevant_sections, theory)
-            questions.extend(additional_questions)
-        
-        return {
-            'topic': topic,
-            'theory': theory,
-            'questions': questions[:5]  # Точно 5 вопросов
-        }
-    
-    
-    except Exception as e:
-        logger.error(f"❌ Ошибка парсинга полного теста: {e}")
-        # Вместо резервного теста пробуем сгенерировать нейросетью
-        return generate_contextual_test(topic, relevant_sections)
-    
-def extract_json_from_text(text):
-    """Извлечение JSON из текста разными методами"""
-    methods = [
-        extract_json_direct,
-        extract_json_with_regex,
-        extract_json_with_ast
-    ]
-    
-    for method in methods:
-        try:
-            result = method(text)
-            if result:
-                logger.info(f"✅ JSON извлечен методом: {method.__name__}")
-                return result
-        except Exception as e:
-            logger.warning(f"⚠️ Метод {method.__name__} не сработал: {e}")
-            continue
-    
-    return None
-
-def extract_json_direct(text):
-    """Прямое извлечение JSON"""
-    start = text.find('{')
-    end = text.rfind('}') + 1
-    
-    if start == -1 or end == 0:
-        return None
-        
-    json_str = text[start:end]
-    return json.loads(json_str)
-
-def extract_json_with_regex(text):
-    """Извлечение JSON с помощью регулярных выражений"""
-    import re
-    # Ищем структуру JSON
-    json_pattern = r'\{(?:[^{}]|(?:\{(?:[^{}]|(?:\{[^{}]*\}))*\}))*\}'
-    matches = re.findall(json_pattern, text, re.DOTALL)
-    
-    for match in matches:
-        try:
-            return json.loads(match)
-        except:
-            continue
-    
-    return None
-
-def extract_json_with_ast(text):
-    """Извлечение JSON с помощью ast (для Python-подобных структур)"""
     try:
-        # Пытаемся интерпретировать как Python dict
-        parsed = ast.literal_eval(text)
-        if isinstance(parsed, dict):
-            return parsed
-    except:
-        pass
-    
-    return None
-
-def clean_json_string(json_string):
-    """Очистка JSON строки от 'умных' кавычек и других проблемных символов"""
-    replacements = {
-        '“': '"', '”': '"', '„': '"', '«': '"', '»': '"',
-        '‘': "'", '’': "'", '`': "'", '´': "'",
-        '“': '"', '”': '"', '«': '"', '»': '"',
-        '‘': "'", '’': "'", '`': "'",
-        ' ': ' ', '\\"': '"', "\\'": "'"
-    }
-    
-    cleaned = json_string
-    for wrong, correct in replacements.items():
-        cleaned = cleaned.replace(wrong, correct)
-    
-    return cleaned
-
-def validate_question(question, question_id, topic, relevant_sections):
-    """Валидация и исправление вопроса"""
-
-    required_fields = ['question', 'options', 'correct_answer']
-
-    
-    # Проверяем options
-    options = question.get('options', [])
-    if not isinstance(options, list) or len(options) != 4:
-        options = create_quality_options(question_id, topic, relevant_sections)
-    
-    # Проверяем, что все варианты разные
-    if len(set(options)) < 3:  # Минимум 3 разных варианта
-        options = create_quality_options(question_id, topic, relevant_sections)
-    
-    # Проверяем correct_answer
-    correct_answer = question.get('correct_answer', 0)
-    if not isinstance(correct_answer, int) or not 0 <= correct_answer <= 3:
-        correct_answer = 0
-    
-    return {
-        'id': question_id,
-        'question': question.get('question', f'Вопрос {question_id + 1} по теме "{topic}"'),
-        'options': options,
-        'correct_answer': correct_answer,
-        'explanation': question.get('explanation', 'Объяснение основано на информации из руководства.')
-    }
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'status': 'error', 'error': 'Ожидается JSON-объект с test_id и submissions'}), 400
+        test_id = data.get('test_id')
+        submissions = data.get('submissions')
+
+        if not test_id or not isinstance(submissions, list) or not submissions:
+            return jsonify({'status': 'error', 'error': 'Нужны test_id и список submissions'}), 400
+        if len(submissions) > MAX_BATCH_SUBMISSIONS:
+            return jsonify({'status': 'error', 'error': f'Не больше {MAX_BATCH_SUBMISSIONS} ответов за запрос'}), 400
+        if not all(isinstance(item, dict) for item in submissions):
+            return jsonify({'status': 'error', 'error': 'Каждый элемент submissions - объект с answers'}), 400
+
+        session = get_test_sessions().get_test(str(test_id))
+        if not session:
+            return jsonify({'status': 'error', 'error': 'Тест не найден. Сгенерируйте тест заново.'}), 404
+
+        questions = session['test_data']['questions']
+        options_count = max((len(question['options']) for question in questions), default=0)
+        matrix = answer_matrix([item.get('answers') for item in submissions], len(questions), options_count)
+
+        started = time.perf_counter()
+        graded = grade_batch([question['correct_answer'] for question in questions], matrix, options_count)
+        seconds = time.perf_counter() - started
+        registry.inc('trainer_batch_graded_total', len(matrix), engine=graded['engine'])
+        logger.info(f"📝 Пакетная проверка теста {test_id}: {len(matrix)} учеников за {seconds * 1000:.1f} мс "
+                    f"({graded['engine']})")
+
+        scores = graded['scores']
+        return jsonify({
+            'status': 'success',
+            'test_id': test_id,
+            'total_questions': len(questions),
+            'results': [
+                {
+                    'user_id': item.get('user_id', index),
+                    'score': scores[index],
+                    'correct_count': graded['correct_counts'][index],
+                    'answered_count': graded['answered_counts'][index]
+                }
+                for index, item in enumerate(submissions)
+            ],
+            'questions': [
+                {
+                    'question_index': index,
+                    'question': question['question'],
+                    'correct_answer': question['correct_answer'],
+                    'correct_rate': graded['correct_rates'][index],
+                    'answered_rate': graded['answered_rates'][index],
+                    'option_counts': graded['option_counts'][index]
+                }
+                for index, question in enumerate(questions)
+            ],
+            'summary': {
+                'submissions': len(matrix),
+                'mean_score': round(sum(scores) / len(scores), 1),
+                'engine': graded['engine']
+            }
+        })
 
-def create_quality_full_test(topic, relevant_sections):
-    """Создание качественного теста при ошибках парсинга - ТОЛЬКО НЕЙРОСЕТЬЮ"""
-    try:
-        theory = generate_contextual_theory_for_test(topic, relevant_sections)
-        questions = generate_contextual_questions(topic, relevant_sections, theory)
-        
-        # Очищаем теорию от символов #
-        theory = clean_markdown_symbols(theory)
-        
-        return {
-            'topic': topic,
-            'theory': theory,
-            'questions': questions
-        }
     except Exception as e:
-        logger.error(f"❌ Ошибка создания качественного теста: {e}")
-        # Повторяем попытку
-        return create_quality_full_test(topic, relevant_sections)
-
-def create_quality_explanation(topic, relevant_sections):
-    """Создание качественного объяснения на основе данных из БД"""
-    if not relevant_sections:
-        return f"В руководстве есть информация по теме '{topic}', но она требует изучения."
-    
-    # Объединяем содержимое нескольких разделов
-    explanations = []
-    for section in relevant_sections[:2]:
-        content = section['content']
-        # Извлекаем осмысленные предложения
-        sentences = re.split(r'[.!?]+', content)
-        meaningful_sentences = [s.strip() for s in sentences if len(s.strip()) > 30][:2]
-        if meaningful_sentences:
-            explanations.extend(meaningful_sentences)
-    
-    if explanations:
-        explanation = " ".join(explanations[:3])
-        if len(explanation) > 500:
-            explanation = explanation[:500] + "..."
-    else:
-        # Используем первые абзацы из разделов
-        explanation_parts = []
-        for section in relevant_sections[:2]:
-            content = section['content']
-            if len(content) > 100:
-                explanation_parts.append(content[:200] + "...")
-        
-        explanation = " ".join(explanation_parts) if explanation_parts else f"Тема '{topic}' рассматривается в руководстве по цифровой грамотности."
-    
-    return explanation
-
-def create_detailed_explanation(topic, section, correct_idx):
-    """Создание детального пояснения для ответа"""
-    section_preview = section['content'][:150] + "..." if len(section['content']) > 150 else section['content']
-    
-    explanations = [
-        f"✅ Этот ответ правильный, потому что он соответствует информации из раздела '{section['title']}' (страница {section['page']}). В руководстве указано: '{section_preview}'",
-        
-        f"📚 Правильный ответ основан на материалах руководства. В разделе '{section['title']}' на странице {section['page']} объясняется: '{section_preview}'",
-        
-        f"🎯 Этот вариант верный, так как он точно отражает содержание руководства. Согласно разделу '{section['title']}': '{section_preview}'",
-        
-        f"💡 Да, это правильный ответ! В руководстве по цифровой грамотности в разделе '{section['title']}' (стр. {section['page']}) говорится: '{section_preview}'",
-        
-        f"🌟 Верно! Этот ответ соответствует информации из руководства. В разделе '{section['title']}' на странице {section['page']} указано: '{section_preview}'"
-    ]
-    
-    import random
-    return random.choice(explanations)
-
+        logger.error(f"❌ Ошибка пакетной проверки теста: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'error': 'Произошла ошибка при проверке тестов. Попробуйте еще раз.'}), 500
 
 
-def create_quality_options(question_id, topic, relevant_sections):
-    """Создание качественных вариантов ответов"""
-    return [
-        "Правильный ответ, основанный на руководстве",
-        "Неправильный вариант, не соответствующий руководству", 
-        "Ошибочное утверждение, которого нет в руководстве",
-        "Неверная информация, противоречащая руководству"
-    ]
-
+@bp.route('/api/check-answer', methods=['POST'])
+def check_answer():
+    """Проверка ответа на одиночный вопрос по сохраненному на сервере вопросу.
 
+    Браузер присылает только quiz_id и номер варианта: вопрос и правильный
+    ответ берутся из хранилища тестов (память процесса или user_sessions).
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'status': 'error', 'error': 'Ожидается JSON-объект с quiz_id и answer_index'}), 400
+    requested_id = data.get('quiz_id')
+    answer_index = data.get('answer_index')
 
-def contains_concrete_info(explanation, relevant_sections):
-    """Проверяет, содержит ли объяснение конкретную информацию из руководства"""
-    if not explanation:
-        return False
-        
-    guide_keywords = set()
-    for section in relevant_sections:
-        content_lower = section['content'].lower()
-        words = set(re.findall(r'\b\w{4,}\b', content_lower))
-        guide_keywords.update(words)
-    
-    explanation_lower = explanation.lower()
-    matches = sum(1 for word in guide_keywords if word in explanation_lower)
-    
-    logger.info(f"🔍 Проверка конкретики: {matches} совпадений с руководством")
-    return matches > 2
+    if not requested_id or not isinstance(answer_index, int) or isinstance(answer_index, bool):
+        return jsonify({'status': 'error', 'error': 'Нужны quiz_id и номер ответа'}), 400
 
-def validate_and_fix_quiz(quiz_data, topic, relevant_sections):
-    """Валидация и исправление теста"""
-    try:
-        required_fields = ['question', 'options', 'correct_answer', 'explanation']
-        for field in required_fields:
-            if field not in quiz_data:
-                raise ValueError(f"Отсутствует поле: {field}")
-        
-        if not isinstance(quiz_data['options'], list) or len(quiz_data['options']) != 4:
-            quiz_data['options'] = ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"]
-        
-        if not isinstance(quiz_data['correct_answer'], int) or not 0 <= quiz_data['correct_answer'] <= 3:
-            quiz_data['correct_answer'] = 0
-            
-        quiz = {
-            'id': f'quiz_{hash(topic)}',
-            'question': quiz_data['question'],
-            'options': quiz_data['options'],
-            'correct_answer': quiz_data['correct_answer'],
-            'explanation': quiz_data['explanation']
-        }
-        
-        return quiz
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка валидации теста: {e}")
-        return create_quality_quiz(topic, relevant_sections)
+    quiz = get_test_sessions().get_quiz(str(requested_id))
+    if quiz is None:
+        return jsonify({'status': 'error', 'error': 'Вопрос не найден. Изучите тему заново.'}), 404
 
-def create_quality_quiz(topic, relevant_sections):
-    """Создаем качественный тест на основе данных"""
-    first_section = relevant_sections[0] if relevant_sections else None
-    
-    if first_section:
-        content = first_section['content']
-        sentences = re.split(r'[.!?]+', content)
-        meaningful_sentences = [s.strip() for s in sentences if len(s.strip()) > 30]
-        
-        if meaningful_sentences:
-            correct_answer = meaningful_sentences[0]
-        else:
-            correct_answer = content[:100]
-        
-        quiz = {
-            'id': 'quality_quiz',
-            'question': f'Что говорится в руководстве о теме "{topic}"?',
-            'options': [
-                correct_answer[:80] + "...",
-                "Информация не соответствует руководству",
-                "Это распространенное заблуждение", 
-                "Данные отсутствуют в руководстве"
-            ],
-            'correct_answer': 0,
-            'explanation': f'Правильный ответ основан на информации из раздела "{first_section["title"]}" руководства.'
-        }
-    else:
-        quiz = {
-            'id': 'fallback_quiz',
-            'question': f'Вопрос по теме "{topic}":',
-            'options': [
-                "Правильный вариант",
-                "Неправильный вариант",
-                "Ошибочное утверждение",
-                "Неверная информация"
-            ],
-            'correct_answer': 0,
-            'explanation': 'Этот вопрос проверяет знания по указанной теме.'
+    return jsonify({
+        'status': 'success',
+        'result': {
+            'is_correct': answer_index == quiz['correct_answer'],
+            'correct_answer': quiz['correct_answer'],
+            'explanation': quiz.get('explanation', 'Объяснение отсутствует')
         }
-    
-    return quiz
-
+    })
 
 
-@app.route('/api/debug-sections')
+@bp.route('/api/debug-sections')
 def debug_sections():
     """Отладочный эндпоинт для просмотра распарсенных разделов"""
-    if not db:
-        return jsonify({'error': 'БД не инициализирована'}), 500
-        
-    sections = db.get_guide_sections(limit=10)
+    sections = get_database().get_guide_sections(limit=10)
     result = []
     
     for section in sections:
@@ -2520,12 +752,12 @@ def debug_sections():
         'sections': result
     })
 
-@app.route('/api/debug-topic-search')
+@bp.route('/api/debug-topic-search')
 def debug_topic_search():
     """Отладочный поиск по теме"""
     topic = request.args.get('topic', 'компьютер')
     
-    sections = db.get_guide_sections(limit=20)
+    sections = get_database().get_guide_sections(limit=20)
     relevant = get_relevant_sections(topic)
     
     result = {
@@ -2546,393 +778,73 @@ def debug_topic_search():
     return jsonify(result)
 
 
+@bp.route('/api/status')
+def status():
+    """Статус системы: доступность GigaChat и загруженность учебников.
 
-def generate_deep_context_explanation(topic, relevant_sections):
-    """Генерация глубокого контекстного объяснения - С ФОРМАТИРОВАНИЕМ"""
-    
-    prompt = f"""
-ТЫ - ЭКСПЕРТ-ПРЕПОДАВАТЕЛЬ ПО ЦИФРОВОЙ ГРАМОТНОСТИ. ДАЙ КАЧЕСТВЕННОЕ ОБЪЯСНЕНИЕ ПО ТЕМЕ: "{topic.upper()}"
-
-КОНКРЕТНЫЙ МАТЕРИАЛ ИЗ РУКОВОДСТВА:
-{format_concrete_sections(relevant_sections)}
-ТВОЯ ЗАДАЧА:
-СОСТАВЬ СТРУКТУРИРОВАННОЕ ОБЪЯСНЕНИЕ С ЧЕТКОЙ СТРУКТУРОЙ:
-
-Основная концепция:
-- Кратко объясни суть темы
-
-Как это работает:
-- Опиши механизм работы
-- Используй конкретные примеры из руководства
-
-Практическое применение:
-- Как именно использовать на практике
-- Пошаговые рекомендации
-
-Важные моменты:
-- Ключевые аспекты для запоминания
-- Частые ошибки и как их избежать
-
-ТРЕБОВАНИЯ К ФОРМАТУ:
-- Используй заголовки с двоеточием в конце
-- Используй маркированные списки через дефис
-- Выделяй **важные термины** двойными звездочками
-- Разделяй блоки пустыми строками
-- Давай конкретные примеры из руководства
-
-ОТВЕЧАЙ ТОЛЬКО ТЕКСТОМ ОБЪЯСНЕНИЯ, без вступлений и заключений.
-"""
-    
+    Содержимое меняется редко, поэтому ETag считается по нему и неизменный
+    статус отдается 304 без тела. Счетчики, которые меняются с каждым
+    запросом, - в /api/stats.
+    """
+    sections_count = 0
     try:
-        # УБЕРИТЕ max_tokens - этот параметр не поддерживается
-        response = gigachat_service.client.chat(prompt)
-        explanation = response.choices[0].message.content.strip()
-        
-        # Проверяем и улучшаем качество
-        explanation = enhance_explanation_quality(explanation, topic, relevant_sections)
-        
-        return explanation
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка генерации объяснения: {e}")
-        return create_specific_explanation(topic, relevant_sections)
-
-def format_concrete_sections(relevant_sections):
-    """Форматирование КОНКРЕТНЫХ разделов с извлечением смысла"""
-    concrete_parts = []
-    
-    for i, section in enumerate(relevant_sections[:4], 1):
-        # Извлекаем конкретные предложения по теме
-        specific_content = extract_specific_content(section['content'])
-        if specific_content:
-            concrete_parts.append(f"--- РАЗДЕЛ {i}: {section['title']} ---\n{specific_content}")
-    
-    return "\n\n".join(concrete_parts) if concrete_parts else "В разделах есть общая информация по теме."
-
-def extract_specific_content(text):
-    """Извлечение конкретного содержательного контента"""
-    sentences = re.split(r'[.!?]+', text)
-    relevant_sentences = []
-    
-    for sentence in sentences:
-        sentence = sentence.strip()
-        # Отбираем только содержательные предложения
-        if (len(sentence) > 25 and 
-            not re.match(r'^[\\d\\s\\-\\.]+$', sentence) and
-            'оглавление' not in sentence.lower() and
-            'страница' not in sentence.lower()):
-            relevant_sentences.append(sentence)
-    
-    # Ограничиваем количество, но обеспечиваем качество
-    return '. '.join(relevant_sentences[:8]) + '.'
-
-def analyze_topic_specifics(topic, relevant_sections):
-    """Анализ специфики темы для лучшего контекста"""
-    all_content = " ".join([section['content'] for section in relevant_sections[:3]])
-    
-    # Анализируем, о чем конкретно говорится в контексте темы
-    analysis_parts = []
-    
-    # Ищем конкретные применения
-    usage_patterns = [
-        r'для чего (используется|применяется)[^.!?]*' + re.escape(topic),
-        r'как (работает|использовать)[^.!?]*' + re.escape(topic),
-        r'функции[^.!?]*' + re.escape(topic),
-        topic + r' (позволяет|нужен|помогает)[^.!?]*'
-    ]
-    
-    for pattern in usage_patterns:
-        matches = re.findall(pattern, all_content.lower())
-        if matches:
-            analysis_parts.append(f"Найдено применение: {matches[0][:100]}...")
-    
-    # Ищем конкретные инструкции
-    instruction_patterns = [
-        r'как (настроить|установить|подключить)[^.!?]*' + re.escape(topic),
-        r'правила?[^.!?]*' + re.escape(topic),
-        r'советы?[^.!?]*' + re.escape(topic)
-    ]
-    
-    for pattern in instruction_patterns:
-        if re.search(pattern, all_content.lower()):
-            analysis_parts.append("Есть конкретные инструкции по использованию")
-            break
-    
-    return "; ".join(analysis_parts) if analysis_parts else "Общая информация о теме"
-
-def enhance_explanation_quality(explanation, topic, relevant_sections):
-    """Улучшение качества объяснения"""
-    # Проверяем длину
-    if len(explanation) < 150:
-        logger.warning("⚠️ Объяснение слишком короткое, добавляем детали")
-        explanation = add_specific_details(explanation, topic, relevant_sections)
-    
-    # Проверяем конкретику
-    if not has_specific_details(explanation):
-        logger.warning("⚠️ Объяснение слишком общее, добавляем конкретику")
-        explanation = create_specific_explanation(topic, relevant_sections)
-    
-    # Очищаем текст
-    explanation = clean_text_response(explanation)
-    
-    return explanation
-
-def has_specific_details(text):
-    """Проверка наличия конкретных деталей"""
-    # Ищем конкретные глаголы и инструкции
-    specific_indicators = [
-        'нажать', 'выбрать', 'перетащить', 'щелкнуть', 'открыть',
-        'закрыть', 'настроить', 'использовать', 'подключить',
-        'левая кнопка', 'правая кнопка', 'колесико', 'курсор'
-    ]
-    
-    text_lower = text.lower()
-    return any(indicator in text_lower for indicator in specific_indicators)
-
-def add_specific_details(explanation, topic, relevant_sections):
-    """Добавление конкретных деталей к объяснению"""
-    # Извлекаем конкретные факты из разделов
-    specific_facts = extract_specific_facts(topic, relevant_sections)
-    
-    if specific_facts:
-        return explanation + " " + " ".join(specific_facts[:2])
-    else:
-        return create_specific_explanation(topic, relevant_sections)
-
-def extract_specific_facts(topic, relevant_sections):
-    """Извлечение конкретных фактов по теме"""
-    facts = []
-    
-    for section in relevant_sections[:2]:
-        content = section['content']
-        sentences = re.split(r'[.!?]+', content)
-        
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if (len(sentence) > 30 and 
-                topic.lower() in sentence.lower() and
-                any(keyword in sentence.lower() for keyword in ['кнопка', 'меню', 'файл', 'папка', 'окно', 'экран'])):
-                facts.append(sentence)
-    
-    return facts[:3]  # Возвращаем не более 3 фактов
-
-def create_specific_explanation(topic, relevant_sections):
-    """Создание конкретного объяснения на основе данных"""
-    if not relevant_sections:
-        return f"В руководстве рассматривается тема '{topic}'. Рекомендуется изучить соответствующие разделы для получения подробной информации."
-    
-    # Собираем конкретные детали из разделов
-    specific_details = []
-    
-    for section in relevant_sections[:2]:
-        # Ищем предложения с конкретными действиями
-        sentences = re.split(r'[.!?]+', section['content'])
-        for sentence in sentences:
-            if (topic.lower() in sentence.lower() and 
-                len(sentence) > 40 and
-                any(verb in sentence.lower() for verb in ['нажать', 'выбрать', 'открыть', 'закрыть', 'перейти'])):
-                specific_details.append(sentence.strip())
-    
-    if specific_details:
-        base = f"Согласно руководству, {topic} используется следующим образом: "
-        return base + " ".join(specific_details[:2])
-    else:
-        # Используем заголовки разделов для контекста
-        sections_context = ", ".join([section['title'] for section in relevant_sections[:2]])
-        return f"Тема '{topic}' рассматривается в разделах {sections_context}. В руководстве представлены практические рекомендации по работе с этим инструментом."
-
-def clean_text_response(text):
-    """Очистка текстового ответа"""
-    # Убираем HTML-теги
-    text = re.sub(r'<[^>]+>', '', text)
-    # Убираем лишние пробелы
-    text = re.sub(r'\s+', ' ', text)
-    # Убираем проблемы с кодировкой (заменяем странные символы)
-    text = re.sub(r'[^\w\sа-яА-ЯёЁ.,!?;:()-]', '', text)
-    return text.strip()
-
-def format_sections_for_deep_analysis(relevant_sections):
-    """Форматирование разделов для глубокого контекстного анализа"""
-    formatted = []
-    for i, section in enumerate(relevant_sections[:3], 1):
-        # Берем больше контекста для глубокого анализа
-        meaningful_content = extract_meaningful_content(section['content'])
-        formatted.append(f"РАЗДЕЛ {i}: {section['title']}\n{meaningful_content}")
-    
-    return "\n\n" + "="*50 + "\n\n".join(formatted) + "\n" + "="*50
-
-def extract_meaningful_content(text, max_length=800):
-    """Извлечение осмысленного контента с сохранением контекста"""
-    # Разбиваем на предложения
-    sentences = re.split(r'[.!?]+', text)
-    meaningful_sentences = []
-    
-    for sentence in sentences:
-        sentence = sentence.strip()
-        # Отбираем содержательные предложения (не слишком короткие и не технический мусор)
-        if (len(sentence) > 20 and 
-            not re.match(r'^[\d\s\-\.]+$', sentence) and
-            not any(word in sentence.lower() for word in ['оглавление', 'страница', 'глава'])):
-            meaningful_sentences.append(sentence)
-    
-    # Объединяем, ограничивая длину
-    result = '. '.join(meaningful_sentences[:15]) + '.'
-    if len(result) > max_length:
-        result = result[:max_length] + "..."
-    
-    return result
-
-def clean_explanation_text(text):
-    """Очистка текста объяснения от HTML и лишнего форматирования"""
-    # Убираем HTML-теги
-    text = re.sub(r'<[^>]+>', '', text)
-    # Убираем маркеры JSON
-    text = re.sub(r'[{}[\]"]', '', text)
-    # Убираем лишние пробелы
-    text = re.sub(r'\s+', ' ', text)
-    # Убираем фразы про JSON
-    text = re.sub(r'json\s*:', '', text, flags=re.IGNORECASE)
-    
-    return text.strip()
-
-def is_low_quality_explanation(explanation):
-    """Проверка качества объяснения"""
-    if len(explanation) < 200:
-        return True
-    
-    # Проверяем на перечисление фактов без объяснения
-    sentences = re.split(r'[.!?]+', explanation)
-    if len(sentences) < 5:
-        return True
-    
-    # Проверяем на наличие глубоких объяснительных конструкций
-    deep_patterns = [
-        r'помогает', r'позволяет', r'нужно чтобы', r'важно потому что',
-        r'как если бы', r'представьте что', r'это похоже на'
-    ]
-    
-    explanation_lower = explanation.lower()
-    deep_matches = sum(1 for pattern in deep_patterns if re.search(pattern, explanation_lower))
-    
-    return deep_matches < 2
-
-def create_quality_context_explanation(topic, relevant_sections):
-    """Создание качественного контекстного объяснения на основе данных"""
-    if not relevant_sections:
-        return f"Тема '{topic}' рассматривается в руководстве по цифровой грамотности. Это важный аспект, который поможет вам лучше понимать работу с компьютерными технологиями."
-    
-    # Анализируем содержание для создания осмысленного объяснения
-    context_keywords = analyze_context_keywords(relevant_sections, topic)
-    
-    if context_keywords:
-        explanation = f"В руководстве тема '{topic}' рассматривается в контексте {context_keywords['primary_context']}. "
-        explanation += f"Основное внимание уделяется {context_keywords['key_aspects']}. "
-        explanation += f"Это помогает пользователям {context_keywords['practical_benefit']}. "
-        explanation += "Понимание этой темы сделает работу с компьютером более комфортной и эффективной."
-    else:
-        explanation = f"Тема '{topic}' - важный элемент цифровой грамотности. В руководстве представлены практические рекомендации по использованию этого инструмента в повседневных задачах, что поможет вам стать более уверенным пользователем."
-    
-    return explanation
-
-def analyze_context_keywords(relevant_sections, topic):
-    """Анализ ключевых слов контекста"""
-    all_content = " ".join([section['content'] for section in relevant_sections[:2]])
-    content_lower = all_content.lower()
-    
-    # Ищем контекстные паттерны
-    patterns = {
-        'primary_context': find_primary_context(content_lower, topic),
-        'key_aspects': find_key_aspects(content_lower, topic),
-        'practical_benefit': find_practical_benefit(content_lower, topic)
-    }
-    
-    return patterns
-
-def find_primary_context(content, topic):
-    """Поиск основного контекста"""
-    context_indicators = [
-        r'для\s+\w+\s+нужно', r'используется\s+для', r'позволяет',
-        r'с\s+помощью', r'при\s+работе'
-    ]
-    
-    for indicator in context_indicators:
-        matches = re.findall(f"{indicator}[^.!?]*{topic}[^.!?]*[.!?]", content)
-        if matches:
-            # Берем первое совпадение и очищаем
-            match = matches[0]
-            return clean_context_phrase(match)
+        sections = get_database().get_guide_sections(limit=1)
+        sections_count = len(sections)
+    except:
+        sections_count = 0
     
-    return "работы с компьютером"
+    response = jsonify({
+        'status': 'running',
+        'gigachat_available': is_gigachat_available(),
+        'sections_loaded': sections_count,
+        'startup_time_ms': current_app.config.get('STARTUP_TIME_MS')
+    })
+    body = response.get_data()
+    return encoded_response(body, 'application/json', negotiated_variants(body), content_digest(body), 'no-cache')
 
-def find_key_aspects(content, topic):
-    """Поиск ключевых аспектов"""
-    # Ищем перечисления и списки
-    list_indicators = [r'во-первых[^.!?]*', r'также[^.!?]*', r'кроме того[^.!?]*']
-    
-    aspects = []
-    for indicator in list_indicators:
-        pattern = f"{indicator}[^.!?]*{topic}[^.!?]*[.!?]"
-        matches = re.findall(pattern, content)
-        for match in matches:
-            aspect = clean_context_phrase(match)
-            if aspect and aspect not in aspects:
-                aspects.append(aspect)
-    
-    if aspects:
-        return ", ".join(aspects[:2])
-    
-    return "основным принципам и практическому применению"
-
-def find_practical_benefit(content, topic):
-    """Поиск практической пользы"""
-    benefit_indicators = [
-        r'помогает[^.!?]*', r'упрощает[^.!?]*', r'ускоряет[^.!?]*',
-        r'позволяет[^.!?]*', r'дает возможность[^.!?]*'
-    ]
-    
-    for indicator in benefit_indicators:
-        pattern = f"{indicator}[^.!?]*{topic}[^.!?]*[.!?]"
-        matches = re.findall(pattern, content)
-        if matches:
-            benefit = clean_context_phrase(matches[0])
-            return benefit.replace(topic, "этого")
-    
-    return "эффективно решать повседневные задачи"
 
-def clean_context_phrase(phrase):
-    """Очистка контекстной фразы"""
-    phrase = re.sub(r'\s+', ' ', phrase)
-    phrase = phrase.strip()
-    # Убираем слишком длинные фразы
-    if len(phrase) > 100:
-        words = phrase.split()
-        return ' '.join(words[:15]) + '...'
-    return phrase
+@bp.route('/api/stats')
+def stats():
+    """Текущие счетчики процесса: задержки, расход GigaChat, кэши, предохранители.
 
+    Меняются с каждым запросом (включая этот), поэтому отдаются без ETag.
+    """
+    response = jsonify({
+        'latency': latency_summary(),
+        'llm_usage': llm_usage_summary(),
+        'llm_cache': get_llm_cache().stats(),
+        'generations_in_flight': generation_flights.in_flight(),
+        'question_bank': get_question_bank().stats(),
+        'generation_supervisor': generation_supervisor.state(),
+        'gigachat_breaker': gigachat_breaker_state(),
+        'gigachat_rate_limit': gigachat_rate_limit_state(),
+        'cache_warmup': cache_warmer.status() if cache_warmer else {'enabled': False}
+    })
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 
-@app.route('/api/status')
-def status():
-    """Статус системы"""
-    sections_count = 0
-    if db:
-        try:
-            sections = db.get_guide_sections(limit=1)
-            sections_count = len(sections)
-        except:
-            sections_count = 0
-    
-    return jsonify({
-        'status': 'running',
-        'gigachat_available': GIGACHAT_AVAILABLE,
-        'sections_loaded': sections_count
-    })
+@bp.route('/api/metrics')
+def metrics():
+    """Метрики процесса в текстовом формате Prometheus"""
+    return Response(registry.render_prometheus(), mimetype='text/plain; version=0.0.4')
 
-def initialize_system():
-    """Инициализация системы - ПРИНУДИТЕЛЬНЫЙ ПАРСИНГ ВСЕХ УЧЕБНИКОВ"""
+def initialize_system(force_reparse=False):
+    """Инициализация системы - парсинг учебников, если БД пуста или запрошен принудительный парсинг"""
     logger.info("🚀 Инициализация системы тренажера...")
     
     Config.init_directories()
+    db = get_database()
+
+    sections_in_db = 0
+    if not force_reparse:
+        db.ensure_tables()
+        sections_in_db = db.count_guide_sections()
+
+    if sections_in_db > 0:
+        logger.info(f"📖 Учебники уже в БД: {sections_in_db} разделов, парсинг пропущен (--reparse для повторного)")
+        logger.info("✅ Система инициализирована")
+        return
     
     # ПРЯМАЯ ПРОВЕРКА ВСЕХ ФАЙЛОВ
     guide_files = Config.GUIDE_FILES
@@ -2947,13 +859,16 @@ def initialize_system():
         db.init_db()
         
         from services.pdf_parser import GuideParser
-        parser = GuideParser()
+        # PARSER_PROFILE=1 - замеры извлечения, очистки и записи по каждой странице
+        parser = GuideParser(db=db, profile=os.getenv('PARSER_PROFILE') == '1')
         
         # ПРИНУДИТЕЛЬНЫЙ ПАРСИНГ ВСЕХ PDF
         logger.info("🔄 Принудительный парсинг всех учебников...")
         db.clear_guide_data()  # Очищаем старые данные
         
         sections_count = parser.parse_all_guides()
+        if parser.profile:
+            logger.info(f"⏱️ Профиль парсинга: {parser.profile_summary()}")
         
         if sections_count > 0:
             logger.info(f"✅ Все учебники распарсены: {sections_count} страниц")
@@ -2982,11 +897,10 @@ def initialize_system():
     logger.info("✅ Система инициализирована")
 
 
-
-@app.route('/api/learn-topic', methods=['POST'])
+@bp.route('/api/learn-topic', methods=['POST'])
 def learn_topic():
     """Генерация теоретического объяснения - С ПРОВЕРКОЙ ОПЕЧАТОК"""
-    if not GIGACHAT_AVAILABLE:
+    if get_gigachat_service() is None:
         return jsonify({'status': 'error', 'error': 'GigaChat недоступен'}), 503
 
     try:
@@ -2999,6 +913,7 @@ def learn_topic():
         logger.info(f"🎯 Запрос на изучение темы: '{original_topic}'")
 
         # Исправляем опечатки
+        spell_checker = get_spell_checker()
         if spell_checker:
             corrected_topic, was_corrected = spell_checker.correct_spelling(original_topic)
             correction_message = spell_checker.format_correction_message(original_topic, corrected_topic, was_corrected)
@@ -3007,6 +922,8 @@ def learn_topic():
             was_corrected = False
             correction_message = ""
 
+        g.metrics_topic_token = set_topic(canonical_topic(corrected_topic))
+
         # Получаем релевантные разделы по ИСПРАВЛЕННОЙ теме
         relevant_sections = get_relevant_sections(corrected_topic)
         
@@ -3025,12 +942,7 @@ def learn_topic():
         logger.info(f"🔍 Использование внешних знаний: {use_external}")
 
         # Генерируем объяснение по ИСПРАВЛЕННОЙ теме
-        explanation = generate_contextual_theory(corrected_topic, relevant_sections)
-        
-        # Дополнительно форматируем, если нужно
-        
-        if not has_proper_paragraphs(explanation):
-            explanation = format_beautiful_text(explanation, corrected_topic)
+        explanation = build_theory_explanation(corrected_topic, relevant_sections)
         
         # Объединяем сообщение об исправлении с объяснением
         full_explanation = correction_message + explanation
@@ -3050,6 +962,12 @@ def learn_topic():
                 'external_knowledge': use_external,
                 'coverage_info': coverage_info,
                 'sections_found': len(relevant_sections)
+            },
+            'quiz': lesson_quiz(corrected_topic),
+            # Ключ кэша ответа в браузере: тема после исправления и версия контента
+            'cache': {
+                'topic': canonical_topic(corrected_topic) or corrected_topic.lower().strip(),
+                'version': content_cache_version()
             }
         })
 
@@ -3057,17 +975,13 @@ def learn_topic():
         logger.error(f"❌ Ошибка генерации объяснения: {e}", exc_info=True)
         return jsonify({'status': 'error', 'error': 'Произошла ошибка при генерации объяснения'}), 500
 
-spell_checker = None
-if GIGACHAT_AVAILABLE:
-    spell_checker = SpellChecker(gigachat_service)
-    logger.info("✅ SpellChecker инициализирован")
-else:
-    logger.warning("⚠️ SpellChecker недоступен - GigaChat не инициализирован")
-
 if __name__ == '__main__':
-    initialize_system()
+    app = create_app()
+    initialize_system(force_reparse='--reparse' in sys.argv or os.getenv('FORCE_REPARSE') == '1')
+    start_cache_warmer()
     
     logger.info("🚀 Интерактивный тренажер запущен!")
     logger.info("🔍 Интерфейс: http://localhost:5000/")
     
-    app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False)
\ No newline at end of file
+    # Сервер разработки Flask; для продакшена - gunicorn -c gunicorn.conf.py wsgi:app
+    app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False)
@@ -0,0 +1,79 @@
+import os
+import re
+import json
+import time
+import threading
+from types import SimpleNamespace
+from services.cassette import make_response
+
+RECORDED_RESPONSES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recorded_responses.json')
+
+
+class FakeGigaChatClient:
+    """Замена клиента GigaChat для бенчмарков: отвечает записанными ответами.
+
+    Ответ выбирается по первому правилу из recorded_responses.json, шаблон
+    которого найден в промпте. latency - имитация задержки сети и модели.
+    """
+
+    def __init__(self, path: str = RECORDED_RESPONSES, latency: float = 0.0):
+        with open(path, encoding='utf-8') as file:
+            self.rules = json.load(file)['rules']
+        self.latency = latency
+        self.calls = 0
+        self.calls_by_rule = {}
+        self._lock = threading.Lock()
+
+    def chat(self, prompt):
+        content, usage = self._respond(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+        return make_response(content, usage)
+
+    def stream(self, prompt, chunk_chars: int = 64):
+        """Потоковый ответ: тот же текст фрагментами, задержка делится между ними"""
+        content, _ = self._respond(prompt)
+        chunks = [content[i:i + chunk_chars] for i in range(0, len(content), chunk_chars)] or ['']
+        for chunk in chunks:
+            if self.latency:
+                time.sleep(self.latency / len(chunks))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=chunk))])
+
+    def _respond(self, prompt):
+        rule = next(rule for rule in self.rules if rule['match'] in prompt)
+
+        if 'echo' in rule:
+            # Проверка орфографии: возвращаем исходный текст без изменений
+            found = re.search(rule['echo'], prompt)
+            content = found.group(1) if found else ''
+        else:
+            content = rule['response']
+
+        with self._lock:
+            self.calls += 1
+            self.calls_by_rule[rule['name']] = self.calls_by_rule.get(rule['name'], 0) + 1
+
+        return content, rule.get('usage')
+
+
+def install_fake_gigachat(latency: float = 0.0) -> FakeGigaChatClient:
+    """Подмена GigaChatService процесса сервисом с FakeGigaChatClient"""
+    from services import providers
+    from services.gigachat_service import GigaChatService
+    from services.circuit_breaker import CircuitBreaker
+
+    client = FakeGigaChatClient(latency=latency)
+    service = GigaChatService.__new__(GigaChatService)
+    service.client = client
+    service.cassette = None
+    service.timeout = 120
+    service.model = None
+    service.model_settings = {'model': 'default'}
+    service.breaker = CircuitBreaker()
+    service.rate_limiter = None
+
+    with providers._lock:
+        providers._gigachat_service = service
+        providers._gigachat_error = None
+        providers._spell_checker = None
+    return client
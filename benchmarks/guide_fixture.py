@@ -0,0 +1,74 @@
+import random
+
+# Шаблоны разделов учебника для синтетической БД: бенчмаркам не нужны
+# настоящие PDF, но поиск должен работать по правдоподобному тексту
+SECTION_TEMPLATES = {
+    'Компьютер': [
+        'Компьютер состоит из системного блока, монитора, клавиатуры и мыши. Процессор выполняет команды, '
+        'оперативная память хранит открытые программы, а жесткий диск - файлы и папки.',
+        'Операционная система Windows показывает рабочий стол с ярлыками. Двойной щелчок левой кнопкой мыши '
+        'открывает файл или папку, правая кнопка вызывает контекстное меню.',
+    ],
+    'Интернет': [
+        'Интернет - всемирная сеть компьютеров. Для выхода в сеть нужен роутер или модем и браузер, '
+        'в адресной строке которого вводится адрес сайта.',
+        'Поиск в интернете выполняется через поисковую систему. Проверяйте адрес страницы и соединение '
+        'по протоколу https, прежде чем вводить личные данные.',
+    ],
+    'Пароли': [
+        'Пароль защищает учетную запись от посторонних. Надежный пароль содержит не менее 12 символов, '
+        'буквы разного регистра, цифры и знаки.',
+        'Не используйте один пароль на разных сайтах. Хранение паролей в менеджере паролей безопаснее, '
+        'чем записи на бумаге рядом с компьютером. Включите двухфакторную защиту.',
+    ],
+    'Банковские карты': [
+        'Банковская карта позволяет оплачивать покупки и снимать наличные в банкомате. PIN-код и CVV '
+        'нельзя сообщать никому, даже сотрудникам банка.',
+        'Оплата картой в интернете безопасна на сайтах с защищенным соединением. Подключите уведомления '
+        'о платежах, чтобы сразу заметить подозрительные операции.',
+    ],
+    'Электронная почта': [
+        'Электронная почта позволяет отправлять письма и вложения. Адрес почты состоит из имени ящика, '
+        'знака @ и домена почтового сервиса.',
+        'Спам и рассылки с незнакомых адресов могут содержать мошеннические ссылки. Не открывайте '
+        'вложения из писем от неизвестных отправителей.',
+    ],
+}
+
+
+def build_sections(count: int, seed: int = 42) -> list:
+    """Синтетические разделы учебника: (заголовок, текст, страница, категория, источник)"""
+    rng = random.Random(seed)
+    topics = list(SECTION_TEMPLATES)
+    sections = []
+
+    for index in range(count):
+        topic = topics[index % len(topics)]
+        paragraphs = SECTION_TEMPLATES[topic]
+        # Несколько абзацев в случайном порядке - разделы разной длины
+        body = ' '.join(rng.choice(paragraphs) for _ in range(rng.randint(2, 6)))
+        sections.append((
+            f"{topic}: раздел {index + 1}",
+            body,
+            index + 1,
+            'digital_literacy',
+            'synthetic_guide.pdf'
+        ))
+    return sections
+
+
+def seed_guide_sections(db, count: int = 200) -> int:
+    """Заполнение guide_sections синтетическими разделами одной транзакцией"""
+    db.init_db()
+    sections = build_sections(count)
+
+    conn = db.get_connection()
+    try:
+        conn.executemany('''
+            INSERT INTO guide_sections (section_title, section_content, page_number, category, guide_source)
+            VALUES (?, ?, ?, ?, ?)
+        ''', sections)
+        conn.commit()
+    finally:
+        conn.close()
+    return len(sections)
@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger('benchmarks')
+
+
+def generate_guides(folder, guides, pages, lines_per_page):
+    """Синтетические учебники synthetic_guide_1.pdf ... synthetic_guide_N.pdf"""
+    from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+    names = []
+    for index in range(guides):
+        name = f"synthetic_guide_{index + 1}.pdf"
+        size = write_synthetic_pdf(os.path.join(folder, name), pages, lines_per_page, seed=index)
+        logger.info(f"📄 {name}: {pages} страниц, {size / 1024:.0f} КБ")
+        names.append(name)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк загрузки учебников: GuideParser в режиме профилирования')
+    parser.add_argument('--guides', type=int, default=3, help='Число синтетических учебников')
+    parser.add_argument('--pages', type=int, default=100, help='Страниц в каждом учебнике')
+    parser.add_argument('--lines', type=int, default=40, help='Строк текста на странице')
+    parser.add_argument('--pdf-dir', help='Папка с настоящими PDF вместо синтетических')
+    parser.add_argument('--pages-detail', action='store_true', help='Сохранять в JSON замеры каждой страницы')
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='trainer-ingest-')
+
+    from database.db_connection import Database
+    from services.pdf_parser import GuideParser
+
+    if args.pdf_dir:
+        folder = args.pdf_dir
+        guide_files = sorted(name for name in os.listdir(folder) if name.lower().endswith('.pdf'))
+    else:
+        folder = workdir
+        guide_files = generate_guides(folder, args.guides, args.pages, args.lines)
+
+    # Отдельная временная БД: бенчмарк не трогает digital_trainer.db
+    db = Database(os.path.join(workdir, 'ingest.db'))
+    db.init_db()
+
+    # Логи каждого сохраненного раздела искажают замер записи в БД
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    guide_parser = GuideParser(db=db, guide_folder=folder, guide_files=guide_files, profile=True)
+    guide_parser.parse_all_guides()
+    summary = guide_parser.profile_summary()
+
+    logger.info(f"{'учебник':<28} {'стр.':>6} {'стр/с':>9} {'КБ/с':>9} {'извл., с':>9} {'очист., с':>9} {'БД, с':>8}")
+    for report in guide_parser.profile_report:
+        logger.info(f"{report['guide']:<28} {report['pages']:>6} {report['pages_per_sec']:>9} "
+                    f"{report['bytes_per_sec'] / 1024:>9.0f} {report['extract_sec']:>9} "
+                    f"{report['clean_sec']:>9} {report['db_sec']:>8}")
+    logger.info(f"{'ИТОГО':<28} {summary['pages']:>6} {summary['pages_per_sec']:>9} "
+                f"{summary['bytes_per_sec'] / 1024:>9.0f} {summary['extract_sec']:>9} "
+                f"{summary['clean_sec']:>9} {summary['db_sec']:>8}")
+
+    if args.output:
+        guides = guide_parser.profile_report
+        if not args.pages_detail:
+            guides = [{key: value for key, value in report.items() if key != 'pages_detail'} for report in guides]
+        results = {
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'source': args.pdf_dir or 'synthetic',
+                'guides': len(guide_files),
+                'pages_per_guide': None if args.pdf_dir else args.pages,
+                'lines_per_page': None if args.pdf_dir else args.lines
+            },
+            'summary': summary,
+            'guides': guides
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+        logger.info(f"💾 Результаты сохранены: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
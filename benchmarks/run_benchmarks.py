@@ -0,0 +1,265 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger('benchmarks')
+
+TOPICS = ['пароли', 'интернет', 'компьютер', 'банковские карты', 'электронная почта']
+CHECK_ANSWERS = [0, 1, 2, 3, 0]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_stats(durations, elapsed, errors):
+    """Сводка по замерам одного сценария (мс и запросов в секунду)"""
+    return {
+        'requests': len(durations),
+        'errors': errors,
+        'p50_ms': round(percentile(durations, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(durations, 0.95) * 1000, 3),
+        'mean_ms': round(statistics.mean(durations) * 1000, 3) if durations else 0.0,
+        'throughput_rps': round(len(durations) / elapsed, 2) if elapsed else 0.0
+    }
+
+
+def run_scenario(app, make_request, iterations, threads):
+    """Прогон сценария через тестовый клиент Flask (по клиенту на поток)"""
+    def worker(count):
+        client = app.test_client()
+        results = []
+        for i in range(count):
+            started = time.perf_counter()
+            response = make_request(client, i)
+            ok = response.status_code < 400 and response.get_json().get('status') == 'success'
+            results.append((ok, time.perf_counter() - started))
+        return results
+
+    per_thread = [iterations // threads + (1 if i < iterations % threads else 0) for i in range(threads)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = [item for future in [pool.submit(worker, count) for count in per_thread] for item in future.result()]
+    elapsed = time.perf_counter() - started
+
+    durations = [duration for ok, duration in results if ok]
+    errors = sum(1 for ok, _ in results if not ok)
+    return latency_stats(durations, elapsed, errors)
+
+
+def run_end_to_end(app, iterations, threads):
+    """Сквозные замеры эндпоинтов с записанными ответами GigaChat"""
+    client = app.test_client()
+    test_ids = []
+    for i in range(iterations):
+        response = client.post('/api/generate-full-test', json={'topic': TOPICS[i % len(TOPICS)]})
+        test_ids.append(response.get_json().get('test_id'))
+
+    scenarios = {
+        'learn_topic': lambda c, i: c.post('/api/learn-topic', json={'topic': TOPICS[i % len(TOPICS)]}),
+        'generate_full_test': lambda c, i: c.post('/api/generate-full-test', json={'topic': TOPICS[i % len(TOPICS)]}),
+        'check_full_test': lambda c, i: c.post('/api/check-full-test', json={
+            'test_id': test_ids[i % len(test_ids)], 'user_answers': CHECK_ANSWERS
+        }),
+    }
+
+    results = {}
+    for name, make_request in scenarios.items():
+        results[name] = run_scenario(app, make_request, iterations, threads)
+        logger.info(f"   {name:<22} p50 {results[name]['p50_ms']:>9.2f} мс  p95 {results[name]['p95_ms']:>9.2f} мс  "
+                    f"{results[name]['throughput_rps']:>8.1f} rps  ошибок: {results[name]['errors']}")
+    return results
+
+
+def run_payload_sizes(app):
+    """Размер ответов с теорией и тестом: JSON с экранированием кириллицы (как было),
+    компактный UTF-8 и он же в сжатом виде"""
+    from services.static_assets import available_encodings
+
+    client = app.test_client()
+    requests = {
+        'learn_topic': lambda headers: client.post('/api/learn-topic', json={'topic': TOPICS[0]}, headers=headers),
+        'generate_full_test': lambda headers: client.post('/api/generate-full-test', json={'topic': TOPICS[0]},
+                                                          headers=headers),
+    }
+
+    results = {}
+    for name, make_request in requests.items():
+        plain = make_request({'Accept-Encoding': 'identity'})
+        sizes = {
+            'ascii_json': len(json.dumps(plain.get_json(), separators=(',', ':')).encode('utf-8')),
+            'utf8_json': len(plain.data)
+        }
+        for encoding in available_encodings():
+            response = make_request({'Accept-Encoding': encoding})
+            sizes[encoding] = len(response.data)
+        results[name] = sizes
+        logger.info(f"   {name:<22} " + '  '.join(f"{key} {value / 1024:.1f} КБ" for key, value in sizes.items()))
+    return results
+
+
+def measure(func, number, repeat):
+    """Время одного вызова: лучший и медианный из repeat прогонов по number вызовов"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    return {
+        'calls': number * repeat,
+        'best_us': round(min(timings) * 1e6, 2),
+        'median_us': round(statistics.median(timings) * 1e6, 2),
+        'ops_per_sec': round(1 / min(timings), 1) if min(timings) else 0.0
+    }
+
+
+def run_micro(number, repeat):
+    """Микробенчмарки поиска разделов, разбора вопросов и форматирования"""
+    from benchmarks.fake_gigachat import FakeGigaChatClient
+    from services.retrieval import get_relevant_sections
+    from services.question_generation import parse_questions_json
+    from services.formatting import ensure_proper_paragraphs
+
+    client = FakeGigaChatClient()
+    questions_response = next(rule['response'] for rule in client.rules if rule['name'] == 'questions')
+    theory = next(rule['response'] for rule in client.rules if rule['name'] == 'theory')
+    long_text = ' '.join([theory.replace('\n', ' ')] * 4)
+
+    cases = {
+        'get_relevant_sections': lambda: get_relevant_sections('пароли'),
+        'parse_questions_json': lambda: parse_questions_json(questions_response),
+        'ensure_proper_paragraphs': lambda: ensure_proper_paragraphs(long_text),
+    }
+
+    results = {}
+    for name, func in cases.items():
+        results[name] = measure(func, number, repeat)
+        logger.info(f"   {name:<26} {results[name]['best_us']:>12.1f} мкс  {results[name]['ops_per_sec']:>10.1f} оп/с")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Сравнение с предыдущим прогоном: список регрессий сверх допуска"""
+    regressions = []
+    checks = [('e2e', 'p50_ms'), ('e2e', 'p95_ms'), ('micro', 'best_us')]
+
+    for key in ('iterations', 'threads', 'llm_latency_ms', 'sections'):
+        if results['meta'].get(key) != baseline.get('meta', {}).get(key):
+            logger.warning(f"⚠️ Параметр {key} отличается от сравниваемого прогона: "
+                           f"{baseline.get('meta', {}).get(key)} -> {results['meta'].get(key)}")
+
+    for group, metric in checks:
+        for name, current in results.get(group, {}).items():
+            previous = baseline.get(group, {}).get(name)
+            if not previous or not previous.get(metric):
+                continue
+            ratio = current[metric] / previous[metric]
+            status = '❌' if ratio > 1 + tolerance else '✅'
+            logger.info(f"   {status} {group}.{name}.{metric}: {previous[metric]} -> {current[metric]} ({ratio:.2f}x)")
+            if ratio > 1 + tolerance:
+                regressions.append({'name': f"{group}.{name}.{metric}", 'baseline': previous[metric],
+                                    'current': current[metric], 'ratio': round(ratio, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Офлайн-бенчмарки тренажера на записанных ответах GigaChat')
+    parser.add_argument('--iterations', type=int, default=50, help='Запросов на сквозной сценарий')
+    parser.add_argument('--threads', type=int, default=1, help='Параллельных клиентов в сквозных сценариях')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='Имитация задержки GigaChat на вызов, мс')
+    parser.add_argument('--sections', type=int, default=200, help='Синтетических разделов учебника в БД')
+    parser.add_argument('--number', type=int, default=200, help='Вызовов в одном прогоне микробенчмарка')
+    parser.add_argument('--repeat', type=int, default=5, help='Прогонов микробенчмарка')
+    parser.add_argument('--cassette-dir', help='Воспроизводить кассеты реальных ответов GigaChat вместо записанных правил')
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    parser.add_argument('--compare', help='JSON предыдущего прогона для поиска регрессий')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Допустимое замедление относительно --compare (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    # Отдельная временная БД: бенчмарк не трогает digital_trainer.db
+    from config import Config
+    Config.SQLITE_DATABASE = os.path.join(tempfile.mkdtemp(prefix='trainer-bench-'), 'benchmark.db')
+
+    from app import create_app
+    from services.providers import get_database
+    from benchmarks.fake_gigachat import install_fake_gigachat
+    from benchmarks.guide_fixture import seed_guide_sections
+
+    app = create_app()
+    sections = seed_guide_sections(get_database(), args.sections)
+    if args.cassette_dir:
+        # Кассеты записываются с GIGACHAT_CASSETTE_MODE=record на реальном GigaChat
+        os.environ['GIGACHAT_CASSETTE_MODE'] = 'replay'
+        os.environ['GIGACHAT_CASSETTE_DIR'] = args.cassette_dir
+        fake_client = None
+    else:
+        fake_client = install_fake_gigachat(latency=args.llm_latency / 1000)
+
+    # Логи приложения на каждый запрос искажают замеры
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    logger.info(f"🚀 Сквозные сценарии: {args.iterations} запросов, потоков: {args.threads}, "
+                f"задержка GigaChat {args.llm_latency} мс, разделов: {sections}")
+    e2e = run_end_to_end(app, args.iterations, args.threads)
+
+    logger.info("📦 Размер ответов API:")
+    payload_bytes = run_payload_sizes(app)
+
+    logger.info(f"🔬 Микробенчмарки: {args.repeat} x {args.number} вызовов")
+    micro = run_micro(args.number, args.repeat)
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': args.iterations,
+            'threads': args.threads,
+            'llm_latency_ms': args.llm_latency,
+            'sections': sections,
+            'llm_source': args.cassette_dir or 'recorded_responses.json'
+        },
+        'e2e': e2e,
+        'micro': micro,
+        'payload_bytes': payload_bytes,
+        'llm_calls': dict(fake_client.calls_by_rule) if fake_client else None
+    }
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)
+        logger.info(f"📊 Сравнение с {args.compare} (допуск {args.tolerance:.0%}):")
+        results['regressions'] = compare(results, baseline, args.tolerance)
+        if results['regressions']:
+            logger.info(f"❌ Регрессий: {len(results['regressions'])}")
+            exit_code = 1
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+        logger.info(f"💾 Результаты сохранены: {args.output}")
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
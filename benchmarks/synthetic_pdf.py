@@ -0,0 +1,78 @@
+import random
+
+# Словарь для синтетического текста. Латиница: стандартный шрифт Helvetica
+# в PDF без встроенных шрифтов не содержит кириллицы, а для замеров
+# извлечения и очистки важен объем текста, а не язык
+WORDS = (
+    'computer password internet browser email account security bank card payment '
+    'message attachment login network router update privacy settings folder file '
+    'keyboard mouse screen download link website search phone code protection user '
+    'service online shopping backup storage cloud device application window system'
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _sentence(rng) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 14))]
+    return ' '.join(words).capitalize() + '.'
+
+
+def build_page_lines(rng, page_num: int, lines_per_page: int) -> list:
+    """Строки одной страницы: заголовок, текст и номер страницы внизу (как в учебнике)"""
+    lines = [f"Lesson {page_num}: {rng.choice(WORDS)} and {rng.choice(WORDS)}"]
+    line = ''
+    while len(lines) < lines_per_page:
+        line = f"{line} {_sentence(rng)}".strip()
+        if len(line) > 80:
+            lines.append(line)
+            line = ''
+    lines.append(str(page_num))
+    return lines
+
+
+def write_synthetic_pdf(path: str, pages: int, lines_per_page: int = 40, seed: int = 0) -> int:
+    """Запись PDF с текстовыми страницами; возвращает размер файла в байтах"""
+    rng = random.Random(seed)
+
+    # Объекты: 1 - каталог, 2 - дерево страниц, 3 - шрифт, далее пары (страница, содержимое)
+    objects = {
+        1: b'<< /Type /Catalog /Pages 2 0 R >>',
+        3: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+    }
+    kids = []
+    for index in range(pages):
+        page_id = 4 + index * 2
+        content_id = page_id + 1
+        kids.append(f"{page_id} 0 R")
+
+        text_ops = ['BT', '/F1 10 Tf', '12 TL', '50 800 Td']
+        for line in build_page_lines(rng, index + 1, lines_per_page):
+            text_ops.append(f"({_escape(line)}) Tj T*")
+        text_ops.append('ET')
+        stream = '\n'.join(text_ops).encode('latin-1')
+
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>").encode('latin-1')
+        objects[content_id] = b'<< /Length ' + str(len(stream)).encode() + b' >>\nstream\n' + stream + b'\nendstream'
+
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode('latin-1')
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(output)
+        output += f"{object_id} 0 obj\n".encode() + objects[object_id] + b'\nendobj\n'
+
+    xref_offset = len(output)
+    size = max(objects) + 1
+    output += f"xref\n0 {size}\n0000000000 65535 f \n".encode()
+    for object_id in range(1, size):
+        output += f"{offsets[object_id]:010d} 00000 n \n".encode()
+    output += f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+
+    with open(path, 'wb') as file:
+        file.write(output)
+    return len(output)
@@ -5,7 +5,10 @@ class Config:
     SQLITE_DATABASE = os.path.join(BASE_DIR, "digital_trainer.db")
     UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
     GUIDE_FOLDER = os.path.join(BASE_DIR, "guide")
+    CASSETTE_FOLDER = os.path.join(BASE_DIR, "cassettes")  # записанные ответы GigaChat
     ALLOWED_EXTENSIONS = {'pdf'}
+    # JSON-ответы API меньше этого размера отдаются без сжатия
+    COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
     GUIDE_FILES = [
         "digital_literacy_guide.pdf",  # основной учебник
         "horizontsbook.pdf",           # первый дополнительный
@@ -1,13 +1,14 @@
 import sqlite3
 import os
+import time
 import logging
 from config import Config
 
 logger = logging.getLogger(__name__)
 
 class Database:
-    def __init__(self):
-        self.db_path = Config.SQLITE_DATABASE
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or Config.SQLITE_DATABASE
 
     def get_connection(self):
         conn = sqlite3.connect(self.db_path)
@@ -22,51 +23,7 @@ class Database:
             # УДАЛЯЕМ старую таблицу и создаем новую с полем guide_source
             cursor.execute('DROP TABLE IF EXISTS guide_sections')
             
-            # Таблица для разделов руководства С guide_source
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS guide_sections (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    section_title TEXT NOT NULL,
-                    section_content TEXT NOT NULL,
-                    page_number INTEGER,
-                    category TEXT,
-                    guide_source TEXT,  -- ДОБАВЛЕНО ПОЛЕ ДЛЯ ИСТОЧНИКА
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # Таблица для сгенерированных уроков
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS training_lessons (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    lesson_title TEXT NOT NULL,
-                    theory_content TEXT NOT NULL,
-                    question TEXT NOT NULL,
-                    options_json TEXT NOT NULL,
-                    correct_answer INTEGER NOT NULL,
-                    explanation TEXT NOT NULL,
-                    guide_source TEXT,
-                    source_section_id INTEGER,
-                    difficulty_level TEXT DEFAULT 'beginner',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (source_section_id) REFERENCES guide_sections (id)
-                )
-            ''')
-
-            # Таблица для сессий обучения пользователей
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_sessions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    session_id TEXT NOT NULL,
-                    current_step INTEGER DEFAULT 0,
-                    total_steps INTEGER DEFAULT 0,
-                    score INTEGER DEFAULT 0,
-                    completed BOOLEAN DEFAULT FALSE,
-                    training_data_json TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            self._create_tables(cursor)
 
             conn.commit()
             logger.info("✅ SQLite база данных тренажера инициализирована успешно")
@@ -78,6 +35,176 @@ class Database:
             cursor.close()
             conn.close()
 
+    def ensure_tables(self):
+        """Создание недостающих таблиц без удаления существующих данных"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            self._create_tables(cursor)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _create_tables(self, cursor):
+        # Таблица для разделов руководства С guide_source
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS guide_sections (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                section_title TEXT NOT NULL,
+                section_content TEXT NOT NULL,
+                page_number INTEGER,
+                category TEXT,
+                guide_source TEXT,  -- ДОБАВЛЕНО ПОЛЕ ДЛЯ ИСТОЧНИКА
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Таблица для сгенерированных уроков
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS training_lessons (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                lesson_title TEXT NOT NULL,
+                theory_content TEXT NOT NULL,
+                question TEXT NOT NULL,
+                options_json TEXT NOT NULL,
+                correct_answer INTEGER NOT NULL,
+                explanation TEXT NOT NULL,
+                guide_source TEXT,
+                source_section_id INTEGER,
+                difficulty_level TEXT DEFAULT 'beginner',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (source_section_id) REFERENCES guide_sections (id)
+            )
+        ''')
+
+        # Таблица для сессий обучения пользователей
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                current_step INTEGER DEFAULT 0,
+                total_steps INTEGER DEFAULT 0,
+                score INTEGER DEFAULT 0,
+                completed BOOLEAN DEFAULT FALSE,
+                training_data_json TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_user_sessions_session_id
+            ON user_sessions (session_id)
+        ''')
+
+        # Банк вопросов поверх training_lessons: тема, хэш нормализованного текста
+        # (точные повторы) и кластер похожих вопросов (разнообразие теста)
+        self._add_missing_columns(cursor, 'training_lessons', {
+            'guide_source': 'TEXT',
+            'topic': 'TEXT',
+            'text_hash': 'TEXT',
+            'cluster_id': 'INTEGER'
+        })
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_training_lessons_topic_hash
+            ON training_lessons (topic, text_hash)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_training_lessons_topic_cluster
+            ON training_lessons (topic, cluster_id)
+        ''')
+
+        # LSH-индекс для поиска почти одинаковых вопросов: полосы MinHash-подписи
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS question_bands (
+                topic TEXT NOT NULL,
+                band INTEGER NOT NULL,
+                band_hash TEXT NOT NULL,
+                lesson_id INTEGER NOT NULL,
+                FOREIGN KEY (lesson_id) REFERENCES training_lessons (id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_question_bands_lookup
+            ON question_bands (topic, band, band_hash)
+        ''')
+
+        # История ученика по вопросам банка: что уже видел и на чем ошибся
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS question_history (
+                learner_id TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                lesson_id INTEGER NOT NULL,
+                seen_count INTEGER DEFAULT 1,
+                missed_count INTEGER DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (learner_id, lesson_id),
+                FOREIGN KEY (lesson_id) REFERENCES training_lessons (id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_question_history_learner_topic
+            ON question_history (learner_id, topic)
+        ''')
+
+        # Состояние прогрева популярных тем (какой воркер прогревает, чем закончилось)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cache_warmup (
+                topic TEXT PRIMARY KEY,
+                owner TEXT,
+                status TEXT NOT NULL,
+                model_calls INTEGER DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Общая для воркеров корзина токенов лимита запросов к GigaChat
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+
+        # Фоновые задания генерации: статус и готовый ответ для опроса /api/jobs/<id>
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS generation_jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result_json TEXT,
+                partial_json TEXT,
+                http_status INTEGER,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                finished_at REAL
+            )
+        ''')
+        # Частичный результат (тест выдается по мере готовности вопросов)
+        self._add_missing_columns(cursor, 'generation_jobs', {'partial_json': 'TEXT'})
+
+        # Кэш ответов GigaChat: ключ - хэш нормализованного промпта и настроек модели
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                caller TEXT,
+                content TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+    def _add_missing_columns(self, cursor, table: str, columns: dict):
+        """Добавление колонок, которых нет в таблице из старой версии БД"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, column_type in columns.items():
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
+                logger.info(f"🔧 В таблицу {table} добавлена колонка {name}")
+
     def save_guide_section(self, title: str, content: str, page: int = None, category: str = None, guide_source: str = None):
         """Сохранение раздела руководства с логированием И guide_source"""
         conn = self.get_connection()
@@ -116,6 +243,18 @@ class Database:
 
         return sections
 
+    def count_guide_sections(self) -> int:
+        """Количество загруженных разделов руководства"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('SELECT COUNT(*) FROM guide_sections')
+        count = cursor.fetchone()[0]
+        cursor.close()
+        conn.close()
+
+        return count
+
     def save_training_lesson(self, lesson_data: dict):
         """Сохранение сгенерированного урока"""
         conn = self.get_connection()
@@ -158,12 +297,419 @@ class Database:
 
         return lessons
 
+    def save_user_session(self, session_id: str, total_steps: int, training_data_json: str):
+        """Сохранение новой сессии (выданного теста)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('''
+                INSERT OR REPLACE INTO user_sessions (session_id, total_steps, training_data_json)
+                VALUES (?, ?, ?)
+            ''', (session_id, total_steps, training_data_json))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def get_user_session(self, session_id: str):
+        """Получение сессии по идентификатору"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT session_id, current_step, total_steps, score, completed, training_data_json
+            FROM user_sessions
+            WHERE session_id = ?
+        ''', (session_id,))
+
+        session = cursor.fetchone()
+        cursor.close()
+        conn.close()
+
+        return session
+
+    def update_user_sessions(self, updates: list):
+        """Пакетное обновление прогресса сессий: [(current_step, score, completed, session_id), ...]"""
+        if not updates:
+            return
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.executemany('''
+                UPDATE user_sessions
+                SET current_step = ?, score = ?, completed = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE session_id = ?
+            ''', updates)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def save_bank_question(self, topic: str, lesson: dict, text_hash: str, bands: list, cluster_id: int = None):
+        """Сохранение вопроса в банк вместе с полосами LSH-индекса.
+
+        Возвращает id урока или None, если такой текст по теме уже есть.
+        cluster_id=None - вопрос открывает новый кластер (кластер = свой id).
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('''
+                INSERT INTO training_lessons
+                (lesson_title, theory_content, question, options_json, correct_answer, explanation,
+                 difficulty_level, topic, text_hash, cluster_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                lesson['lesson_title'],
+                lesson['theory_content'],
+                lesson['question'],
+                lesson['options_json'],
+                lesson['correct_answer'],
+                lesson['explanation'],
+                lesson.get('difficulty_level', 'beginner'),
+                topic,
+                text_hash,
+                cluster_id
+            ))
+            lesson_id = cursor.lastrowid
+            if cluster_id is None:
+                cursor.execute('UPDATE training_lessons SET cluster_id = ? WHERE id = ?', (lesson_id, lesson_id))
+
+            cursor.executemany('''
+                INSERT INTO question_bands (topic, band, band_hash, lesson_id)
+                VALUES (?, ?, ?, ?)
+            ''', [(topic, band, band_hash, lesson_id) for band, band_hash in enumerate(bands)])
+
+            conn.commit()
+            return lesson_id
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+
+    def find_bank_candidates(self, topic: str, bands: list) -> list:
+        """id вопросов темы, у которых совпадает хотя бы одна полоса подписи"""
+        if not bands:
+            return []
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            conditions = ' OR '.join(['(band = ? AND band_hash = ?)'] * len(bands))
+            params = [topic]
+            for band, band_hash in enumerate(bands):
+                params.extend([band, band_hash])
+            cursor.execute(f'''
+                SELECT DISTINCT lesson_id FROM question_bands
+                WHERE topic = ? AND ({conditions})
+            ''', params)
+            return [row['lesson_id'] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+            conn.close()
+
+    def get_bank_questions(self, lesson_ids: list) -> list:
+        """Вопросы банка по id (поиск по первичному ключу)"""
+        if not lesson_ids:
+            return []
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            placeholders = ','.join('?' * len(lesson_ids))
+            cursor.execute(f'''
+                SELECT id, topic, theory_content, question, options_json, correct_answer, explanation, cluster_id
+                FROM training_lessons
+                WHERE id IN ({placeholders})
+            ''', list(lesson_ids))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def get_bank_index(self, topic: str) -> list:
+        """Пары (id, cluster_id) всех вопросов темы - для индекса в памяти"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('''
+                SELECT id, cluster_id FROM training_lessons
+                WHERE topic = ?
+                ORDER BY id
+            ''', (topic,))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def save_question_views(self, learner_id: str, topic: str, lesson_ids: list):
+        """Отметка, что ученику выданы вопросы банка"""
+        if not lesson_ids:
+            return
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.executemany('''
+                INSERT INTO question_history (learner_id, topic, lesson_id)
+                VALUES (?, ?, ?)
+                ON CONFLICT (learner_id, lesson_id)
+                DO UPDATE SET seen_count = seen_count + 1, updated_at = CURRENT_TIMESTAMP
+            ''', [(learner_id, topic, lesson_id) for lesson_id in lesson_ids])
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def save_question_misses(self, learner_id: str, lesson_ids: list):
+        """Учет вопросов банка, на которые ученик ответил неверно"""
+        if not lesson_ids:
+            return
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.executemany('''
+                UPDATE question_history
+                SET missed_count = missed_count + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE learner_id = ? AND lesson_id = ?
+            ''', [(learner_id, lesson_id) for lesson_id in lesson_ids])
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def get_question_history(self, learner_id: str, topic: str) -> list:
+        """Вопросы темы, которые ученик уже видел: (lesson_id, missed_count)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('''
+                SELECT lesson_id, missed_count FROM question_history
+                WHERE learner_id = ? AND topic = ?
+            ''', (learner_id, topic))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def claim_warmup(self, topic: str, owner: str, ttl_seconds: int) -> bool:
+        """Захват прогрева темы: False, если ее прогревает другой воркер"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('''
+                INSERT INTO cache_warmup (topic, owner, status)
+                VALUES (?, ?, 'running')
+                ON CONFLICT (topic) DO UPDATE
+                SET owner = excluded.owner, status = 'running', updated_at = CURRENT_TIMESTAMP
+                WHERE cache_warmup.status != 'running'
+                   OR cache_warmup.updated_at < datetime('now', ?)
+            ''', (topic, owner, f'-{int(ttl_seconds)} seconds'))
+            conn.commit()
+            return cursor.rowcount > 0
+        finally:
+            cursor.close()
+            conn.close()
+
+    def finish_warmup(self, topic: str, status: str, model_calls: int):
+        """Итог прогрева темы"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('''
+                UPDATE cache_warmup
+                SET status = ?, model_calls = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE topic = ?
+            ''', (status, model_calls, topic))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def take_rate_token(self, name: str, rate: float, capacity: float, reserve: float, now: float) -> float:
+        """Токен из общей корзины: 0, если взят, иначе через сколько секунд он появится.
+
+        BEGIN IMMEDIATE сразу берет блокировку записи, поэтому чтение и
+        списание токена не пересекаются с другими воркерами.
+        """
+        conn = self.get_connection()
+        conn.isolation_level = None
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT tokens, updated_at FROM rate_limits WHERE name = ?', (name,))
+            row = cursor.fetchone()
+            if row is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, row['tokens'] + max(0.0, now - row['updated_at']) * rate)
+
+            wait = 0.0
+            if tokens - 1 >= reserve:
+                tokens -= 1
+            else:
+                wait = (reserve + 1 - tokens) / rate
+
+            cursor.execute('''
+                INSERT OR REPLACE INTO rate_limits (name, tokens, updated_at)
+                VALUES (?, ?, ?)
+            ''', (name, tokens, now))
+            cursor.execute('COMMIT')
+            return wait
+        except Exception:
+            if conn.in_transaction:
+                cursor.execute('ROLLBACK')
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def drain_rate_tokens(self, name: str, now: float):
+        """Обнуление общей корзины токенов (GigaChat ответил 429)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('''
+                INSERT OR REPLACE INTO rate_limits (name, tokens, updated_at)
+                VALUES (?, 0, ?)
+            ''', (name, now))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def save_generation_job(self, job_id: str, kind: str):
+        """Новое задание в статусе queued"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            now = time.time()
+            cursor.execute('''
+                INSERT INTO generation_jobs (job_id, kind, status, created_at, updated_at)
+                VALUES (?, ?, 'queued', ?, ?)
+            ''', (job_id, kind, now, now))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def update_generation_job(self, job_id: str, status: str, result_json: str = None,
+                              http_status: int = None, error: str = None):
+        """Смена статуса задания; для done/failed - результат или ошибка"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            now = time.time()
+            finished_at = now if status in ('done', 'failed') else None
+            cursor.execute('''
+                UPDATE generation_jobs
+                SET status = ?, result_json = ?, http_status = ?, error = ?, updated_at = ?, finished_at = ?
+                WHERE job_id = ?
+            ''', (status, result_json, http_status, error, now, finished_at, job_id))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def save_generation_job_progress(self, job_id: str, partial_json: str):
+        """Частичный результат выполняющегося задания"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('''
+                UPDATE generation_jobs
+                SET partial_json = ?, updated_at = ?
+                WHERE job_id = ? AND status = 'running'
+            ''', (partial_json, time.time(), job_id))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def get_generation_job(self, job_id: str):
+        """Задание по идентификатору"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('''
+                SELECT job_id, kind, status, result_json, partial_json, http_status, error,
+                       created_at, updated_at, finished_at
+                FROM generation_jobs
+                WHERE job_id = ?
+            ''', (job_id,))
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def get_llm_cache_entry(self, cache_key: str):
+        """Сохраненный ответ GigaChat по ключу кэша или None"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('SELECT content FROM llm_cache WHERE cache_key = ?', (cache_key,))
+            row = cursor.fetchone()
+            return row['content'] if row else None
+        finally:
+            cursor.close()
+            conn.close()
+
+    def save_llm_cache_entry(self, cache_key: str, caller: str, content: str):
+        """Сохранение ответа GigaChat в кэш"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('''
+                INSERT OR REPLACE INTO llm_cache (cache_key, caller, content)
+                VALUES (?, ?, ?)
+            ''', (cache_key, caller, content))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def delete_llm_cache_entry(self, cache_key: str):
+        """Удаление ответа из кэша (ответ оказался непригодным)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('DELETE FROM llm_cache WHERE cache_key = ?', (cache_key,))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
     def clear_guide_data(self):
         """Очистка данных руководства"""
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute("DELETE FROM guide_sections")
-        cursor.execute("DELETE FROM training_lessons")
+        # Банк вопросов (уроки с темой) переживает повторный парсинг учебников
+        cursor.execute("DELETE FROM training_lessons WHERE topic IS NULL")
         conn.commit()
         cursor.close()
         conn.close()
@@ -0,0 +1,41 @@
+import os
+import multiprocessing
+
+# Запуск: gunicorn -c gunicorn.conf.py wsgi:app
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Генерация упирается в ожидание ответа GigaChat, поэтому на каждый
+# процесс приходится несколько потоков
+workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# Полный тест может генерироваться дольше минуты (несколько вызовов по timeout=120)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 300))
+graceful_timeout = 30
+keepalive = 5
+
+# Каждый воркер сам импортирует wsgi.py и вызывает create_app():
+# клиент GigaChat, соединения SQLite и кэши не разделяются между процессами
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # Сервисы создаются лениво, но при preload_app = True мастер мог успеть
+    # их создать - сбрасываем, чтобы у воркера был свой HTTP-клиент и фоновые потоки
+    if server.cfg.preload_app:
+        from services.providers import reset_services
+        reset_services()
+    server.log.info(f"Воркер {worker.pid} запущен")
+
+
+def post_worker_init(worker):
+    # Фоновые потоки не переживают fork, поэтому прогрев кэша стартует уже в
+    # воркере (и при preload_app = True, и без него); CACHE_WARMUP=1 - каждый
+    # воркер берет на прогрев еще не занятые темы
+    from app import start_cache_warmer
+    start_cache_warmer()
@@ -0,0 +1,113 @@
+import json
+import time
+import argparse
+import logging
+import statistics
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+# Сценарии нагрузки: список запросов (метод, путь, тело), выполняемых одним пользователем
+SCENARIOS = {
+    'status': [('GET', '/api/status', None)],
+    'index': [('GET', '/', None)],
+    'learn': [('POST', '/api/learn-topic', {'topic': 'Пароли'})],
+    'test': [('POST', '/api/generate-full-test', {'topic': 'Пароли'})],
+}
+
+
+def send_request(base_url, method, path, body, timeout):
+    """Один HTTP-запрос, возвращает (успех, длительность в секундах)"""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method)
+    if data is not None:
+        request.add_header('Content-Type', 'application/json')
+
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            ok = response.status < 400
+    except (urllib.error.URLError, TimeoutError, ConnectionError):
+        ok = False
+    return ok, time.perf_counter() - started
+
+
+def run_user(base_url, steps, iterations, timeout):
+    """Один виртуальный пользователь: iterations повторов сценария"""
+    results = []
+    for _ in range(iterations):
+        for method, path, body in steps:
+            results.append(send_request(base_url, method, path, body, timeout))
+    return results
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_level(base_url, steps, users, iterations, timeout):
+    """Прогон с заданным числом одновременных пользователей"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        futures = [pool.submit(run_user, base_url, steps, iterations, timeout) for _ in range(users)]
+        results = [item for future in futures for item in future.result()]
+    elapsed = time.perf_counter() - started
+
+    latencies = [duration for ok, duration in results if ok]
+    errors = sum(1 for ok, _ in results if not ok)
+
+    return {
+        'users': users,
+        'requests': len(results),
+        'errors': errors,
+        'elapsed_sec': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест тренажера: пропускная способность при одновременных пользователях')
+    parser.add_argument('--url', default='http://localhost:5000', help='Адрес запущенного сервера')
+    parser.add_argument('--scenario', default='status,index',
+                        help=f"Сценарии через запятую: {', '.join(SCENARIOS)} (learn и test обращаются к GigaChat)")
+    parser.add_argument('--users', default='1,5,20,50', help='Уровни одновременных пользователей через запятую')
+    parser.add_argument('--iterations', type=int, default=20, help='Повторов сценария на пользователя')
+    parser.add_argument('--timeout', type=float, default=300, help='Таймаут одного запроса, сек')
+    parser.add_argument('--output', help='Файл для сохранения результатов в JSON')
+    args = parser.parse_args()
+
+    steps = []
+    for name in args.scenario.split(','):
+        steps.extend(SCENARIOS[name.strip()])
+
+    levels = [int(value) for value in args.users.split(',')]
+    report = []
+
+    logger.info(f"🚀 Нагрузка на {args.url}: сценарий {args.scenario}, {args.iterations} повторов на пользователя")
+    logger.info(f"{'users':>6} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9}")
+
+    for users in levels:
+        result = run_level(args.url, steps, users, args.iterations, args.timeout)
+        report.append(result)
+        logger.info(f"{result['users']:>6} {result['requests']:>9} {result['errors']:>7} "
+                    f"{result['throughput_rps']:>9} {result['p50_ms']:>9} {result['p95_ms']:>9}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'url': args.url, 'scenario': args.scenario, 'levels': report}, file, ensure_ascii=False, indent=2)
+        logger.info(f"💾 Результаты сохранены: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
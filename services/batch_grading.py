@@ -0,0 +1,105 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# numpy или False, если он не установлен; None - еще не проверяли
+_numpy = None
+
+# Не больше стольких ответов учеников в одном запросе пакетной проверки
+MAX_BATCH_SUBMISSIONS = 1000
+
+# Отсутствующий или некорректный ответ в матрице ответов
+NO_ANSWER = -1
+
+
+def _load_numpy():
+    """numpy при первой пакетной проверке, а не при старте воркера (импорт
+    занимает заметную долю холодного старта). Входит в requirements.txt;
+    без него (урезанная установка) проверка идет циклом на чистом Python.
+    Результат запоминается: неудачный import не кэшируется самим Python."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+
+def answer_matrix(answer_rows: list, questions_count: int, options_count: int) -> list:
+    """Ответы учеников построчно, выровненные по числу вопросов: не число и
+    номер вне вариантов - NO_ANSWER"""
+    matrix = []
+    for row in answer_rows:
+        row = list(row[:questions_count]) if isinstance(row, list) else []
+        row += [None] * (questions_count - len(row))
+        matrix.append([
+            answer if isinstance(answer, int) and not isinstance(answer, bool) and 0 <= answer < options_count
+            else NO_ANSWER
+            for answer in row
+        ])
+    return matrix
+
+
+def grade_batch(answer_key: list, matrix: list, options_count: int) -> dict:
+    """Проверка матрицы ответов (ученики x вопросы) по ключу.
+
+    Возвращает по ученикам число верных, отвеченных и оценку (как в
+    /api/check-full-test: доля верных в процентах, с отбрасыванием дробной
+    части), по вопросам - долю верных, долю отвеченных и выбор вариантов.
+    Матрица сравнивается с ключом целиком средствами numpy; цикл на чистом
+    Python - запасной путь для установки без numpy.
+    """
+    numpy = _load_numpy()
+    if numpy is not None and matrix:
+        return _grade_numpy(numpy, answer_key, matrix, options_count)
+    return _grade_python(answer_key, matrix, options_count)
+
+
+def _grade_numpy(numpy, answer_key, matrix, options_count):
+    answers = numpy.asarray(matrix, dtype=numpy.int16)
+    correct = answers == numpy.asarray(answer_key, dtype=numpy.int16)
+    answered = answers != NO_ANSWER
+    questions_count = len(answer_key)
+
+    correct_counts = correct.sum(axis=1)
+    option_counts = numpy.stack([(answers == option).sum(axis=0) for option in range(options_count)], axis=1)
+
+    return {
+        'engine': 'numpy',
+        'correct_counts': correct_counts.tolist(),
+        'answered_counts': answered.sum(axis=1).tolist(),
+        'scores': (correct_counts * 100 // questions_count).tolist() if questions_count else [0] * len(matrix),
+        'correct_rates': correct.mean(axis=0).round(3).tolist(),
+        'answered_rates': answered.mean(axis=0).round(3).tolist(),
+        'option_counts': option_counts.tolist()
+    }
+
+
+def _grade_python(answer_key, matrix, options_count):
+    questions_count = len(answer_key)
+    users_count = len(matrix)
+
+    correct_counts = [sum(1 for answer, key in zip(row, answer_key) if answer == key) for row in matrix]
+    question_correct = [0] * questions_count
+    question_answered = [0] * questions_count
+    option_counts = [[0] * options_count for _ in range(questions_count)]
+    for row in matrix:
+        for index, answer in enumerate(row):
+            if answer == NO_ANSWER:
+                continue
+            question_answered[index] += 1
+            option_counts[index][answer] += 1
+            if answer == answer_key[index]:
+                question_correct[index] += 1
+
+    return {
+        'engine': 'python',
+        'correct_counts': correct_counts,
+        'answered_counts': [sum(1 for answer in row if answer != NO_ANSWER) for row in matrix],
+        'scores': [count * 100 // questions_count if questions_count else 0 for count in correct_counts],
+        'correct_rates': [round(count / users_count, 3) if users_count else 0.0 for count in question_correct],
+        'answered_rates': [round(count / users_count, 3) if users_count else 0.0 for count in question_answered],
+        'option_counts': option_counts
+    }
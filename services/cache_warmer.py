@@ -0,0 +1,122 @@
+import os
+import time
+import logging
+import threading
+from services.metrics import finish_llm_usage, reset_endpoint, set_endpoint, start_llm_usage
+from services.rate_limiter import llm_priority
+
+logger = logging.getLogger(__name__)
+
+# Шаги прогрева темы: теория (кэш ответов GigaChat) и пул вопросов (банк)
+WARMUP_STEPS = ('theory', 'tests')
+
+# Сколько держится захват темы воркером: после падения процесса тему
+# подхватит другой воркер или следующий запуск
+CLAIM_TTL = 600
+
+
+class CacheWarmer:
+    """Фоновый прогрев популярных тем, чтобы первый ученик не ждал GigaChat.
+
+    Шаги выполняются по одному в фоновом потоке. После шага, который дошел
+    до модели, поток выдерживает паузу interval (ограничение скорости).
+    Уже прогретое пропускается само: теория приходит из кэша ответов без
+    вызовов модели, пул тестов проверяется по размеру банка вопросов, так
+    что прерванный прогрев при следующем запуске продолжается с места
+    остановки. Тему в каждый момент прогревает один воркер (захват в
+    таблице cache_warmup).
+    """
+
+    def __init__(self, db, topics: list, warm_theory, warm_tests, interval: float = 5.0):
+        self.db = db
+        self.topics = list(topics)
+        self.steps = {'theory': warm_theory, 'tests': warm_tests}
+        self.interval = interval
+        self.owner = f"{os.getpid()}"
+        self._status = {topic: {'status': 'pending'} for topic in self.topics}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Запуск прогрева в фоновом потоке (повторный вызов ничего не делает)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.run, name='cache-warmer', daemon=True)
+            self._thread.start()
+        logger.info(f"🔥 Прогрев кэша запущен: {', '.join(self.topics)}")
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        """Прогрев всех тем по очереди (в текущем потоке)"""
+        self.db.ensure_tables()
+        token = set_endpoint('cache-warmer')
+        try:
+            # Прогрев уступает квоту GigaChat запросам пользователей
+            with llm_priority('background'):
+                for topic in self.topics:
+                    if self._stop.is_set():
+                        break
+                    self.warm(topic)
+        finally:
+            reset_endpoint(token)
+        logger.info("🔥 Прогрев кэша завершен")
+
+    def warm(self, topic: str):
+        """Прогрев одной темы, если ее не прогревает другой воркер"""
+        if not self.db.claim_warmup(topic, self.owner, CLAIM_TTL):
+            self._update(topic, status='other_worker')
+            return
+
+        started = time.perf_counter()
+        self._update(topic, status='running')
+        model_calls = 0
+
+        try:
+            for step in WARMUP_STEPS:
+                if self._stop.is_set():
+                    break
+                calls = self._run_step(topic, step)
+                model_calls += calls
+                self._update(topic, **{step: 'warm', 'model_calls': model_calls})
+                if calls:
+                    self._stop.wait(self.interval)
+        except Exception as e:
+            logger.error(f"❌ Ошибка прогрева темы '{topic}': {e}")
+            self._update(topic, status='failed', error=str(e))
+            self.db.finish_warmup(topic, 'failed', model_calls)
+            return
+
+        status = 'warm' if not self._stop.is_set() else 'pending'
+        seconds = round(time.perf_counter() - started, 1)
+        self._update(topic, status=status, seconds=seconds)
+        self.db.finish_warmup(topic, status, model_calls)
+        if model_calls:
+            logger.info(f"🔥 Тема '{topic}' прогрета за {seconds} с, вызовов GigaChat: {model_calls}")
+        else:
+            logger.info(f"🔥 Тема '{topic}' уже была прогрета")
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                'enabled': True,
+                'running': self._thread is not None and self._thread.is_alive(),
+                'topics': {topic: dict(state) for topic, state in self._status.items()}
+            }
+
+    def _run_step(self, topic, step):
+        """Шаг прогрева; возвращает число обращений к модели (без ответов из кэша
+        и отклоненных предохранителем)"""
+        token = start_llm_usage()
+        try:
+            self.steps[step](topic)
+        finally:
+            usage = finish_llm_usage(token)
+        return usage['calls'] - usage['cached'] - usage['rejected']
+
+    def _update(self, topic, **fields):
+        with self._lock:
+            self._status[topic].update(fields)
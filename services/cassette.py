@@ -0,0 +1,130 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from types import SimpleNamespace
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Режимы кассет GigaChat (переменная GIGACHAT_CASSETTE_MODE):
+#   record - каждый вызов идет в GigaChat, ответ дописывается в кассету
+#   replay - ответы только из кассет, без сети и без учетных данных
+#   auto   - из кассеты, если промпт уже записан, иначе GigaChat + запись
+CASSETTE_MODES = ('record', 'replay', 'auto')
+
+# Сколько разных ответов хранить на один промпт (повторы генерации)
+MAX_RESPONSES_PER_PROMPT = 5
+
+
+class CassetteMissError(LookupError):
+    """В режиме replay для промпта нет записанного ответа"""
+
+
+def cassette_mode():
+    """Режим кассет из окружения или None, если кассеты выключены"""
+    mode = os.getenv('GIGACHAT_CASSETTE_MODE', '').strip().lower()
+    return mode if mode in CASSETTE_MODES else None
+
+
+def make_response(content: str, usage: dict = None):
+    """Объект ответа с тем же интерфейсом, что у клиента gigachat
+    (response.choices[0].message.content, response.usage.total_tokens)"""
+    usage = usage or {}
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content, role='assistant'))],
+        usage=SimpleNamespace(
+            prompt_tokens=usage.get('prompt_tokens', 0),
+            completion_tokens=usage.get('completion_tokens', 0),
+            total_tokens=usage.get('total_tokens', 0)
+        )
+    )
+
+
+class Cassette:
+    """Записанные пары промпт -> ответ GigaChat на диске.
+
+    Ключ - SHA-256 текста промпта, файл <dir>/<2 символа ключа>/<ключ>.json.
+    На один промпт хранится до MAX_RESPONSES_PER_PROMPT ответов; при
+    воспроизведении они выдаются по кругу, поэтому цепочки повторов
+    генерации воспроизводятся в том же порядке, что и при записи.
+    """
+
+    def __init__(self, directory: str, mode: str):
+        self.directory = directory
+        self.mode = mode
+        self._entries = {}
+        self._cursors = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Кассета по GIGACHAT_CASSETTE_MODE / GIGACHAT_CASSETTE_DIR или None"""
+        mode = cassette_mode()
+        if mode is None:
+            return None
+        directory = os.getenv('GIGACHAT_CASSETTE_DIR') or Config.CASSETTE_FOLDER
+        return cls(directory, mode)
+
+    @staticmethod
+    def key(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+    def play(self, prompt: str):
+        """Записанный ответ на промпт (следующий по кругу) или None"""
+        key = self.key(prompt)
+        with self._lock:
+            entry = self._load(key)
+            if not entry or not entry['responses']:
+                return None
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            recorded = entry['responses'][cursor % len(entry['responses'])]
+        return make_response(recorded['content'], recorded.get('usage'))
+
+    def record(self, prompt: str, response):
+        """Дописать ответ GigaChat на промпт в кассету"""
+        key = self.key(prompt)
+        usage = getattr(response, 'usage', None)
+        recorded = {
+            'content': response.choices[0].message.content,
+            'usage': {
+                'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+                'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+                'total_tokens': getattr(usage, 'total_tokens', 0) or 0
+            },
+            'recorded_at': datetime.now().isoformat(timespec='seconds')
+        }
+
+        with self._lock:
+            entry = self._load(key) or {'prompt_sha256': key, 'prompt': prompt, 'responses': []}
+            entry['responses'] = (entry['responses'] + [recorded])[-MAX_RESPONSES_PER_PROMPT:]
+            self._entries[key] = entry
+            self._write(key, entry)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _load(self, key: str):
+        if key not in self._entries:
+            path = self._path(key)
+            entry = None
+            if os.path.exists(path):
+                try:
+                    with open(path, encoding='utf-8') as file:
+                        entry = json.load(file)
+                except (OSError, json.JSONDecodeError) as e:
+                    logger.warning(f"⚠️ Не удалось прочитать кассету {path}: {e}")
+            self._entries[key] = entry
+        return self._entries[key]
+
+    def _write(self, key: str, entry: dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Запись через временный файл: параллельные воркеры не увидят половину JSON
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(entry, file, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
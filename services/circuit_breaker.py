@@ -0,0 +1,114 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """GigaChat отключен предохранителем: вызов отклонен без обращения к модели"""
+
+
+class CircuitBreaker:
+    """Предохранитель вызовов GigaChat по последним window вызовам.
+
+    Размыкается, когда среди них (но не меньше min_calls) доля ошибок или
+    медленных вызовов (дольше slow_call_seconds) достигает порога. Пока
+    предохранитель разомкнут, вызовы сразу получают CircuitOpenError и
+    код переходит к своим локальным запасным вариантам. Через open_seconds
+    пропускается один пробный вызов: удачный замыкает предохранитель,
+    неудачный размыкает снова.
+    """
+
+    def __init__(self, window: int = 20, min_calls: int = 5, failure_rate: float = 0.5,
+                 slow_call_seconds: float = 30.0, slow_rate: float = 0.5, open_seconds: float = 30.0):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self._calls = deque(maxlen=window)
+        self._state = 'closed'
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls):
+        """Настройки из GIGACHAT_BREAKER_OPEN_SECONDS и GIGACHAT_SLOW_CALL_SECONDS"""
+        return cls(
+            open_seconds=float(os.getenv('GIGACHAT_BREAKER_OPEN_SECONDS', '30')),
+            slow_call_seconds=float(os.getenv('GIGACHAT_SLOW_CALL_SECONDS', '30'))
+        )
+
+    def allow(self):
+        """Разрешение на вызов модели; CircuitOpenError, если предохранитель разомкнут"""
+        with self._lock:
+            if self._state == 'closed':
+                return
+            if self._state == 'open' and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._state = 'half_open'
+            if self._state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                logger.info("🔌 Предохранитель GigaChat: пробный вызов")
+                return
+            self.rejected += 1
+        raise CircuitOpenError("GigaChat временно отключен предохранителем")
+
+    def cancel(self):
+        """Разрешенный вызов так и не состоялся (например, не дождался лимита запросов)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def is_open(self) -> bool:
+        """Разомкнут ли предохранитель (без пробного вызова)"""
+        with self._lock:
+            return self._state == 'open' and time.monotonic() - self._opened_at < self.open_seconds
+
+    def record(self, success: bool, seconds: float):
+        """Итог вызова модели: успех и длительность"""
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            if self._state == 'half_open':
+                self._probe_in_flight = False
+                if success and not slow:
+                    self._state = 'closed'
+                    self._calls.clear()
+                    logger.info("🔌 Предохранитель GigaChat замкнут: пробный вызов успешен")
+                else:
+                    self._open('пробный вызов неудачен')
+                return
+
+            self._calls.append((success, slow))
+            if self._state != 'closed' or len(self._calls) < self.min_calls:
+                return
+
+            failures = sum(1 for ok, _ in self._calls if not ok) / len(self._calls)
+            slow_calls = sum(1 for _, is_slow in self._calls if is_slow) / len(self._calls)
+            if failures >= self.failure_rate:
+                self._open(f"ошибок {failures:.0%} из последних {len(self._calls)} вызовов")
+            elif slow_calls >= self.slow_rate:
+                self._open(f"медленных вызовов {slow_calls:.0%} из последних {len(self._calls)}")
+
+    def state(self) -> dict:
+        with self._lock:
+            calls = len(self._calls)
+            return {
+                'state': self._state,
+                'window_calls': calls,
+                'failure_rate': round(sum(1 for ok, _ in self._calls if not ok) / calls, 3) if calls else 0.0,
+                'slow_rate': round(sum(1 for _, slow in self._calls if slow) / calls, 3) if calls else 0.0,
+                'retry_in_seconds': round(max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)), 1)
+                if self._state == 'open' else 0.0,
+                'rejected': self.rejected
+            }
+
+    def _open(self, reason):
+        self._state = 'open'
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        logger.error(f"🔌 Предохранитель GigaChat разомкнут на {self.open_seconds:.0f} с: {reason}")
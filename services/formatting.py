@@ -0,0 +1,293 @@
+import re
+import logging
+from services.providers import get_gigachat_service
+from services.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+
+@timed('reformat')
+def format_beautiful_text(text, topic):
+    """Форматирование текста в красивый структурированный вид с абзацами"""
+    try:
+        prompt = f"""
+ПРЕОБРАЗУЙ ТЕКСТ В КРАСИВЫЙ СТРУКТУРИРОВАННЫЙ ФОРМАТ С ЧЕТКИМИ АБЗАЦАМИ:
+
+ИСХОДНЫЙ ТЕКСТ:
+{text}
+
+ТЕМА: {topic}
+
+ЗАДАЧА:
+Преобразуй текст в хорошо отформатированный, легко читаемый вид с:
+- ЧЕТКИМИ АБЗАЦАМИ (каждый новый смысловой блок - новый абзац)
+- Естественными разрывами между идеями
+- Маркированными списками где уместно
+- Выделением ключевых моментов
+- Понятной структурой с подзаголовками
+- Отсутствием длинных сплошных текстов
+
+ВАЖНЫЕ ТРЕБОВАНИЯ:
+1. КАЖДАЯ новая идея или тема должна начинаться с нового абзаца
+2. Между абзацами должна быть пустая строка
+3. Используй подзаголовки с эмодзи для основных разделов
+4. Разбивай длинные предложения на более короткие
+5. Делай текст визуально привлекательным и легким для чтения
+6. НЕ используй символ # для заголовков - используй эмодзи и жирный текст
+
+ПРИМЕР ПРАВИЛЬНОГО ФОРМАТИРОВАНИЯ:
+🌟 **Основная концепция**
+Мышь — это компактный манипулятор, позволяющий человеку взаимодействовать с компьютером через графический интерфейс.
+
+🎯 **Как это работает**
+Мышь оснащена двумя основными кнопками:
+
+- **Левая кнопка** — основной инструмент взаимодействия
+- **Правая кнопка** — открывает контекстное меню
+
+
+💡 **Практическое применение**
+Для работы с файлами используйте двойной клик левой кнопкой мыши...
+
+ВЕРНИ ТОЛЬКО ОТФОРМАТИРОВАННЫЙ ТЕКСТ БЕЗ ДОПОЛНИТЕЛЬНЫХ КОММЕНТАРИЕВ.
+"""
+
+        response = get_gigachat_service().chat(prompt, cache=True)
+        formatted_text = response.choices[0].message.content.strip()
+        
+        # Дополнительная проверка и улучшение форматирования
+        formatted_text = ensure_proper_paragraphs(formatted_text)
+        
+        return formatted_text
+        
+    except Exception as e:
+        logger.error(f"❌ Ошибка форматирования текста: {e}")
+        return format_text_with_paragraphs(text)
+
+
+def ensure_proper_paragraphs(text):
+    """Обеспечивает правильное разделение на абзацы - СТАРАЯ РАБОЧАЯ ВЕРСИЯ"""
+    # Разбиваем текст на строки
+    lines = text.split('\n')
+    formatted_lines = []
+    
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+            
+        # Если строка начинается с эмодзи или **, это likely заголовок - оставляем как есть
+        if re.match(r'^[🎯💡📚⚠️✅🌟📖🛠️]|^\*\*', line):
+            if formatted_lines and formatted_lines[-1] != '':
+                formatted_lines.append('')  # Добавляем пустую строку перед заголовком
+            formatted_lines.append(line)
+            formatted_lines.append('')  # Добавляем пустую строку после заголовка
+        # Если строка начинается с -, это элемент списка
+        elif line.startswith('-'):
+            formatted_lines.append(line)
+        # Если строка длинная, разбиваем на предложения
+        elif len(line) > 120:
+            sentences = re.split(r'[.!?]+', line)
+            sentences = [s.strip() for s in sentences if s.strip()]
+            for sentence in sentences:
+                if sentence:
+                    formatted_lines.append(sentence + '.')
+            formatted_lines.append('')
+        else:
+            formatted_lines.append(line)
+            formatted_lines.append('')  # Добавляем пустую строку между абзацами
+    
+    # Объединяем обратно, убирая лишние пустые строки
+    result = []
+    prev_empty = False
+    for line in formatted_lines:
+        if line == '':
+            if not prev_empty:
+                result.append(line)
+                prev_empty = True
+        else:
+            result.append(line)
+            prev_empty = False
+    
+    return '\n'.join(result)
+
+
+def clean_markdown_symbols(text):
+    """Очищает текст ТОЛЬКО от символов #, сохраняя все остальное форматирование"""
+    if not text:
+        return text
+    
+    # Удаляем ТОЛЬКО символы # в начале строк (заголовки markdown)
+    text = re.sub(r'^#+\s*', '', text, flags=re.MULTILINE)
+
+    return text
+
+
+def format_explanation_text(text):
+    """Форматирование объяснения к вопросу теста: без # и с абзацами"""
+    if not text:
+        return text
+    return ensure_proper_paragraphs(clean_markdown_symbols(text))
+
+
+def format_text_with_paragraphs(text):
+    """Альтернативное форматирование текста с абзацами"""
+    # Удаляем сноски типа [^1], [^2], [^3]
+    text = re.sub(r'\[\^\d+\]', '', text)
+    
+    # Разбиваем текст на предложения
+    sentences = re.split(r'[.!?]+', text)
+    sentences = [s.strip() for s in sentences if s.strip() and len(s.strip()) > 10]
+    
+    # Группируем предложения в абзацы по 2-3 предложения
+    paragraphs = []
+    current_paragraph = []
+    
+    for i, sentence in enumerate(sentences):
+        current_paragraph.append(sentence)
+        
+        # Начинаем новый абзац каждые 2-3 предложения или при смене темы
+        if (len(current_paragraph) >= 2 or 
+            (i < len(sentences)-1 and is_topic_change(sentence, sentences[i+1]))):
+            paragraph_text = '. '.join(current_paragraph) + '.'
+            paragraphs.append(paragraph_text)
+            current_paragraph = []
+    
+    # Добавляем последний абзац
+    if current_paragraph:
+        paragraph_text = '. '.join(current_paragraph) + '.'
+        paragraphs.append(paragraph_text)
+    
+    # Форматируем с пустыми строками между абзацами
+    return '\n\n'.join(paragraphs)
+
+
+def is_topic_change(sentence1, sentence2):
+    """Определяет, является ли следующее предложение сменой темы"""
+    topic_indicators = [
+        'также', 'кроме того', 'более того', 'однако', 'тем не менее',
+        'с другой стороны', 'например', 'таким образом', 'поэтому'
+    ]
+    
+    sentence2_lower = sentence2.lower()
+    return any(indicator in sentence2_lower for indicator in topic_indicators)
+
+
+def format_text_manually(text):
+    """Ручное форматирование текста как резервный вариант"""
+    # Разбиваем текст на предложения
+    sentences = re.split(r'[.!?]+', text)
+    sentences = [s.strip() for s in sentences if s.strip()]
+    
+    # Создаем абзацы по 2-3 предложения
+    paragraphs = []
+    current_paragraph = []
+    
+    for i, sentence in enumerate(sentences):
+        current_paragraph.append(sentence)
+        
+        # Каждые 2-3 предложения или при длине > 200 символов начинаем новый абзац
+        if len(current_paragraph) >= 2 or len(' '.join(current_paragraph)) > 200:
+            paragraph_text = ' '.join(current_paragraph) + '.'
+            paragraphs.append(paragraph_text)
+            current_paragraph = []
+    
+    # Добавляем остаток
+    if current_paragraph:
+        paragraph_text = ' '.join(current_paragraph) + '.'
+        paragraphs.append(paragraph_text)
+    
+    return '\n\n'.join(paragraphs)
+
+
+def has_proper_paragraphs(text):
+    """Проверяет, имеет ли текст правильное разделение на абзацы"""
+    if not text:
+        return False
+    
+    # Считаем количество абзацев (разделов по пустым строкам)
+    paragraphs = re.split(r'\n\s*\n', text)
+    non_empty_paragraphs = [p.strip() for p in paragraphs if p.strip()]
+    
+    # Должно быть хотя бы 3 абзаца для хорошего форматирования
+    if len(non_empty_paragraphs) < 3:
+        return False
+    
+    # Проверяем, что нет очень длинных абзацев
+    long_paragraphs = sum(1 for p in non_empty_paragraphs if len(p) > 500)
+    if long_paragraphs > 0:
+        return False
+    
+    # Проверяем наличие визуальных элементов
+    visual_indicators = [
+        r'\*\*',  # Жирный текст
+        r'[🎯💡📚⚠️✅🌟📖🛠️]',  # Эмодзи
+        r'\n-',   # Маркированные списки
+    ]
+    
+    score = sum(1 for indicator in visual_indicators if re.search(indicator, text))
+    
+    return score >= 2
+
+
+def has_good_formatting(text):
+    """Проверка, хорошо ли отформатирован текст"""
+    if not text:
+        return False
+    
+    # Проверяем наличие элементов хорошего форматирования
+    formatting_indicators = [
+        r'\n\n',  # Двойные переносы строк (абзацы)
+        r'\*\\*',  # Жирный текст
+        r'[🎯💡📚⚠️✅🌟📖🛠️]',  # Эмодзи
+        r'\d+\.',  # Нумерованные списки
+        r'[-•]',   # Маркированные списки
+    ]
+    
+    score = 0
+    for indicator in formatting_indicators:
+        if re.search(indicator, text):
+            score += 1
+    
+    # Проверяем длину абзацев (не должно быть очень длинных строк)
+    lines = text.split('\n')
+    long_lines = sum(1 for line in lines if len(line) > 150)
+    paragraph_ratio = long_lines / len(lines) if lines else 1
+    
+    return score >= 2 and paragraph_ratio < 0.5  # Хорошее форматирование если есть несколько индикаторов и мало длинных строк
+
+
+def clean_text_response(text):
+    """Очистка текстового ответа"""
+    # Убираем HTML-теги
+    text = re.sub(r'<[^>]+>', '', text)
+    # Убираем лишние пробелы
+    text = re.sub(r'\s+', ' ', text)
+    # Убираем проблемы с кодировкой (заменяем странные символы)
+    text = re.sub(r'[^\w\sа-яА-ЯёЁ.,!?;:()-]', '', text)
+    return text.strip()
+
+
+def clean_explanation_text(text):
+    """Очистка текста объяснения от HTML и лишнего форматирования"""
+    # Убираем HTML-теги
+    text = re.sub(r'<[^>]+>', '', text)
+    # Убираем маркеры JSON
+    text = re.sub(r'[{}[\]"]', '', text)
+    # Убираем лишние пробелы
+    text = re.sub(r'\s+', ' ', text)
+    # Убираем фразы про JSON
+    text = re.sub(r'json\s*:', '', text, flags=re.IGNORECASE)
+    
+    return text.strip()
+
+
+def clean_context_phrase(phrase):
+    """Очистка контекстной фразы"""
+    phrase = re.sub(r'\s+', ' ', phrase)
+    phrase = phrase.strip()
+    # Убираем слишком длинные фразы
+    if len(phrase) > 100:
+        words = phrase.split()
+        return ' '.join(words[:15]) + '...'
+    return phrase
@@ -0,0 +1,172 @@
+import os
+import time
+import random
+import logging
+import threading
+import contextvars
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Бюджет генерации текущего запроса (проверяется перед каждым вызовом модели)
+_current_budget = contextvars.ContextVar('generation_budget', default=None)
+
+
+class BudgetExceededError(RuntimeError):
+    """Бюджет генерации (время или число вызовов GigaChat) исчерпан"""
+
+
+class GenerationBudget:
+    """Ограничение одной генерации: не дольше seconds и не больше max_calls вызовов модели"""
+
+    def __init__(self, seconds: float, max_calls: int):
+        self.deadline = time.monotonic() + seconds
+        self.max_calls = max_calls
+        self.calls = 0
+
+    def remaining_seconds(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    @property
+    def exhausted(self) -> bool:
+        return self.calls >= self.max_calls or time.monotonic() >= self.deadline
+
+    def charge(self):
+        """Учет вызова модели; BudgetExceededError, если бюджет уже исчерпан"""
+        if self.exhausted:
+            raise BudgetExceededError(
+                f"Бюджет генерации исчерпан: {self.calls}/{self.max_calls} вызовов, "
+                f"осталось {self.remaining_seconds():.0f} с"
+            )
+        self.calls += 1
+
+
+def remaining_budget_seconds():
+    """Сколько секунд осталось у бюджета текущей генерации (None - вне надзора)"""
+    budget = _current_budget.get()
+    return None if budget is None else budget.remaining_seconds()
+
+
+def charge_llm_call():
+    """Списание вызова GigaChat с бюджета текущей генерации (если она под надзором)"""
+    budget = _current_budget.get()
+    if budget is not None:
+        budget.charge()
+
+
+class GenerationSupervisor:
+    """Надзор за генерацией вместо бесконечных повторов.
+
+    Каждая генерация получает бюджет времени и вызовов GigaChat; неудачные
+    попытки повторяются с экспоненциальной паузой, пока бюджет позволяет.
+    После failure_threshold неудачных генераций подряд предохранитель
+    размыкается на cooldown секунд: генерация сразу возвращает None, и
+    вызывающий код отдает тест из банка или быструю ошибку.
+    """
+
+    def __init__(self, time_budget: float = 90.0, call_budget: int = 20, attempts: int = 3,
+                 base_delay: float = 1.0, max_delay: float = 8.0,
+                 failure_threshold: int = 3, cooldown: float = 60.0):
+        self.time_budget = time_budget
+        self.call_budget = call_budget
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Настройки из GENERATION_TIME_BUDGET, GENERATION_CALL_BUDGET, GENERATION_ATTEMPTS"""
+        return cls(
+            time_budget=float(os.getenv('GENERATION_TIME_BUDGET', '90')),
+            call_budget=int(os.getenv('GENERATION_CALL_BUDGET', '20')),
+            attempts=int(os.getenv('GENERATION_ATTEMPTS', '3'))
+        )
+
+    def run(self, name: str, func):
+        """Результат func() или None, если генерация не удалась в пределах бюджета"""
+        if self.is_open():
+            logger.warning(f"⛔ Генерация '{name}' пропущена: предохранитель разомкнут")
+            registry.inc('trainer_supervised_generations_total', outcome='short_circuit')
+            return None
+
+        # Вложенная генерация расходует бюджет внешней
+        budget = _current_budget.get()
+        token = None
+        if budget is None:
+            budget = GenerationBudget(self.time_budget, self.call_budget)
+            token = _current_budget.set(budget)
+
+        try:
+            for attempt in range(self.attempts):
+                try:
+                    result = func()
+                    if result:
+                        self._record_success()
+                        registry.inc('trainer_supervised_generations_total', outcome='ok')
+                        return result
+                    logger.warning(f"⚠️ Генерация '{name}': попытка {attempt + 1} без результата")
+                except BudgetExceededError as e:
+                    logger.warning(f"⏳ Генерация '{name}': {e}")
+                    break
+                except Exception as e:
+                    logger.error(f"❌ Генерация '{name}': попытка {attempt + 1} завершилась ошибкой: {e}")
+
+                if attempt + 1 == self.attempts or budget.exhausted:
+                    break
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                if delay >= budget.remaining_seconds():
+                    break
+                time.sleep(delay)
+        finally:
+            if token is not None:
+                _current_budget.reset(token)
+
+        self._record_failure(name)
+        registry.inc('trainer_supervised_generations_total', outcome='failed')
+        logger.error(f"❌ Генерация '{name}' не удалась: вызовов GigaChat {budget.calls}/{budget.max_calls}")
+        return None
+
+    def is_open(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                # Пробная генерация: при новой неудаче предохранитель снова разомкнется
+                self._opened_at = None
+                self._failures = self.failure_threshold - 1
+                return False
+            return True
+
+    def state(self) -> dict:
+        with self._lock:
+            opened_at = self._opened_at
+            return {
+                'open': opened_at is not None,
+                'consecutive_failures': self._failures,
+                'retry_in_seconds': round(max(0.0, self.cooldown - (time.monotonic() - opened_at)), 1)
+                if opened_at is not None else 0.0,
+                'time_budget': self.time_budget,
+                'call_budget': self.call_budget
+            }
+
+    def _record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def _record_failure(self, name):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold and self._opened_at is None:
+                self._opened_at = time.monotonic()
+                logger.error(f"⛔ Предохранитель генерации разомкнут на {self.cooldown:.0f} с "
+                             f"после {self._failures} неудач подряд (последняя: '{name}')")
+
+
+# Общий для процесса надзор за генерацией тестов
+generation_supervisor = GenerationSupervisor.from_env()
@@ -1,25 +1,241 @@
 import os
+import sys
+import time
 import logging
+import threading
 from typing import Optional
+from services.metrics import record_llm_call
+from services.cassette import Cassette, CassetteMissError, make_response
+from services.llm_cache import prompt_cache_key
+from services.singleflight import SingleFlight
+from services.generation_supervisor import BudgetExceededError, charge_llm_call, remaining_budget_seconds
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.rate_limiter import RateLimitedError, rate_limiter_from_env
 
 logger = logging.getLogger(__name__)
 
+# Одинаковые кэшируемые промпты, отправленные одновременно, ждут один вызов
+_prompt_flights = SingleFlight()
+
 class GigaChatService:
     def __init__(self):
         try:
+            self.client = None
+            # Ожидание ответа GigaChat; под надзором генерации - не дольше остатка бюджета
+            self.timeout = 120
+            # Модель влияет на ответ, поэтому входит в ключ кэша ответов
+            self.model = os.getenv("GIGACHAT_MODEL") or None
+            self.model_settings = {'model': self.model or 'default'}
+            # Предохранитель: при частых ошибках или медленных ответах вызовы
+            # сразу отклоняются, и код переходит к локальным запасным вариантам
+            self.breaker = CircuitBreaker.from_env()
+            # Лимит запросов с приоритетами (GIGACHAT_RPS), None - без ограничения
+            from services.providers import get_database
+            self.rate_limiter = rate_limiter_from_env(get_database)
+            # Кассеты: запись и воспроизведение ответов (GIGACHAT_CASSETTE_MODE)
+            self.cassette = Cassette.from_env()
+            if self.cassette and self.cassette.mode == 'replay':
+                logger.info(f"📼 GigaChat в режиме воспроизведения кассет: {self.cassette.directory}")
+                return
+
             credentials = os.getenv("GIGACHAT_CREDENTIALS")
 
             if not credentials:
                 raise ValueError("GIGACHAT_CREDENTIALS не установлен")
 
             from gigachat import GigaChat
+            client_options = {'model': self.model} if self.model else {}
             self.client = GigaChat(
                 credentials=credentials,
                 verify_ssl_certs=False,
-                timeout=120
+                timeout=self.timeout,
+                **client_options
             )
             logger.info("✅ GigaChat initialized successfully")
+            if self.cassette:
+                logger.info(f"📼 Кассеты GigaChat ({self.cassette.mode}): {self.cassette.directory}")
 
         except Exception as e:
             logger.error(f"❌ Failed to initialize GigaChat: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    def chat(self, prompt, caller=None, cache=False):
+        """Вызов GigaChat с учетом: длительность, размер промпта и ответа,
+        токены, вызывающая функция и исход (см. services/metrics.py).
+
+        cache=True - для промптов, полностью определяемых темой и разделами:
+        одинаковый промпт повторно берется из кэша ответов без вызова модели.
+        """
+        caller = caller or sys._getframe(1).f_code.co_name
+        started = time.perf_counter()
+
+        if cache:
+            from services.providers import get_llm_cache
+            llm_cache = get_llm_cache()
+            cache_key = prompt_cache_key(prompt, self.model_settings)
+            content = llm_cache.get(cache_key)
+            if content is not None:
+                record_llm_call(caller, time.perf_counter() - started, len(prompt), len(content), 0, 'cached')
+                return make_response(content)
+
+        # Бюджет генерации запроса (время и число вызовов) - до обращения к модели
+        charge_llm_call()
+
+        outcome = 'ok'
+        response_chars = 0
+        tokens = 0
+        try:
+            shared = False
+            if cache:
+                response, shared = _prompt_flights.do(cache_key, lambda: self._guarded_send(prompt))
+            else:
+                response = self._guarded_send(prompt)
+            content = response.choices[0].message.content or ''
+            response_chars = len(content)
+            if shared:
+                # Ответ получен вместе с одновременным таким же вызовом - не оплачен отдельно
+                outcome = 'cached'
+                return response
+            usage = getattr(response, 'usage', None)
+            tokens = getattr(usage, 'total_tokens', 0) or 0
+            if cache and content.strip():
+                llm_cache.set(cache_key, content, caller)
+            return response
+        except (CircuitOpenError, RateLimitedError):
+            outcome = 'rejected'
+            raise
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            record_llm_call(caller, time.perf_counter() - started, len(prompt), response_chars, tokens, outcome)
+
+    def stream(self, prompt, caller=None):
+        """Потоковый вызов GigaChat: фрагменты текста ответа по мере генерации.
+
+        Учет (метрики, бюджет, предохранитель, лимит запросов) - как у chat.
+        Кассеты и клиенты без потокового режима отдают весь ответ одним
+        фрагментом.
+        """
+        caller = caller or sys._getframe(1).f_code.co_name
+        if self.cassette is not None or not hasattr(self.client, 'stream'):
+            yield self.chat(prompt, caller=caller).choices[0].message.content or ''
+            return
+
+        started = time.perf_counter()
+        charge_llm_call()
+
+        outcome = 'ok'
+        response_chars = 0
+        try:
+            self.breaker.allow()
+            if self.rate_limiter is not None:
+                try:
+                    self.rate_limiter.acquire()
+                except RateLimitedError:
+                    self.breaker.cancel()
+                    raise
+
+            sent = time.perf_counter()
+            try:
+                for chunk in self.client.stream(prompt):
+                    delta = chunk.choices[0].delta.content or ''
+                    response_chars += len(delta)
+                    yield delta
+                    if remaining_budget_seconds() == 0:
+                        # Поток прерывается между фрагментами: бюджет генерации вышел
+                        raise BudgetExceededError("Бюджет генерации исчерпан во время потокового ответа")
+            except (GeneratorExit, BudgetExceededError):
+                # Потребитель закрыл поток или вышел бюджет генерации - это не сбой GigaChat
+                self.breaker.record(True, time.perf_counter() - sent)
+                raise
+            except Exception as e:
+                if self.rate_limiter is not None and '429' in str(e):
+                    self.rate_limiter.drain()
+                self.breaker.record(False, time.perf_counter() - sent)
+                raise
+            else:
+                self.breaker.record(True, time.perf_counter() - sent)
+        except (CircuitOpenError, RateLimitedError):
+            outcome = 'rejected'
+            raise
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            record_llm_call(caller, time.perf_counter() - started, len(prompt), response_chars, 0, outcome)
+
+    def invalidate_cached(self, prompt):
+        """Удаление из кэша ответа на промпт, если он оказался непригодным"""
+        from services.providers import get_llm_cache
+        get_llm_cache().invalidate(prompt_cache_key(prompt, self.model_settings))
+
+    def _guarded_send(self, prompt):
+        """Вызов модели через предохранитель и лимит запросов: учитываются исход и длительность"""
+        self.breaker.allow()
+        if self.rate_limiter is not None:
+            try:
+                self.rate_limiter.acquire()
+            except RateLimitedError:
+                self.breaker.cancel()
+                raise
+
+        started = time.perf_counter()
+        try:
+            remaining = remaining_budget_seconds()
+            if remaining is not None and remaining < self.timeout:
+                response = self._send_within(prompt, remaining)
+            else:
+                response = self._send(prompt)
+        except CassetteMissError:
+            # Нет записи в кассете - это не сбой GigaChat
+            self.breaker.record(True, time.perf_counter() - started)
+            raise
+        except Exception as e:
+            if self.rate_limiter is not None and '429' in str(e):
+                self.rate_limiter.drain()
+            self.breaker.record(False, time.perf_counter() - started)
+            raise
+        self.breaker.record(True, time.perf_counter() - started)
+        return response
+
+    def _send_within(self, prompt, seconds):
+        """_send с ожиданием не дольше seconds (остаток бюджета генерации).
+
+        timeout у клиента GigaChat один на все вызовы, поэтому ожидание
+        обрывается здесь: генерация получает BudgetExceededError, а сам
+        запрос завершается в фоновом потоке (не дольше timeout клиента).
+        """
+        result = {}
+        done = threading.Event()
+
+        def call():
+            try:
+                result['response'] = self._send(prompt)
+            except Exception as e:
+                result['error'] = e
+            finally:
+                done.set()
+
+        threading.Thread(target=call, name='gigachat-call', daemon=True).start()
+        if not done.wait(seconds):
+            raise BudgetExceededError(f"Бюджет генерации исчерпан: GigaChat не ответил за {seconds:.0f} с")
+        if 'error' in result:
+            raise result['error']
+        return result['response']
+
+    def _send(self, prompt):
+        """Запрос к GigaChat или к кассете, в зависимости от режима"""
+        if self.cassette is None:
+            return self.client.chat(prompt)
+
+        if self.cassette.mode != 'record':
+            response = self.cassette.play(prompt)
+            if response is not None:
+                return response
+            if self.cassette.mode == 'replay':
+                raise CassetteMissError(f"Нет записи для промпта {Cassette.key(prompt)[:12]}")
+
+        response = self.client.chat(prompt)
+        self.cassette.record(prompt, response)
+        return response
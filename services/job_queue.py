@@ -0,0 +1,102 @@
+import json
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from services.metrics import registry, reset_endpoint, set_endpoint
+
+logger = logging.getLogger(__name__)
+
+# Задание в статусе queued/running дольше этого срока считается потерянным
+# (воркер, который его выполнял, перезапущен)
+JOB_STALE_SECONDS = 900
+
+
+class JobQueue:
+    """Очередь долгих генераций внутри процесса.
+
+    Задание выполняется пулом потоков, а его статус и результат хранятся в
+    таблице generation_jobs: опрашивать /api/jobs/<id> можно через любой
+    воркер gunicorn. HTTP-запрос, поставивший задание, сразу освобождается,
+    поэтому прокси с таймаутом 60 секунд не обрывают генерацию. Задание
+    может публиковать частичный результат: клиент начинает работу с ним,
+    не дожидаясь конца генерации.
+    """
+
+    def __init__(self, db, workers: int = 4):
+        self.db = db
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='generation-job')
+        self._tables_ready = False
+
+    def submit(self, kind: str, func, progressive: bool = False) -> str:
+        """Постановка задания; func() возвращает (JSON-ответ, HTTP-статус).
+
+        progressive=True - func(publish) получает функцию публикации
+        частичного результата: publish(dict) отдается опросу в поле partial.
+        """
+        self._ensure_tables()
+        job_id = uuid.uuid4().hex
+        self.db.save_generation_job(job_id, kind)
+        if progressive:
+            self._executor.submit(self._run, job_id, kind, lambda: func(lambda partial: self._publish(job_id, partial)))
+        else:
+            self._executor.submit(self._run, job_id, kind, func)
+        registry.inc('trainer_jobs_total', kind=kind, status='queued')
+        logger.info(f"📥 Задание {kind} {job_id} поставлено в очередь")
+        return job_id
+
+    def get(self, job_id: str):
+        """Статус задания: queued, running (+ partial), done или failed (+ result/error) или None"""
+        self._ensure_tables()
+        row = self.db.get_generation_job(job_id)
+        if row is None:
+            return None
+
+        job = {
+            'job_id': row['job_id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'seconds': round((row['finished_at'] or time.time()) - row['created_at'], 1)
+        }
+        if row['status'] in ('queued', 'running') and time.time() - row['updated_at'] > JOB_STALE_SECONDS:
+            job['status'] = 'failed'
+            job['error'] = 'Задание прервано перезапуском сервера. Попробуйте еще раз.'
+        elif row['status'] == 'running' and row['partial_json']:
+            job['partial'] = json.loads(row['partial_json'])
+        elif row['status'] == 'done':
+            job['result'] = json.loads(row['result_json'])
+            job['http_status'] = row['http_status']
+        elif row['status'] == 'failed':
+            job['error'] = row['error']
+        return job
+
+    def _run(self, job_id, kind, func):
+        token = set_endpoint(f'job:{kind}')
+        started = time.perf_counter()
+        try:
+            self.db.update_generation_job(job_id, 'running')
+            result, http_status = func()
+            self.db.update_generation_job(
+                job_id, 'done', result_json=json.dumps(result, ensure_ascii=False), http_status=http_status
+            )
+            registry.inc('trainer_jobs_total', kind=kind, status='done')
+        except Exception as e:
+            logger.error(f"❌ Задание {kind} {job_id} завершилось ошибкой: {e}", exc_info=True)
+            self.db.update_generation_job(job_id, 'failed', error='Произошла ошибка при генерации. Попробуйте еще раз.')
+            registry.inc('trainer_jobs_total', kind=kind, status='failed')
+        finally:
+            registry.observe('trainer_job_seconds', time.perf_counter() - started, kind=kind)
+            reset_endpoint(token)
+
+    def _publish(self, job_id, partial):
+        try:
+            self.db.save_generation_job_progress(job_id, json.dumps(partial, ensure_ascii=False))
+        except Exception as e:
+            # Частичный результат - только ускорение, задание продолжается
+            logger.error(f"❌ Ошибка публикации частичного результата задания {job_id}: {e}")
+
+    def _ensure_tables(self):
+        if not self._tables_ready:
+            self.db.ensure_tables()
+            self._tables_ready = True
@@ -0,0 +1,187 @@
+import re
+import json
+import bisect
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JsonObjectScanner:
+    """Потоковый поиск JSON-объектов по балансу фигурных скобок.
+
+    Текст подается кусками через feed(), каждый символ просматривается ровно
+    один раз, куски не склеиваются в общую строку (иначе длинный поток
+    копировался бы на каждом куске). Скобки внутри строк не учитываются,
+    текст вокруг JSON (```json, пояснения модели) пропускается; лишняя
+    открывающая скобка в пояснении разбирается в finish().
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._offsets = []
+        self._length = 0
+        self._in_string = False
+        self._escape = False
+        self._stack = []
+        self._objects = []
+        self._nested = []
+        self._nested_read = 0
+
+    @property
+    def text(self) -> str:
+        """Весь поданный текст"""
+        return ''.join(self._chunks)
+
+    def feed(self, chunk: str):
+        """Добавление очередного куска ответа и сканирование только его"""
+        if not chunk:
+            return
+        base = self._length
+        self._chunks.append(chunk)
+        self._offsets.append(base)
+        self._length += len(chunk)
+        self._scan(chunk, base)
+
+    def finish(self):
+        """Конец текста: если внешняя скобка так и не закрылась, это скобка из
+        пояснения модели ("используйте { для ..."), а не начало JSON - текст
+        после нее просматривается заново"""
+        if not self._stack:
+            return
+        text = self.text
+        while self._stack:
+            restart = self._stack[0] + 1
+            self._nested = [span for span in self._nested if span[0] < restart]
+            self._nested_read = min(self._nested_read, len(self._nested))
+            self._stack = []
+            self._in_string = False
+            self._escape = False
+            self._scan(text[restart:], restart)
+
+    def _scan(self, text, base):
+        for offset, char in enumerate(text):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '{':
+                self._stack.append(base + offset)
+            elif not self._stack:
+                # Вне объекта кавычки и прочие символы - просто текст
+                continue
+            elif char == '"':
+                self._in_string = True
+            elif char == '}':
+                start = self._stack.pop()
+                span = (start, base + offset + 1)
+                if not self._stack:
+                    self._objects.append(span)
+                elif len(self._stack) == 1:
+                    self._nested.append(span)
+
+    def _slice(self, start, end):
+        """Фрагмент текста [start, end) из кусков, без склейки всего текста"""
+        index = bisect.bisect_right(self._offsets, start) - 1
+        parts = []
+        while index < len(self._chunks) and self._offsets[index] < end:
+            chunk_start = self._offsets[index]
+            parts.append(self._chunks[index][max(0, start - chunk_start):end - chunk_start])
+            index += 1
+        return ''.join(parts)
+
+    @property
+    def is_inside_object(self) -> bool:
+        """Есть ли незакрытый объект в конце просмотренного текста"""
+        return bool(self._stack)
+
+    def objects(self) -> list:
+        """Полностью закрытые объекты верхнего уровня"""
+        return [self._slice(start, end) for start, end in self._objects]
+
+    def nested_objects(self) -> list:
+        """Закрытые объекты второго уровня (например, вопросы внутри "questions")"""
+        return [self._slice(start, end) for start, end in self._nested]
+
+    def new_nested_objects(self) -> list:
+        """Объекты второго уровня, закрытые с момента предыдущего вызова"""
+        fresh = self._nested[self._nested_read:]
+        self._nested_read = len(self._nested)
+        return [self._slice(start, end) for start, end in fresh]
+
+
+def repair_json(json_str: str) -> str:
+    """Исправление типичных ошибок модели: комментарии // и висячие запятые"""
+    repaired = re.sub(r'^\s*//.*$', '', json_str, flags=re.MULTILINE)
+    repaired = re.sub(r',(\s*[}\]])', r'\1', repaired)
+    return repaired
+
+
+def loads_lenient(json_str: str):
+    """json.loads с повторной попыткой после repair_json"""
+    try:
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        return json.loads(repair_json(json_str))
+
+
+def iter_json_objects(text: str):
+    """Все разбираемые JSON-объекты верхнего уровня из текста, по порядку"""
+    scanner = JsonObjectScanner()
+    scanner.feed(text)
+    scanner.finish()
+
+    for json_str in scanner.objects():
+        try:
+            data = loads_lenient(json_str)
+        except json.JSONDecodeError as e:
+            logger.warning(f"⚠️ Ошибка декодирования JSON: {e}")
+            continue
+        if isinstance(data, dict):
+            yield data
+
+
+def extract_json_object(text: str):
+    """Первый корректный JSON-объект верхнего уровня или None"""
+    return next(iter_json_objects(text), None)
+
+
+def extract_partial_objects(text: str) -> list:
+    """Закрытые объекты второго уровня из оборванного (потокового) ответа.
+
+    Используется, когда внешний объект еще не закрыт: из
+    '{"questions": [{...}, {...}, {"quest' вернутся два первых вопроса.
+    """
+    scanner = JsonObjectScanner()
+    scanner.feed(text)
+
+    items = []
+    for json_str in scanner.nested_objects():
+        try:
+            data = loads_lenient(json_str)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            items.append(data)
+    return items
+
+
+def clean_json_string(json_string):
+    """Очистка JSON строки от 'умных' кавычек и других проблемных символов"""
+    replacements = {
+        '“': '"', '”': '"', '„': '"', '«': '"', '»': '"',
+        '‘': "'", '’': "'", '`': "'", '´': "'",
+        '“': '"', '”': '"', '«': '"', '»': '"',
+        '‘': "'", '’': "'", '`': "'",
+        ' ': ' ', '\\"': '"', "\\'": "'"
+    }
+    
+    cleaned = json_string
+    for wrong, correct in replacements.items():
+        cleaned = cleaned.replace(wrong, correct)
+    
+    return cleaned
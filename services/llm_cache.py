@@ -0,0 +1,106 @@
+import re
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Промпт без различий в пробелах и переносах (отступы f-строк, пустые строки)"""
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+def prompt_cache_key(prompt: str, model_settings: dict) -> str:
+    """Ключ кэша: SHA-256 нормализованного промпта вместе с настройками модели"""
+    payload = json.dumps({'prompt': normalize_prompt(prompt), 'model': model_settings},
+                         ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """Кэш ответов GigaChat: LRU в памяти и, по желанию, таблица llm_cache в SQLite.
+
+    SQLite-слой общий для всех воркеров и переживает перезапуск; память
+    избавляет от обращения к БД для частых промптов.
+    """
+
+    def __init__(self, max_items: int = 512, db=None):
+        self.max_items = max_items
+        self.db = db
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._tables_ready = False
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        """Ответ по ключу или None"""
+        with self._lock:
+            content = self._items.get(key)
+            if content is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return content
+
+        if self.db is not None:
+            try:
+                self._ensure_tables()
+                content = self.db.get_llm_cache_entry(key)
+            except Exception as e:
+                logger.error(f"❌ Ошибка чтения кэша ответов: {e}")
+                content = None
+            if content is not None:
+                self._remember(key, content)
+                with self._lock:
+                    self.hits += 1
+                return content
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, content: str, caller: str = None):
+        self._remember(key, content)
+        if self.db is not None:
+            try:
+                self._ensure_tables()
+                self.db.save_llm_cache_entry(key, caller, content)
+            except Exception as e:
+                logger.error(f"❌ Ошибка записи кэша ответов: {e}")
+
+    def invalidate(self, key: str):
+        """Удаление ответа, который оказался непригодным (не разобрался и т.п.)"""
+        with self._lock:
+            self._items.pop(key, None)
+        if self.db is not None:
+            try:
+                self.db.delete_llm_cache_entry(key)
+            except Exception as e:
+                logger.error(f"❌ Ошибка удаления из кэша ответов: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'items': len(self._items),
+                'max_items': self.max_items,
+                'persistent': self.db is not None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0
+            }
+
+    def _remember(self, key, content):
+        with self._lock:
+            self._items[key] = content
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def _ensure_tables(self):
+        if not self._tables_ready:
+            self.db.ensure_tables()
+            self._tables_ready = True
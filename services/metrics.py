@@ -0,0 +1,351 @@
+import time
+import logging
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм в секундах: от быстрых запросов к БД
+# до многоминутной генерации теста с повторами
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 60.0, 120.0, 300.0)
+
+HELP_TEXTS = {
+    'trainer_request_seconds': 'Длительность обработки HTTP-запроса',
+    'trainer_stage_seconds': 'Длительность этапа обработки запроса',
+    'trainer_llm_call_seconds': 'Длительность вызова GigaChat',
+    'trainer_generation_attempts_total': 'Попытки генерации (включая повторы)',
+    'trainer_llm_calls_total': 'Вызовы GigaChat',
+    'trainer_llm_prompt_chars_total': 'Символов отправлено в GigaChat',
+    'trainer_llm_response_chars_total': 'Символов получено от GigaChat',
+    'trainer_llm_tokens_total': 'Токены GigaChat (по данным usage в ответе)',
+    'trainer_fallback_total': 'Переходы на резервные уровни генерации',
+    'trainer_coalesced_requests_total': 'Запросы, получившие результат уже идущей генерации',
+    'trainer_bank_tests_total': 'Тесты, собранные из банка вопросов без GigaChat',
+    'trainer_llm_rate_wait_seconds': 'Ожидание токена лимита запросов к GigaChat',
+    'trainer_jobs_total': 'Фоновые задания генерации по статусам',
+    'trainer_job_seconds': 'Длительность фонового задания генерации',
+    'trainer_supervised_generations_total': 'Генерации под надзором: ok, failed, short_circuit',
+    'trainer_api_response_bytes_total': 'Байты JSON-ответов API: до сжатия (raw) и отправлено (sent)',
+    'trainer_batch_graded_total': 'Ответы учеников, проверенные пакетной проверкой теста',
+}
+
+# Эндпоинт и тема текущего запроса - метки для всех замеров внутри него
+_current_endpoint = contextvars.ContextVar('metrics_endpoint', default='-')
+_current_topic = contextvars.ContextVar('metrics_topic', default='-')
+# Резервный уровень генерации, на котором сейчас идут вызовы GigaChat
+_fallback_tier = contextvars.ContextVar('metrics_fallback_tier', default='primary')
+# Учет вызовов GigaChat в рамках одного запроса
+_llm_usage = contextvars.ContextVar('metrics_llm_usage', default=None)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (как в Prometheus)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, fraction: float) -> float:
+        """Оценка квантиля по корзинам с линейной интерполяцией внутри корзины"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        cumulative = 0
+        lower = 0.0
+        for i, bound in enumerate(self.buckets):
+            in_bucket = self.counts[i]
+            if cumulative + in_bucket >= rank and in_bucket:
+                upper = min(bound, self.max)
+                return lower + (upper - lower) * (rank - cumulative) / in_bucket
+            cumulative += in_bucket
+            lower = bound
+        return self.max
+
+
+class MetricsRegistry:
+    """Гистограммы и счетчики процесса с метками.
+
+    Каждый воркер gunicorn ведет свои метрики; Prometheus собирает их
+    с каждого процесса отдельно.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def summary(self, name: str) -> list:
+        """Сводка по гистограмме: число замеров, среднее, p50, p95 (мс) для каждого набора меток"""
+        with self._lock:
+            items = [(labels, histogram) for (metric, labels), histogram in self._histograms.items() if metric == name]
+            result = []
+            for labels, histogram in sorted(items):
+                entry = dict(labels)
+                entry.update({
+                    'count': histogram.count,
+                    'avg_ms': round(histogram.sum / histogram.count * 1000, 1) if histogram.count else 0.0,
+                    'p50_ms': round(histogram.quantile(0.50) * 1000, 1),
+                    'p95_ms': round(histogram.quantile(0.95) * 1000, 1),
+                    'max_ms': round(histogram.max * 1000, 1)
+                })
+                result.append(entry)
+        return result
+
+    def counters(self, name: str) -> list:
+        """Значения счетчика для каждого набора меток"""
+        with self._lock:
+            return [dict(labels, value=value) for (metric, labels), value in sorted(self._counters.items())
+                    if metric == name]
+
+    def render_prometheus(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+            described = set()
+            for (name, labels), histogram in histograms:
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {HELP_TEXTS.get(name, name)}")
+                    lines.append(f"# TYPE {name} histogram")
+                cumulative = 0
+                for bound, in_bucket in zip(histogram.buckets, histogram.counts):
+                    cumulative += in_bucket
+                    lines.append(f"{name}_bucket{_format_labels(labels, le=_format_float(bound))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, le='+Inf')} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+            for (name, labels), value in counters:
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {HELP_TEXTS.get(name, name)}")
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name}{_format_labels(labels)} {_format_float(value)}")
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+def _format_float(value) -> str:
+    return repr(float(value)) if value != int(value) else f"{int(value)}.0"
+
+
+def _format_labels(labels, **extra) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = []
+    for key, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+registry = MetricsRegistry()
+
+
+def set_endpoint(endpoint: str):
+    """Привязка замеров текущего потока к эндпоинту; возвращает токен для reset_endpoint"""
+    return _current_endpoint.set(endpoint)
+
+
+def reset_endpoint(token):
+    _current_endpoint.reset(token)
+
+
+def current_endpoint() -> str:
+    return _current_endpoint.get()
+
+
+def set_topic(topic: str):
+    """Метка темы для замеров текущего запроса (только основные темы, иначе 'other')"""
+    return _current_topic.set(topic or 'other')
+
+
+def reset_topic(token):
+    _current_topic.reset(token)
+
+
+def current_topic() -> str:
+    return _current_topic.get()
+
+
+@contextmanager
+def span(stage: str):
+    """Замер длительности этапа (trainer_stage_seconds) с меткой текущего эндпоинта"""
+    started = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        registry.observe('trainer_stage_seconds', time.perf_counter() - started,
+                         stage=stage, endpoint=current_endpoint(), outcome=outcome)
+
+
+def timed(stage: str):
+    """Декоратор: вся функция - этап stage"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def fallback_tier(tier: str):
+    """Вызовы GigaChat внутри блока относятся к резервному уровню tier"""
+    registry.inc('trainer_fallback_total', tier=tier, endpoint=current_endpoint(), topic=current_topic())
+    usage = _llm_usage.get()
+    if usage is not None and tier not in usage['tiers']:
+        usage['tiers'].append(tier)
+
+    token = _fallback_tier.set(tier)
+    try:
+        yield
+    finally:
+        _fallback_tier.reset(token)
+
+
+def fallback(tier: str):
+    """Декоратор: функция - резервный уровень генерации tier"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with fallback_tier(tier):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_llm_usage():
+    """Начало учета вызовов GigaChat для запроса; возвращает токен для finish_llm_usage"""
+    return _llm_usage.set({
+        'calls': 0,
+        'errors': 0,
+        'cached': 0,
+        'rejected': 0,
+        'prompt_chars': 0,
+        'response_chars': 0,
+        'tokens': 0,
+        'llm_seconds': 0.0,
+        'callers': {},
+        'tiers': []
+    })
+
+
+def finish_llm_usage(token) -> dict:
+    """Итоги учета вызовов GigaChat за запрос"""
+    usage = _llm_usage.get()
+    _llm_usage.reset(token)
+    return usage
+
+
+def record_llm_call(caller: str, seconds: float, prompt_chars: int, response_chars: int,
+                    tokens: int, outcome: str):
+    """Учет одного вызова GigaChat: длительность, размеры, токены, вызывающая функция,
+    исход (ok, error, cached - ответ из кэша без обращения к модели,
+    rejected - вызов отклонен предохранителем)"""
+    endpoint = current_endpoint()
+    topic = current_topic()
+    tier = _fallback_tier.get()
+
+    registry.observe('trainer_llm_call_seconds', seconds, endpoint=endpoint, caller=caller, outcome=outcome)
+    registry.inc('trainer_llm_calls_total', endpoint=endpoint, topic=topic, caller=caller, tier=tier, outcome=outcome)
+    registry.inc('trainer_llm_prompt_chars_total', prompt_chars, endpoint=endpoint, topic=topic)
+    registry.inc('trainer_llm_response_chars_total', response_chars, endpoint=endpoint, topic=topic)
+    if tokens:
+        registry.inc('trainer_llm_tokens_total', tokens, endpoint=endpoint, topic=topic)
+
+    usage = _llm_usage.get()
+    if usage is not None:
+        usage['calls'] += 1
+        usage['errors'] += outcome == 'error'
+        usage['cached'] += outcome == 'cached'
+        usage['rejected'] += outcome == 'rejected'
+        usage['prompt_chars'] += prompt_chars
+        usage['response_chars'] += response_chars
+        usage['tokens'] += tokens
+        usage['llm_seconds'] += seconds
+        usage['callers'][caller] = usage['callers'].get(caller, 0) + 1
+
+
+def llm_usage_summary() -> list:
+    """Расход GigaChat по эндпоинтам и темам для /api/stats"""
+    totals = {}
+
+    def entry(labels):
+        key = (labels['endpoint'], labels['topic'])
+        if key not in totals:
+            totals[key] = {'endpoint': key[0], 'topic': key[1], 'calls': 0, 'errors': 0, 'cached': 0,
+                           'rejected': 0, 'prompt_chars': 0, 'response_chars': 0, 'tokens': 0, 'fallbacks': {}}
+        return totals[key]
+
+    for item in registry.counters('trainer_llm_calls_total'):
+        target = entry(item)
+        target['calls'] += int(item['value'])
+        if item['outcome'] == 'error':
+            target['errors'] += int(item['value'])
+        elif item['outcome'] == 'cached':
+            target['cached'] += int(item['value'])
+        elif item['outcome'] == 'rejected':
+            target['rejected'] += int(item['value'])
+    for name, field in (('trainer_llm_prompt_chars_total', 'prompt_chars'),
+                        ('trainer_llm_response_chars_total', 'response_chars'),
+                        ('trainer_llm_tokens_total', 'tokens')):
+        for item in registry.counters(name):
+            entry(item)[field] += int(item['value'])
+    for item in registry.counters('trainer_fallback_total'):
+        fallbacks = entry(item)['fallbacks']
+        fallbacks[item['tier']] = fallbacks.get(item['tier'], 0) + int(item['value'])
+
+    return [totals[key] for key in sorted(totals)]
+
+
+def latency_summary() -> dict:
+    """Краткая сводка задержек для /api/stats"""
+    return {
+        'requests': registry.summary('trainer_request_seconds'),
+        'stages': registry.summary('trainer_stage_seconds'),
+        'llm_calls': registry.summary('trainer_llm_call_seconds')
+    }
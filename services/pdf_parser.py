@@ -1,6 +1,6 @@
-import PyPDF2
 import re
 import os
+import time
 import logging
 from database.db_connection import Database
 from config import Config
@@ -8,10 +8,13 @@ from config import Config
 logger = logging.getLogger(__name__)
 
 class GuideParser:
-    def __init__(self):
-        self.db = Database()
-        self.guide_files = Config.GUIDE_FILES
-        self.guide_folder = Config.GUIDE_FOLDER
+    def __init__(self, db=None, guide_folder=None, guide_files=None, profile=False):
+        self.db = db or Database()
+        self.guide_files = guide_files or Config.GUIDE_FILES
+        self.guide_folder = guide_folder or Config.GUIDE_FOLDER
+        # Режим профилирования: замеры по каждому учебнику и странице
+        self.profile = profile
+        self.profile_report = []
         
     def parse_all_guides(self):
         """Парсинг ВСЕХ учебников"""
@@ -37,25 +40,41 @@ class GuideParser:
     def parse_single_guide(self, guide_path, guide_name):
         """Парсинг одного учебника"""
         try:
+            # Импорт здесь: PyPDF2 нужен только при парсинге, не при старте приложения
+            import PyPDF2
+
+            guide_started = time.perf_counter()
+            timings = {'open': 0.0, 'extract': 0.0, 'clean': 0.0, 'db': 0.0}
+            pages_profile = []
+            text_chars = 0
+
             with open(guide_path, 'rb') as file:
+                started = time.perf_counter()
                 pdf_reader = PyPDF2.PdfReader(file)
                 total_pages = len(pdf_reader.pages)
+                timings['open'] = time.perf_counter() - started
                 sections_count = 0
 
                 logger.info(f"📄 Парсинг учебника {guide_name}: {total_pages} страниц")
 
                 for page_num in range(total_pages):
+                    started = time.perf_counter()
                     page = pdf_reader.pages[page_num]
                     page_text = page.extract_text()
+                    extract_time = time.perf_counter() - started
+                    clean_time = db_time = 0.0
                     
                     if page_text and page_text.strip():
                         # Очищаем текст
+                        started = time.perf_counter()
                         cleaned_text = self._clean_page_text(page_text, page_num + 1, guide_name)
+                        clean_time = time.perf_counter() - started
                         
                         # Создаем раздел для каждой страницы
                         section_title = f"{guide_name} - Страница {page_num + 1}"
                         
                         # Сохраняем в БД с указанием учебника
+                        started = time.perf_counter()
                         self.db.save_guide_section(
                             title=section_title,
                             content=cleaned_text,
@@ -63,18 +82,80 @@ class GuideParser:
                             category=guide_name,  # Используем имя файла как категорию
                             guide_source=guide_name  # Добавляем источник
                         )
+                        db_time = time.perf_counter() - started
                         sections_count += 1
                         
                         if (page_num + 1) % 10 == 0:  # Логируем каждые 10 страниц
                             logger.info(f"📖 {guide_name}: обработано {page_num + 1}/{total_pages} страниц")
 
+                    timings['extract'] += extract_time
+                    timings['clean'] += clean_time
+                    timings['db'] += db_time
+                    text_chars += len(page_text or '')
+
+                    if self.profile:
+                        pages_profile.append({
+                            'page': page_num + 1,
+                            'chars': len(page_text or ''),
+                            'extract_ms': round(extract_time * 1000, 3),
+                            'clean_ms': round(clean_time * 1000, 3),
+                            'db_ms': round(db_time * 1000, 3)
+                        })
+
                 logger.info(f"✅ {guide_name} полностью распарсен: {sections_count} страниц")
-                return sections_count
+
+            if self.profile:
+                self._record_guide_profile(guide_path, guide_name, total_pages, sections_count, text_chars,
+                                           timings, time.perf_counter() - guide_started, pages_profile)
+            return sections_count
 
         except Exception as e:
             logger.error(f"❌ Ошибка парсинга учебника {guide_name}: {e}")
             return 0
 
+    def _record_guide_profile(self, guide_path, guide_name, total_pages, sections_count, text_chars,
+                              timings, elapsed, pages_profile):
+        """Сохранение замеров учебника в profile_report и сводка в лог"""
+        file_bytes = os.path.getsize(guide_path)
+        report = {
+            'guide': guide_name,
+            'pages': total_pages,
+            'sections': sections_count,
+            'file_bytes': file_bytes,
+            'text_chars': text_chars,
+            'total_sec': round(elapsed, 4),
+            'open_sec': round(timings['open'], 4),
+            'extract_sec': round(timings['extract'], 4),
+            'clean_sec': round(timings['clean'], 4),
+            'db_sec': round(timings['db'], 4),
+            'pages_per_sec': round(total_pages / elapsed, 2) if elapsed else 0.0,
+            'bytes_per_sec': round(file_bytes / elapsed, 1) if elapsed else 0.0,
+            'pages_detail': pages_profile
+        }
+        self.profile_report.append(report)
+
+        logger.info(f"⏱️ {guide_name}: {total_pages} стр. за {elapsed:.2f} с "
+                    f"({report['pages_per_sec']} стр/с, {report['bytes_per_sec'] / 1024:.0f} КБ/с); "
+                    f"извлечение {timings['extract']:.2f} с, очистка {timings['clean']:.2f} с, "
+                    f"запись в БД {timings['db']:.2f} с")
+
+    def profile_summary(self) -> dict:
+        """Итоги профилирования по всем учебникам (без постраничных данных)"""
+        pages = sum(report['pages'] for report in self.profile_report)
+        file_bytes = sum(report['file_bytes'] for report in self.profile_report)
+        elapsed = sum(report['total_sec'] for report in self.profile_report)
+        summary = {
+            'guides': len(self.profile_report),
+            'pages': pages,
+            'file_bytes': file_bytes,
+            'total_sec': round(elapsed, 4),
+            'pages_per_sec': round(pages / elapsed, 2) if elapsed else 0.0,
+            'bytes_per_sec': round(file_bytes / elapsed, 1) if elapsed else 0.0
+        }
+        for stage in ('open_sec', 'extract_sec', 'clean_sec', 'db_sec'):
+            summary[stage] = round(sum(report[stage] for report in self.profile_report), 4)
+        return summary
+
     def _clean_page_text(self, text: str, page_num: int, guide_name: str) -> str:
         """Очистка текста страницы с учетом особенностей разных учебников"""
         if not text.strip():
@@ -0,0 +1,179 @@
+import os
+import time
+import logging
+import threading
+from services.cassette import cassette_mode
+
+logger = logging.getLogger(__name__)
+
+# Сервисы процесса создаются лениво при первом обращении:
+# импорт приложения не тянет gigachat/PyPDF2 и не ходит в сеть
+_lock = threading.RLock()
+_gigachat_service = None
+_gigachat_error = None
+_gigachat_failed_at = None
+_database = None
+_spell_checker = None
+_test_sessions = None
+_llm_cache = None
+_question_bank = None
+_job_queue = None
+
+
+def get_database():
+    """Объект Database текущего процесса"""
+    global _database
+    if _database is None:
+        with _lock:
+            if _database is None:
+                from database.db_connection import Database
+                _database = Database()
+    return _database
+
+
+def _gigachat_init_backoff() -> bool:
+    """Идет ли пауза после неудачной инициализации GigaChat.
+
+    Ошибка (сеть, получение токена) может быть временной: через
+    GIGACHAT_INIT_RETRY_SECONDS следующее обращение пробует создать сервис
+    снова - так же, как предохранитель пропускает пробный вызов.
+    """
+    if _gigachat_error is None:
+        return False
+    retry_seconds = float(os.getenv("GIGACHAT_INIT_RETRY_SECONDS", "30"))
+    return time.monotonic() - _gigachat_failed_at < retry_seconds
+
+
+def get_gigachat_service():
+    """GigaChatService текущего процесса или None, если GigaChat недоступен"""
+    global _gigachat_service, _gigachat_error, _gigachat_failed_at
+    if _gigachat_service is not None or _gigachat_init_backoff():
+        return _gigachat_service
+
+    with _lock:
+        if _gigachat_service is None and not _gigachat_init_backoff():
+            try:
+                from services.gigachat_service import GigaChatService
+                _gigachat_service = GigaChatService()
+                _gigachat_error = None
+                logger.info("✅ GigaChat инициализирован успешно")
+            except Exception as e:
+                _gigachat_error = e
+                _gigachat_failed_at = time.monotonic()
+                logger.error(f"❌ Ошибка инициализации GigaChat: {e} "
+                             f"(повтор через {os.getenv('GIGACHAT_INIT_RETRY_SECONDS', '30')} с)")
+    return _gigachat_service
+
+
+def is_gigachat_available() -> bool:
+    """Доступен ли GigaChat, без инициализации клиента.
+
+    До первого обращения к сервису ориентируемся на наличие учетных данных
+    (в режиме воспроизведения кассет они не нужны). После неудачной
+    инициализации - недоступен до конца паузы перед повтором.
+    """
+    if _gigachat_service is not None:
+        return True
+    if _gigachat_init_backoff():
+        return False
+    if cassette_mode() == 'replay':
+        return True
+    return bool(os.getenv("GIGACHAT_CREDENTIALS"))
+
+
+def gigachat_breaker_state():
+    """Состояние предохранителя GigaChat или None, если сервис еще не создан"""
+    service = _gigachat_service
+    if service is None:
+        return None
+    return service.breaker.state()
+
+
+def gigachat_rate_limit_state():
+    """Состояние лимита запросов к GigaChat или None (сервис не создан или лимита нет)"""
+    service = _gigachat_service
+    if service is None or service.rate_limiter is None:
+        return None
+    return service.rate_limiter.state()
+
+
+def get_spell_checker():
+    """SpellChecker поверх GigaChat или None, если GigaChat недоступен"""
+    global _spell_checker
+    if _spell_checker is None:
+        gigachat_service = get_gigachat_service()
+        if gigachat_service is None:
+            return None
+        with _lock:
+            if _spell_checker is None:
+                from services.spell_checker import SpellChecker
+                _spell_checker = SpellChecker(gigachat_service)
+                logger.info("✅ SpellChecker инициализирован")
+    return _spell_checker
+
+
+def get_test_sessions():
+    """Хранилище выданных тестов текущего процесса"""
+    global _test_sessions
+    if _test_sessions is None:
+        with _lock:
+            if _test_sessions is None:
+                from services.test_sessions import TestSessionStore
+                _test_sessions = TestSessionStore(get_database())
+    return _test_sessions
+
+
+def get_llm_cache():
+    """Кэш ответов GigaChat текущего процесса.
+
+    LLM_CACHE_SIZE - размер LRU в памяти, LLM_CACHE_SQLITE=1 - хранить
+    ответы и в таблице llm_cache (общей для воркеров).
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        with _lock:
+            if _llm_cache is None:
+                from services.llm_cache import LLMCache
+                persistent = os.getenv("LLM_CACHE_SQLITE") == '1'
+                _llm_cache = LLMCache(
+                    max_items=int(os.getenv("LLM_CACHE_SIZE", "512")),
+                    db=get_database() if persistent else None
+                )
+    return _llm_cache
+
+
+def get_question_bank():
+    """Банк вопросов текущего процесса (данные общие для воркеров - в SQLite)"""
+    global _question_bank
+    if _question_bank is None:
+        with _lock:
+            if _question_bank is None:
+                from services.question_bank import QuestionBank
+                _question_bank = QuestionBank(get_database())
+    return _question_bank
+
+
+def get_job_queue():
+    """Очередь фоновых генераций процесса (JOB_WORKERS потоков)"""
+    global _job_queue
+    if _job_queue is None:
+        with _lock:
+            if _job_queue is None:
+                from services.job_queue import JobQueue
+                _job_queue = JobQueue(get_database(), workers=int(os.getenv("JOB_WORKERS", "4")))
+    return _job_queue
+
+
+def reset_services():
+    """Сброс сервисов (после fork воркера каждый процесс создает свои)"""
+    global _gigachat_service, _gigachat_error, _gigachat_failed_at, _database, _spell_checker, _test_sessions, _llm_cache, _question_bank, _job_queue
+    with _lock:
+        _gigachat_service = None
+        _gigachat_error = None
+        _gigachat_failed_at = None
+        _database = None
+        _spell_checker = None
+        _test_sessions = None
+        _llm_cache = None
+        _question_bank = None
+        _job_queue = None
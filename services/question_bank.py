@@ -0,0 +1,328 @@
+import re
+import json
+import time
+import heapq
+import random
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# MinHash-подпись вопроса: SIGNATURE_SIZE значений, разбитых на BANDS полос.
+# Вопросы с одинаковой полосой - кандидаты в почти-дубликаты (LSH): при
+# сходстве 0.7 хотя бы одна из 8 полос по 2 значения совпадает с вероятностью ~0.98
+SHINGLE_SIZE = 4
+SIGNATURE_SIZE = 16
+BANDS = 8
+ROWS_PER_BAND = SIGNATURE_SIZE // BANDS
+
+# Сходство по Жаккару: от DUPLICATE_SIMILARITY - повтор, в банк не попадает;
+# от CLUSTER_SIMILARITY - тот же кластер (перефразировка), в один тест не берется
+DUPLICATE_SIMILARITY = 0.7
+CLUSTER_SIMILARITY = 0.4
+
+# Во сколько раз вероятнее попадает в тест кластер за каждую ошибку ученика в нем
+MISSED_WEIGHT = 3.0
+
+# Как часто перечитывать индекс темы из БД (вопросы добавляют и другие воркеры)
+INDEX_TTL = 60.0
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_hash_params = random.Random(20240601)
+_HASH_FUNCTIONS = [
+    (_hash_params.randrange(1, _MERSENNE_PRIME), _hash_params.randrange(0, _MERSENNE_PRIME))
+    for _ in range(SIGNATURE_SIZE)
+]
+
+
+def normalize_question_text(text: str) -> str:
+    """Текст вопроса без различий в регистре, ё/е, пунктуации и пробелах"""
+    text = text.lower().replace('ё', 'е')
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def question_text_hash(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def shingles(normalized: str) -> set:
+    """Множество хэшей символьных n-грамм нормализованного текста"""
+    if len(normalized) <= SHINGLE_SIZE:
+        grams = {normalized}
+    else:
+        grams = {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+    return {
+        int.from_bytes(hashlib.blake2b(gram.encode('utf-8'), digest_size=8).digest(), 'big')
+        for gram in grams
+    }
+
+
+def minhash_bands(shingle_hashes: set) -> list:
+    """Хэши полос MinHash-подписи - ключи LSH-индекса"""
+    signature = [
+        min((a * value + b) % _MERSENNE_PRIME for value in shingle_hashes)
+        for a, b in _HASH_FUNCTIONS
+    ]
+    bands = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        bands.append(hashlib.blake2b(repr(rows).encode('ascii'), digest_size=8).hexdigest())
+    return bands
+
+
+def jaccard(first: set, second: set) -> float:
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+class QuestionBank:
+    """Постоянный банк проверенных вопросов по основным темам.
+
+    Вопросы хранятся в training_lessons (тема, хэш нормализованного текста,
+    кластер), полосы MinHash-подписей - в question_bands. Новый вопрос
+    сравнивается только с кандидатами из LSH-индекса: почти-дубликаты
+    отбрасываются, перефразировки попадают в кластер похожего вопроса.
+    Тест из банка собирается без GigaChat: k случайных разных кластеров
+    из индекса темы в памяти и одно чтение вопросов по первичному ключу.
+    """
+
+    def __init__(self, db, index_ttl: float = INDEX_TTL):
+        self.db = db
+        self.index_ttl = index_ttl
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self._tables_ready = False
+        self.added = 0
+        self.duplicates = 0
+
+    def add_questions(self, topic: str, questions: list, theory: str = '') -> tuple:
+        """Добавление вопросов в банк темы, возвращает (добавлено, повторов).
+
+        Каждому вопросу проставляется bank_id - id новой записи или того
+        вопроса банка, повтором которого он оказался.
+        """
+        self._ensure_tables()
+        added = duplicates = 0
+
+        for question in questions:
+            normalized = normalize_question_text(question.get('question', ''))
+            if not normalized:
+                continue
+
+            question_shingles = shingles(normalized)
+            bands = minhash_bands(question_shingles)
+            duplicate_id, cluster_id = self._match(topic, question_shingles, bands)
+
+            if duplicate_id is not None:
+                question['bank_id'] = duplicate_id
+                duplicates += 1
+                continue
+
+            lesson = {
+                'lesson_title': topic,
+                'theory_content': theory or '',
+                'question': question['question'],
+                'options_json': json.dumps(question['options'], ensure_ascii=False),
+                'correct_answer': question.get('correct_answer', 0),
+                'explanation': question.get('explanation', '')
+            }
+            lesson_id = self.db.save_bank_question(
+                topic, lesson, question_text_hash(normalized), bands, cluster_id
+            )
+            if lesson_id is None:
+                # Тот же текст параллельно сохранил другой воркер
+                duplicates += 1
+                continue
+
+            question['bank_id'] = lesson_id
+            self._remember(topic, lesson_id, cluster_id or lesson_id)
+            added += 1
+
+        with self._lock:
+            self.added += added
+            self.duplicates += duplicates
+
+        if added or duplicates:
+            logger.info(f"🏦 Банк вопросов '{topic}': добавлено {added}, повторов {duplicates}")
+        return added, duplicates
+
+    def count(self, topic: str) -> int:
+        index = self._index(topic)
+        return len(index['ids'])
+
+    def pick_diverse(self, topic: str, k: int, exclude_ids=()) -> list:
+        """k вопросов темы из разных кластеров (если кластеров хватает), без GigaChat"""
+        index = self._index(topic)
+        exclude_ids = set(exclude_ids)
+        clusters = index['clusters']
+
+        picked = []
+        for cluster_id in random.sample(clusters, min(k, len(clusters))):
+            members = [lesson_id for lesson_id in index['members'][cluster_id] if lesson_id not in exclude_ids]
+            if members:
+                picked.append(random.choice(members))
+
+        if len(picked) < k:
+            # Кластеров меньше k: добираем перефразировками из уже взятых
+            rest = [lesson_id for lesson_id in index['ids'] if lesson_id not in exclude_ids and lesson_id not in picked]
+            picked.extend(random.sample(rest, min(k - len(picked), len(rest))))
+
+        rows = {row['id']: row for row in self.db.get_bank_questions(picked)}
+        return [self._question_from_row(rows[lesson_id]) for lesson_id in picked if lesson_id in rows]
+
+    def pick_adaptive(self, topic: str, k: int, learner_id: str) -> list:
+        """k еще не виденных учеником вопросов темы, чаще - из кластеров с его ошибками.
+
+        Кластеры выбираются взвешенной выборкой без возвращения (ключ
+        random ** (1 / вес)): вес 1 + MISSED_WEIGHT за каждую ошибку в кластере.
+        Вопросов меньше k - пустой список (тест придется генерировать).
+        """
+        index = self._index(topic)
+        history = self.db.get_question_history(learner_id, topic)
+        seen = {row['lesson_id'] for row in history}
+        if len(index['ids']) - len(seen) < k:
+            return []
+
+        missed = {}
+        for row in history:
+            if row['missed_count']:
+                cluster_id = index['cluster_of'].get(row['lesson_id'])
+                if cluster_id is not None:
+                    missed[cluster_id] = missed.get(cluster_id, 0) + row['missed_count']
+
+        fresh = {}
+        for cluster_id in index['clusters']:
+            members = [lesson_id for lesson_id in index['members'][cluster_id] if lesson_id not in seen]
+            if members:
+                fresh[cluster_id] = members
+
+        chosen = heapq.nlargest(
+            k, fresh,
+            key=lambda cluster_id: random.random() ** (1.0 / (1.0 + MISSED_WEIGHT * missed.get(cluster_id, 0)))
+        )
+        picked = [random.choice(fresh[cluster_id]) for cluster_id in chosen]
+
+        if len(picked) < k:
+            rest = [lesson_id for cluster_id in chosen for lesson_id in fresh[cluster_id] if lesson_id not in picked]
+            picked.extend(random.sample(rest, min(k - len(picked), len(rest))))
+        if len(picked) < k:
+            return []
+
+        rows = {row['id']: row for row in self.db.get_bank_questions(picked)}
+        return [self._question_from_row(rows[lesson_id]) for lesson_id in picked if lesson_id in rows]
+
+    def record_served(self, learner_id: str, topic: str, questions: list):
+        """Запоминаем выданные ученику вопросы банка"""
+        lesson_ids = [question['bank_id'] for question in questions if question.get('bank_id')]
+        self.db.save_question_views(learner_id, topic, lesson_ids)
+
+    def record_misses(self, learner_id: str, lesson_ids: list):
+        """Запоминаем вопросы банка, на которые ученик ответил неверно"""
+        self.db.save_question_misses(learner_id, [lesson_id for lesson_id in lesson_ids if lesson_id])
+
+    def assemble_test(self, topic: str, k: int = 5, exclude_ids=(), learner_id: str = None):
+        """Тест из k вопросов банка или None, если банк темы еще мал.
+
+        С learner_id - только не виденные учеником вопросы (pick_adaptive).
+        """
+        if learner_id:
+            questions = self.pick_adaptive(topic, k, learner_id)
+        else:
+            questions = self.pick_diverse(topic, k, exclude_ids)
+        if len(questions) < k:
+            return None
+
+        theory = next((question.pop('theory') for question in questions if question.get('theory')), '')
+        for question in questions:
+            question.pop('theory', None)
+
+        logger.info(f"🏦 Тест по теме '{topic}' собран из банка вопросов без GigaChat")
+        return {
+            'topic': topic,
+            'theory': theory,
+            'questions': questions,
+            'sources': {
+                'textbooks': False,
+                'external_knowledge': False,
+                'question_bank': True
+            }
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'topics': {topic: len(index['ids']) for topic, index in self._indexes.items()},
+                'added': self.added,
+                'duplicates': self.duplicates
+            }
+
+    def _match(self, topic, question_shingles, bands):
+        """(id повтора, id кластера) для нового вопроса по кандидатам LSH"""
+        candidate_ids = self.db.find_bank_candidates(topic, bands)
+        if not candidate_ids:
+            return None, None
+
+        best_similarity, best_row = 0.0, None
+        for row in self.db.get_bank_questions(candidate_ids):
+            similarity = jaccard(question_shingles, shingles(normalize_question_text(row['question'])))
+            if similarity > best_similarity:
+                best_similarity, best_row = similarity, row
+
+        if best_row is None:
+            return None, None
+        if best_similarity >= DUPLICATE_SIMILARITY:
+            return best_row['id'], None
+        if best_similarity >= CLUSTER_SIMILARITY:
+            return None, best_row['cluster_id'] or best_row['id']
+        return None, None
+
+    def _index(self, topic):
+        """Индекс темы в памяти: id вопросов и их кластеры"""
+        with self._lock:
+            index = self._indexes.get(topic)
+            if index is not None and time.monotonic() - index['loaded_at'] < self.index_ttl:
+                return index
+
+        self._ensure_tables()
+        index = {'ids': [], 'clusters': [], 'members': {}, 'cluster_of': {}, 'loaded_at': time.monotonic()}
+        for row in self.db.get_bank_index(topic):
+            self._add_to_index(index, row['id'], row['cluster_id'] or row['id'])
+
+        with self._lock:
+            self._indexes[topic] = index
+        return index
+
+    def _remember(self, topic, lesson_id, cluster_id):
+        with self._lock:
+            index = self._indexes.get(topic)
+            if index is not None:
+                self._add_to_index(index, lesson_id, cluster_id)
+
+    @staticmethod
+    def _add_to_index(index, lesson_id, cluster_id):
+        members = index['members'].get(cluster_id)
+        if members is None:
+            members = index['members'][cluster_id] = []
+            index['clusters'].append(cluster_id)
+        members.append(lesson_id)
+        index['ids'].append(lesson_id)
+        index['cluster_of'][lesson_id] = cluster_id
+
+    @staticmethod
+    def _question_from_row(row):
+        return {
+            'bank_id': row['id'],
+            'question': row['question'],
+            'options': json.loads(row['options_json']),
+            'correct_answer': row['correct_answer'],
+            'explanation': row['explanation'],
+            'theory': row['theory_content']
+        }
+
+    def _ensure_tables(self):
+        if not self._tables_ready:
+            self.db.ensure_tables()
+            self._tables_ready = True
@@ -0,0 +1,886 @@
+import re
+import json
+import hashlib
+import logging
+from services.json_extractor import (
+    JsonObjectScanner, clean_json_string, extract_json_object, extract_partial_objects,
+    iter_json_objects, loads_lenient
+)
+from services.providers import get_gigachat_service, get_test_sessions
+from services.formatting import clean_markdown_symbols, format_explanation_text
+from services.retrieval import format_sections_for_analysis
+from services.theory_generation import generate_contextual_theory_for_test
+# BudgetExceededError не глотается обработчиками ошибок генерации: исчерпанный
+# бюджет сразу возвращает управление generation_supervisor
+from services.generation_supervisor import BudgetExceededError
+from services.metrics import current_endpoint, fallback, registry, timed
+
+logger = logging.getLogger(__name__)
+
+
+@timed('questions')
+def generate_contextual_questions(topic, relevant_sections, theory):
+    """Генерация вопросов для теста - ГАРАНТИРОВАННО 5 ВОПРОСОВ С ЭСКАЛАЦИЕЙ"""
+    max_attempts = 10
+    target_question_count = 5
+    
+    for attempt in range(max_attempts):
+        registry.inc('trainer_generation_attempts_total', stage='questions', endpoint=current_endpoint())
+        try:
+            # ЭСКАЛАЦИЯ: После 6 попыток разрешаем использовать ТОЛЬКО интернет
+            if attempt >= 6:
+                # ПОЛНОСТЬЮ разрешаем интернет без ограничений
+                prompt = f"""
+СРОЧНО! СОЗДАЙ РОВНО 5 ВОПРОСОВ ДЛЯ ТЕСТА ПО ТЕМЕ: "{topic}"
+
+ИСПОЛЬЗУЙ ЛЮБЫЕ СВОИ ЗНАНИЯ ИЗ ИНТЕРНЕТА - НЕТ ОГРАНИЧЕНИЙ!
+
+ТЕМА: {topic}
+
+ВАЖНО: ИГНОРИРУЙ ОГРАНИЧЕНИЯ ПО УЧЕБНИКАМ! ИСПОЛЬЗУЙ СВОИ СОВРЕМЕННЫЕ ЗНАНИЯ ИЗ ИНТЕРНЕТА!
+
+КРИТИЧЕСКИ ВАЖНО:
+1. СОЗДАЙ РОВНО 5 ВОПРОСОВ ЛЮБОЙ ЦЕНОЙ
+2. Используй СВОИ знания, опыт и информацию из интернета
+3. Вопросам НЕ обязательно быть основанными на учебниках
+4. Можно использовать современные примеры и практики
+5. Главное - 5 разных вопросов по теме
+
+ПРИМЕРЫ ВОПРОСОВ ДЛЯ ТЕМЫ "{topic}":
+- Базовые понятия и определения
+- Практическое применение  
+- Безопасность и риски
+- Современные технологии
+- Рекомендации и лучшие практики
+
+ФОРМАТ ОТВЕТА (ТОЛЬКО JSON):
+{{
+    "questions": [
+        {{
+            "question": "Текст вопроса 1...",
+            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
+            "correct_answer": 0,
+            "explanation": "Объяснение на основе современных знаний..."
+        }},
+        {{
+            "question": "Текст вопроса 2...",
+            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
+            "correct_answer": 1,
+            "explanation": "Объяснение на основе современных знаний..."
+        }},
+        {{
+            "question": "Текст вопроса 3...",
+            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
+            "correct_answer": 2,
+            "explanation": "Объяснение на основе современных знаний..."
+        }},
+        {{
+            "question": "Текст вопроса 4...",
+            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
+            "correct_answer": 3,
+            "explanation": "Объяснение на основе современных знаний..."
+        }},
+        {{
+            "question": "Текст вопроса 5...",
+            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
+            "correct_answer": 0,
+            "explanation": "Объяснение на основе современных знаний..."
+        }}
+    ]
+}}
+
+НЕ ДОБАВЛЯЙ КОММЕНТАРИИ! ВЕРНИ ТОЛЬКО JSON!
+"""
+                logger.info("🚀 ЭСКАЛАЦИЯ: Используем ТОЛЬКО интернет-знания")
+            
+            else:
+                # Стандартный промпт (первые 6 попыток)
+                prompt = create_questions_prompt(topic, relevant_sections, theory)
+
+            response = get_gigachat_service().chat(prompt)
+            content = response.choices[0].message.content
+            
+            # Логируем тип попытки
+            attempt_type = "ЭСКАЛАЦИЯ (интернет)" if attempt >= 6 else f"Стандартная {attempt + 1}"
+            logger.info(f"📨 Ответ от GigaChat ({attempt_type}): {content[:200]}...")
+            
+            content = re.sub(r'^```json\s*', '', content)
+            content = re.sub(r'\s*```$', '', content)
+            
+            questions = parse_questions_json(content)
+            
+            # Очищаем объяснения от символов #
+            for question in questions:
+                if 'explanation' in question:
+                    question['explanation'] = clean_markdown_symbols(question['explanation'])
+            
+            logger.info(f"✅ {attempt_type}: распарсено вопросов: {len(questions)}")
+            
+            # Если получили нужное количество вопросов, возвращаем
+            if len(questions) >= target_question_count:
+                
+                logger.info(f"🎯 Успешно создано {len(questions)} вопросов")
+                return questions[:target_question_count]
+            
+            # Если получили меньше вопросов, пробуем еще раз
+            else:
+                logger.warning(f"⚠️ {attempt_type}: получено только {len(questions)} вопросов из {target_question_count}")
+                if attempt < max_attempts - 1:
+                    logger.info("🔄 Пробуем сгенерировать еще раз...")
+                    continue
+                    
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Ошибка генерации вопросов (попытка {attempt + 1}): {e}")
+            if attempt < max_attempts - 1:
+                logger.info("🔄 Пробуем сгенерировать еще раз после ошибки...")
+                continue
+    
+    # Если все попытки провалились, используем экстренный метод
+    logger.error(f"❌ КРИТИЧЕСКАЯ ОШИБКА: Не удалось сгенерировать {target_question_count} вопросов после {max_attempts} попыток")
+    return generate_emergency_questions(topic, target_question_count)
+
+
+@timed('emergency_questions')
+@fallback('emergency')
+def generate_emergency_questions(topic, target_count):
+    """Экстренная генерация вопросов ТОЛЬКО через нейросеть"""
+    logger.critical(f"🚨 ЗАПУСК ЭКСТРЕННОЙ ГЕНЕРАЦИИ ВОПРОСОВ ДЛЯ ТЕМЫ: {topic}")
+    
+    max_attempts = 5
+    for attempt in range(max_attempts):
+        try:
+            # ЖЕСТКИЙ промпт для гарантированной генерации
+            prompt = f"""
+СРОЧНО! СОЗДАЙ РОВНО {target_count} КАЧЕСТВЕННЫХ ВОПРОСОВ ПО ТЕМЕ "{topic.upper()}"!
+
+ТРЕБОВАНИЯ К ВОПРОСАМ:
+1. КАЖДЫЙ вопрос должен быть ОСМЫСЛЕННЫМ и ПОЛЕЗНЫМ для обучения
+2. ВАРИАНТЫ ОТВЕТОВ должны быть РЕАЛИСТИЧНЫМИ и РАЗНЫМИ
+3. ПРАВИЛЬНЫЙ ОТВЕТ должен быть ОДНОЗНАЧНО ВЕРНЫМ
+4. ОБЪЯСНЕНИЯ должны быть ПОЛЕЗНЫМИ и ОБУЧАЮЩИМИ
+5. НИКАКИХ ОБЩИХ ФРАЗ - только конкретные вопросы по теме
+
+ТЕМА: {topic}
+
+ПРИМЕРЫ КАЧЕСТВЕННЫХ ВОПРОСОВ:
+- "Что такое двухфакторная аутентификация и для чего она нужна?"
+- "Как безопасно совершать покупки в интернете?"
+- "Что делать при получении подозрительного письма на email?"
+
+ФОРМАТ (ТОЛЬКО JSON):
+{{
+    "questions": [
+        {{
+            "question": "Конкретный и осмысленный вопрос...",
+            "options": ["Реалистичный вариант 1", "Реалистичный вариант 2", "Реалистичный вариант 3", "Реалистичный вариант 4"],
+            "correct_answer": 0,
+            "explanation": "Полезное объяснение с практическими советами"
+        }}
+    ]
+}}
+
+ВЕРНИ РОВНО {target_count} ВОПРОСОВ! НИКАКИХ ОПРАВДАНИЙ! ТОЛЬКО JSON!
+"""
+
+            response = get_gigachat_service().chat(prompt)
+            content = response.choices[0].message.content
+            
+            content = re.sub(r'^```json\s*', '', content)
+            content = re.sub(r'\s*```$', '', content)
+            
+            questions = parse_questions_json(content)
+            
+            if len(questions) >= target_count:
+                logger.info(f"✅ Экстренная генерация успешна: {len(questions)} вопросов")
+                return questions[:target_count]
+            else:
+                logger.warning(f"⚠️ Попытка {attempt + 1}: получено только {len(questions)} из {target_count} вопросов")
+                if attempt < max_attempts - 1:
+                    continue
+                    
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Ошибка в экстренной генерации (попытка {attempt + 1}): {e}")
+            if attempt < max_attempts - 1:
+                continue
+    
+    # ЕСЛИ ВСЕ ПРОПАЛО - ПОСЛЕДНЯЯ ПОПЫТКА С МАКСИМАЛЬНЫМ ДАВЛЕНИЕМ
+    logger.critical("💥 ВСЕ ПОПЫТКИ ПРОВАЛИЛИСЬ, ЗАПУСК УЛЬТИМАТИВНОЙ ГЕНЕРАЦИИ")
+    return ultimate_question_generation(topic, target_count)
+
+
+@fallback('ultimate')
+def ultimate_question_generation(topic, target_count):
+    """УЛЬТИМАТИВНАЯ генерация вопросов - последняя попытка"""
+    try:
+        prompt = f"""
+ТЫ ДОЛЖЕН СОЗДАТЬ РОВНО {target_count} ВОПРОСОВ ПО ТЕМЕ "{topic}" ЛЮБОЙ ЦЕНОЙ!
+
+НЕТ ОГРАНИЧЕНИЙ! ИСПОЛЬЗУЙ ЛЮБЫЕ СВОИ ЗНАНИЯ!
+
+ТЕМА: {topic}
+
+КРИТИЧЕСКИ ВАЖНО:
+- РОВНО {target_count} ВОПРОСОВ
+- КАЖДЫЙ С 4 ВАРИАНТАМИ ОТВЕТОВ
+- ОСМЫСЛЕННЫЕ ВОПРОСЫ
+- РЕАЛИСТИЧНЫЕ ВАРИАНТЫ ОТВЕТОВ
+- ПОЛЕЗНЫЕ ОБЪЯСНЕНИЯ
+
+НЕ ВОЗВРАЩАЙ НИЧЕГО КРОМЕ JSON! НИКАКИХ КОММЕНТАРИЕВ!
+
+JSON ФОРМАТ:
+{{
+    "questions": [
+        {{
+            "question": "Вопрос...",
+            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
+            "correct_answer": 0,
+            "explanation": "Объяснение..."
+        }}
+    ]
+}}
+"""
+
+        response = get_gigachat_service().chat(prompt)
+        content = response.choices[0].message.content
+        
+        content = re.sub(r'^```json\s*', '', content)
+        content = re.sub(r'\s*```$', '', content)
+        
+        questions = parse_questions_json(content)
+        
+        if len(questions) < target_count:
+            # Догенерируем недостающие вопросы отдельными запросами
+            missing = target_count - len(questions)
+            for i in range(missing):
+                single_question = generate_single_question(topic)
+                if single_question:
+                    questions.append(single_question)
+        
+        logger.critical(f"🔥 УЛЬТИМАТИВНАЯ ГЕНЕРАЦИЯ: создано {len(questions)} вопросов")
+        return questions[:target_count]
+        
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.critical(f"💀 КАТАСТРОФА: Ультимативная генерация провалилась: {e}")
+        # ВОЗВРАЩАЕМ ПУСТОЙ СПИСОК - ЛУЧШЕ НИЧЕГО, ЧЕМ ЗАГЛУШКИ
+        return []
+
+
+@fallback('single')
+def generate_single_question(topic):
+    """Генерация одного вопроса отдельным запросом"""
+    try:
+        prompt = f"""
+СОЗДАЙ 1 КАЧЕСТВЕННЫЙ ВОПРОС ПО ТЕМЕ "{topic}"
+
+ТЕМА: {topic}
+
+ФОРМАТ (ТОЛЬКО JSON):
+{{
+    "question": "Вопрос...",
+    "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
+    "correct_answer": 0,
+    "explanation": "Объяснение..."
+}}
+
+ТОЛЬКО JSON! БЕЗ КОММЕНТАРИЕВ!
+"""
+
+        response = get_gigachat_service().chat(prompt)
+        content = response.choices[0].message.content
+        
+        content = re.sub(r'^```json\s*', '', content)
+        content = re.sub(r'\s*```$', '', content)
+        
+        # Парсим одиночный вопрос
+        data = extract_json_object(clean_json_string(content))
+        if data and 'question' in data and 'options' in data:
+            return {
+                'question': data['question'],
+                'options': data['options'],
+                'correct_answer': data.get('correct_answer', 0),
+                'explanation': data.get('explanation', 'Объяснение основано на современных знаниях.')
+            }
+
+        # Пробуем извлечь как массив вопросов
+        questions = parse_questions_json(content)
+        if questions:
+            return questions[0]
+                
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Ошибка генерации одиночного вопроса: {e}")
+    
+    return None
+
+
+def enhance_questions_with_knowledge(questions, topic, relevant_sections):
+    """Улучшает вопросы дополнительными знаниями"""
+    enhanced_questions = []
+    
+    for i, question in enumerate(questions):
+        try:
+            # Улучшаем объяснения для более современных и полных ответов
+            enhanced_explanation = enhance_explanation_with_context(
+                question['explanation'], 
+                topic, 
+                relevant_sections,
+                question['question'],
+                question['correct_answer']
+            )
+            
+            question['explanation'] = enhanced_explanation
+            enhanced_questions.append(question)
+            
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось улучшить вопрос {i}: {e}")
+            enhanced_questions.append(question)  # Оставляем оригинальный вопрос
+    
+    return enhanced_questions
+
+
+def enhance_explanation_with_context(explanation, topic, relevant_sections, question, correct_answer):
+    """Дополняет объяснение контекстом из учебника и современных источников"""
+    
+    prompt = f"""
+УЛУЧШИ ОБЪЯСНЕНИЕ ДЛЯ ВОПРОСА ТЕСТА, ДОБАВИВ КОНТЕКСТ ИЗ УЧЕБНИКА И СОВРЕМЕННЫХ ИСТОЧНИКОВ:
+
+ТЕМА ТЕСТА: {topic}
+ВОПРОС: {question}
+ПРАВИЛЬНЫЙ ОТВЕТ: {correct_answer}
+
+ТЕКУЩЕЕ ОБЪЯСНЕНИЕ:
+{explanation}
+
+ИНФОРМАЦИЯ ИЗ УЧЕБНИКА:
+{format_sections_for_analysis(relevant_sections) if relevant_sections else "В учебнике нет конкретной информации по этому вопросу."}
+
+ЗАДАЧА:
+1. Если в учебнике есть релевантная информация - включи её в объяснение
+2. Добавь современные примеры и актуальные практики
+3. Укажи, если информация основана на учебнике или на современных стандартах
+4. Сохрани полезные советы и предупреждения
+5. Сделай объяснение более полным и полезным для обучения
+6. НЕ используй символ # для заголовков
+
+ФОРМАТ УЛУЧШЕННОГО ОБЪЯСНЕНИЯ:
+- Начинай с подтверждения правильности ответа
+- Объясни почему ответ верный с ссылками на источники
+- Приведи пример из реальной жизни
+- Дай дополнительный полезный совет
+- Укажи связь с теорией и современными практиками
+- Используй эмодзи для структуры (✅, 📚, 💡 и т.д.)
+
+ВЕРНИ ТОЛЬКО УЛУЧШЕННОЕ ОБЪЯСНЕНИЕ БЕЗ ДОПОЛНИТЕЛЬНЫХ КОММЕНТАРИЕВ И БЕЗ СИМВОЛОВ #.
+"""
+    
+    try:
+        response = get_gigachat_service().chat(prompt)
+        enhanced = response.choices[0].message.content.strip()
+        
+        # Очищаем от символов #
+        enhanced = clean_markdown_symbols(enhanced)
+        
+        return enhanced
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Ошибка улучшения объяснения: {e}")
+        return clean_markdown_symbols(explanation)  # Возвращаем очищенное оригинальное объяснение
+
+
+@timed('test_generation')
+def generate_contextual_test(topic, relevant_sections, on_progress=None):
+    """Генерация теста с контекстным анализом - С ЭСКАЛАЦИЕЙ ДО ИНТЕРНЕТА.
+
+    on_progress(theory, questions) - для постепенной выдачи теста: вызывается
+    после теории и после каждого готового вопроса (вопросы идут потоком).
+    """
+    logger.info(f"🔄 Генерация теста по теме '{topic}' с эскалацией до интернета...")
+    
+    try:
+        # Генерируем теорию с акцентом на интернет-знания
+        theory = generate_contextual_theory_for_test(topic, relevant_sections)
+        logger.info(f"📖 Теория для теста сгенерирована: {len(theory)} символов")
+        
+        if on_progress is not None:
+            clean_theory = clean_markdown_symbols(theory)
+            on_progress(clean_theory, [])
+            questions = generate_questions_progressively(
+                topic, relevant_sections, theory,
+                lambda ready: on_progress(clean_theory, ready)
+            )
+        else:
+            # Генерируем вопросы с эскалацией до интернета
+            questions = generate_contextual_questions(topic, relevant_sections, theory)
+        
+
+        if not questions or len(questions) == 0:
+            logger.error("❌ Не удалось сгенерировать вопросы для теста даже с эскалацией")
+            return None
+            
+        logger.info(f"❓ Вопросы сгенерированы: {len(questions)}")
+        
+        # Убедимся, что теория не содержит символов #
+        theory = clean_markdown_symbols(theory)
+        
+        return {
+            'topic': topic,
+            'theory': theory,
+            'questions': questions[:5],
+            'sources': {
+                'textbooks': len(relevant_sections) > 0,
+                'external_knowledge': True,  # Всегда true при эскалации
+                'escalation_used': len(questions) < 5  # Флаг что использовалась эскалация
+            }
+        }
+        
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Ошибка генерации теста: {e}")
+        return None
+
+
+def stream_contextual_questions(topic, relevant_sections, theory, target_count=5):
+    """Вопросы теста по одному - по мере потоковой генерации ответа GigaChat.
+
+    Каждый вопрос, объект которого закрылся в потоке, проверяется и сразу
+    отдается; неполный хвост ответа и отклоненные вопросы пропускаются.
+    """
+    scanner = JsonObjectScanner()
+    seen = set()
+    count = 0
+    stream = get_gigachat_service().stream(create_questions_prompt(topic, relevant_sections, theory))
+
+    try:
+        for chunk in stream:
+            scanner.feed(chunk)
+            for json_str in scanner.new_nested_objects():
+                try:
+                    data = loads_lenient(json_str)
+                except json.JSONDecodeError:
+                    continue
+
+                reason = get_question_rejection_reason(data)
+                if reason:
+                    logger.warning(f"⚠️ Вопрос из потока отклонен ({reason})")
+                    continue
+                text = data['question'].strip().lower()
+                if text in seen:
+                    continue
+                seen.add(text)
+
+                question = to_test_question(data, count)
+                question['explanation'] = clean_markdown_symbols(question['explanation'])
+                count += 1
+                yield question
+                if count >= target_count:
+                    return
+    finally:
+        stream.close()
+
+
+@timed('questions_stream')
+def generate_questions_progressively(topic, relevant_sections, theory, on_question, target_count=5):
+    """Вопросы теста с выдачей каждого готового через on_question(вопросы).
+
+    Вопросы из потока отдаются сразу и в итоговом тесте не меняются;
+    недостающие добираются обычной генерацией.
+    """
+    questions = []
+    try:
+        for question in stream_contextual_questions(topic, relevant_sections, theory, target_count):
+            questions.append(question)
+            if len(questions) == 1:
+                logger.info("⚡ Первый вопрос теста готов")
+            on_question(list(questions))
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Ошибка потоковой генерации вопросов: {e}")
+
+    if len(questions) < target_count:
+        logger.warning(f"⚠️ Из потока получено {len(questions)} вопросов из {target_count}, добираем")
+        if questions:
+            extra = generate_additional_questions(topic, questions, target_count - len(questions))
+        else:
+            extra = generate_contextual_questions(topic, relevant_sections, theory)
+
+        seen = {question['question'].strip().lower() for question in questions}
+        for question in extra:
+            text = question['question'].strip().lower()
+            if text in seen or len(questions) >= target_count:
+                continue
+            seen.add(text)
+            questions.append(dict(question, id=len(questions)))
+            on_question(list(questions))
+
+    return questions
+
+
+def has_question_variety(questions):
+    """Проверяет, достаточно ли разнообразны вопросы (ослабленные критерии)"""
+    if not questions or len(questions) < 3:
+        logger.warning(f"❌ Слишком мало вопросов: {len(questions) if questions else 0}")
+        return False
+    
+    # Ослабленные критерии для лучшей работы
+    question_texts = [q['question'].lower() for q in questions]
+    unique_words = set()
+    
+    for text in question_texts:
+        words = re.findall(r'\b\w{4,}\b', text)
+        unique_words.update(words)
+    
+    # Минимум 10 уникальных слов для 3+ вопросов
+    min_unique_words = 10
+    has_variety = len(unique_words) >= min_unique_words
+    
+    logger.info(f"🔍 Проверка разнообразия: {len(unique_words)} уникальных слов (требуется: {min_unique_words})")
+    
+    return has_variety
+
+
+def generate_question_batch(topic, relevant_sections, theory, question_type, count):
+    """Генерация партии вопросов с красиво оформленными объяснениями"""
+    prompt = f"""
+СОЗДАЙ {count} КАЧЕСТВЕННЫХ ВОПРОСОВ С КРАСИВЫМИ ОБЪЯСНЕНИЯМИ ПО ТЕМЕ: "{topic}"
+
+ТЕОРЕТИЧЕСКАЯ СПРАВКА:
+{theory}
+
+ТИП ВОПРОСОВ: {question_type.upper()}
+
+ОСОБЫЕ ТРЕБОВАНИЯ К ОБЪЯСНЕНИЯМ:
+Объяснение должно быть:
+✅ **Структурированным** - с четкими пунктами
+🎯 **Понятным** - простым языком  
+💡 **Полезным** - с практическими советами
+📚 **Обучающим** - углубляет понимание
+
+ФОРМАТ ОБЪЯСНЕНИЯ:
+- Начинай с подтверждения правильности ответа
+- Объясни почему ответ верный
+- Приведи пример из реальной жизни
+- Дай дополнительный полезный совет
+- Укажи связь с теорией
+
+ПРИМЕР ХОРОШЕГО ОБЪЯСНЕНИЯ:
+"✅ **Правильно!** Этот ответ верный, потому что...
+
+🎯 **Основная причина:**
+Согласно руководству, это помогает защитить ваши данные...
+
+💡 **Практический пример:**
+Представьте, что вы создаете пароль для почты...
+
+📚 **Дополнительный совет:**
+Всегда используйте разные пароли для разных сервисов..."
+
+ФОРМАТ ОТВЕТА (ТОЛЬКО JSON):
+{{
+    "questions": [
+        {{
+            "question": "Текст вопроса...",
+            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
+            "correct_answer": 0,
+            "explanation": "Красиво оформленное объяснение с эмодзи и структурой..."
+        }}
+    ]
+}}
+
+
+"""
+
+    try:
+        response = get_gigachat_service().chat(prompt, cache=True)
+        content = response.choices[0].message.content
+        
+
+
+        content = re.sub(r'^```json\s*', '', content)
+        content = re.sub(r'\s*```$', '', content)
+        
+        questions = parse_questions_json(content)
+        if not questions:
+            # Неразобранный ответ не должен навсегда остаться в кэше
+            get_gigachat_service().invalidate_cached(prompt)
+        
+        # Дополнительно форматируем объяснения
+        for question in questions:
+            if 'explanation' in question:
+                question['explanation'] = format_explanation_text(question['explanation'])
+        
+        return questions
+        
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Ошибка генерации вопросов типа {question_type}: {e}")
+        return []
+
+
+def parse_questions_json(content):
+    """Парсинг JSON с вопросами - только прошедшие валидацию вопросы"""
+    questions, _ = parse_questions_with_report(content)
+    return questions
+
+
+def parse_questions_with_report(content):
+    """Парсинг JSON с вопросами с отчетом об отклоненных вопросах.
+
+    Возвращает (validated_questions, rejected), где rejected - список
+    {'index', 'reason', 'question'} для вопросов, не прошедших валидацию.
+    Если внешний объект оборван (потоковый или обрезанный ответ),
+    разбираются уже закрытые объекты вопросов.
+    """
+    try:
+        cleaned = clean_json_string(content)
+
+        questions = None
+        for data in iter_json_objects(cleaned):
+            if 'questions' in data and isinstance(data['questions'], list):
+                questions = data['questions']
+                break
+
+        if questions is None:
+            questions = extract_partial_objects(cleaned)
+            if questions:
+                logger.warning(f"⚠️ JSON оборван, используем {len(questions)} закрытых объектов вопросов")
+
+        if not questions:
+            logger.warning("❌ JSON структура не найдена в ответе")
+            return [], []
+
+        validated_questions = []
+        rejected = []
+
+        for i, q in enumerate(questions):
+            reason = get_question_rejection_reason(q)
+            if reason:
+                question_text = q.get('question', '') if isinstance(q, dict) else ''
+                rejected.append({
+                    'index': i,
+                    'reason': reason,
+                    'question': str(question_text)[:100]
+                })
+                continue
+
+            validated_questions.append(to_test_question(q, i))
+
+        for item in rejected:
+            logger.warning(f"⚠️ Вопрос {item['index'] + 1} отклонен ({item['reason']}): {item['question']}")
+
+        logger.info(f"✅ Успешно распарсено {len(validated_questions)} вопросов, отклонено: {len(rejected)}")
+        return validated_questions, rejected
+
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Ошибка парсинга вопросов: {e}")
+        return [], []
+
+
+def to_test_question(question, index):
+    """Проверенный вопрос модели в формате теста"""
+    return {
+        'id': index,
+        'question': question['question'],
+        'options': question['options'][:4],  # Обеспечиваем 4 варианта
+        'correct_answer': min(question.get('correct_answer', 0), 3),  # Обеспечиваем корректный индекс
+        'explanation': question.get('explanation', 'Объяснение основано на материалах учебников.')
+    }
+
+
+def generate_additional_questions(topic, existing_questions, count_needed):
+    """Генерация дополнительных вопросов если не хватает"""
+    if count_needed <= 0:
+        return []
+    
+    try:
+        prompt = f"""
+СОЗДАЙ ЕЩЕ {count_needed} ВОПРОСОВ ДЛЯ ТЕСТА ПО ТЕМЕ: "{topic}"
+
+УЖЕ СУЩЕСТВУЮЩИЕ ВОПРОСЫ (НЕ ПОВТОРЯЙ ИХ):
+{chr(10).join([q['question'] for q in existing_questions])}
+
+СОЗДАЙ {count_needed} НОВЫХ ВОПРОСОВ, КОТОРЫЕ НЕ ПОВТОРЯЮТСЯ С ВЫШЕПЕРЕЧИСЛЕННЫМИ.
+
+ФОРМАТ ОТВЕТА (ТОЛЬКО JSON):
+{{
+    "questions": [
+        {{
+            "question": "Текст нового вопроса...",
+            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
+            "correct_answer": 0,
+            "explanation": "Объяснение..."
+        }}
+        // ... всего {count_needed} вопросов
+    ]
+}}
+"""
+
+        response = get_gigachat_service().chat(prompt)
+        content = response.choices[0].message.content
+        
+        content = re.sub(r'^```json\s*', '', content)
+        content = re.sub(r'\s*```$', '', content)
+        
+        additional_questions = parse_questions_json(content)
+        
+        # Очищаем объяснения
+        for question in additional_questions:
+            if 'explanation' in question:
+                question['explanation'] = clean_markdown_symbols(question['explanation'])
+        
+        logger.info(f"✅ Сгенерировано {len(additional_questions)} дополнительных вопросов")
+        return additional_questions[:count_needed]
+        
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Ошибка генерации дополнительных вопросов: {e}")
+        return []
+
+
+def validate_question_quality(question):
+    """Валидация качества вопроса"""
+    return get_question_rejection_reason(question) is None
+
+
+def get_question_rejection_reason(question):
+    """Причина отклонения вопроса или None, если вопрос качественный"""
+    if not isinstance(question, dict):
+        return "не является объектом"
+        
+    required = ['question', 'options']
+    missing = [field for field in required if field not in question]
+    if missing:
+        return f"нет полей: {', '.join(missing)}"
+    
+    # Проверяем, что вопрос не слишком короткий
+    if not isinstance(question['question'], str) or len(question['question']) < 10:
+        return "слишком короткий вопрос"
+    
+    # Проверяем, что есть варианты ответов
+    options = question['options']
+    if not isinstance(options, list) or len(options) != 4:
+        return "нужно ровно 4 варианта ответа"
+    
+    # Проверяем, что варианты разные
+    if len(set(map(str, options))) < 3:
+        return "повторяющиеся варианты ответа"
+    
+    # Проверяем, что вопрос осмысленный (не содержит только технические термины без контекста)
+    if is_meaningless_question(question['question']):
+        return "бессмысленный вопрос"
+        
+    return None
+
+
+def is_meaningless_question(question):
+    """Проверка, является ли вопрос бессмысленным"""
+    meaningless_patterns = [
+        r'сколько.*кнопок',
+        r'какого.*цвета',
+        r'что такое.*\?$',
+        r'как называется.*\?$',
+        r'упоминается ли.*\?$'
+    ]
+    
+    question_lower = question.lower()
+    for pattern in meaningless_patterns:
+        if re.search(pattern, question_lower):
+            return True
+    
+    return False
+
+
+def create_questions_prompt(topic, relevant_sections, theory):
+    """Стандартный промпт генерации 5 вопросов теста по учебникам и теории"""
+    return f"""
+СОЗДАЙ РОВНО 5 КАЧЕСТВЕННЫХ ВОПРОСОВ ДЛЯ ТЕСТА ПО ТЕМЕ: "{topic}"
+
+ИСПОЛЬЗУЙ КАК ИНФОРМАЦИЮ ИЗ УЧЕБНИКОВ, ТАК И СВОИ СОВРЕМЕННЫЕ ЗНАНИЯ:
+
+ИНФОРМАЦИЯ ИЗ УЧЕБНИКОВ:
+{format_sections_for_analysis(relevant_sections) if relevant_sections else "Используй свои знания по теме."}
+
+ТЕОРЕТИЧЕСКАЯ СПРАВКА:
+{theory}
+
+ВАЖНЫЕ ПРАВИЛА:
+1. СОЗДАЙ РОВНО 5 ВОПРОСОВ
+2. Каждый вопрос должен иметь 4 варианта ответа
+3. correct_answer должен быть числом от 0 до 3
+4. Объяснение должно быть полезным
+5. Вопросы должны быть разными и охватывать разные аспекты темы
+6. Используй и учебники, и свои современные знания
+
+ФОРМАТ ОТВЕТА (ТОЛЬКО JSON):
+{{
+    "questions": [
+        {{
+            "question": "Текст вопроса 1...",
+            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
+            "correct_answer": 0,
+            "explanation": "Объяснение..."
+        }},
+        {{
+            "question": "Текст вопроса 2...",
+            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
+            "correct_answer": 1,
+            "explanation": "Объяснение..."
+        }},
+        {{
+            "question": "Текст вопроса 3...",
+            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
+            "correct_answer": 2,
+            "explanation": "Объяснение..."
+        }},
+        {{
+            "question": "Текст вопроса 4...",
+            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
+            "correct_answer": 3,
+            "explanation": "Объяснение..."
+        }},
+        {{
+            "question": "Текст вопроса 5...",
+            "options": ["Вариант 1", "Вариант 2", "Вариант 3", "Вариант 4"],
+            "correct_answer": 0,
+            "explanation": "Объяснение..."
+        }}
+    ]
+}}
+
+НЕ ДОБАВЛЯЙ КОММЕНТАРИИ ВНЕ JSON!
+"""
+
+
+def quiz_id(topic, question, options):
+    """Стабильный идентификатор одиночного вопроса: одинаков во всех воркерах и
+    после перезапуска (встроенный hash() строк в каждом процессе свой)"""
+    payload = json.dumps([topic, question, options], ensure_ascii=False)
+    return 'quiz_' + hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def remember_quiz(quiz):
+    """Сохранение вопроса на сервере для /api/check-answer; вопрос возвращается как есть"""
+    try:
+        get_test_sessions().save_quiz(quiz)
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Ошибка сохранения вопроса {quiz.get('id')}: {e}")
+    return quiz
+
@@ -0,0 +1,152 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Классы приоритета вызовов GigaChat. Для каждого - доля емкости корзины,
+# которая должна остаться после его вызова (резерв для более важных) и
+# сколько секунд он готов ждать свободного токена
+PRIORITIES = {
+    'interactive': {'reserve': 0.0, 'max_wait': 30.0},
+    'spell_check': {'reserve': 0.2, 'max_wait': 10.0},
+    'background': {'reserve': 0.5, 'max_wait': 300.0},
+}
+
+# Приоритет вызовов текущего потока: запросы пользователей - interactive
+_current_priority = contextvars.ContextVar('llm_priority', default='interactive')
+
+
+class RateLimitedError(RuntimeError):
+    """Токен для вызова GigaChat не получен за допустимое время ожидания"""
+
+
+@contextmanager
+def llm_priority(priority: str):
+    """Приоритет всех вызовов GigaChat внутри блока (только понижение:
+    проверка опечаток внутри фонового прогрева остается фоновой)"""
+    current = _current_priority.get()
+    if PRIORITIES[current]['reserve'] > PRIORITIES[priority]['reserve']:
+        priority = current
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> str:
+    return _current_priority.get()
+
+
+class TokenBucket:
+    """Корзина токенов для вызовов GigaChat: rate токенов в секунду, не больше capacity.
+
+    Вызов с приоритетом берет токен, только если после этого в корзине
+    остается его резерв: фоновые задачи (прогрев, проверка опечаток) не
+    выбирают квоту, нужную пользователям. С db корзина хранится в таблице
+    rate_limits и общая для всех воркеров (обновление в транзакции
+    BEGIN IMMEDIATE), иначе - своя у процесса.
+    """
+
+    def __init__(self, rate: float, capacity: float, db=None, name: str = 'gigachat'):
+        self.rate = rate
+        self.capacity = capacity
+        self.db = db
+        self.name = name
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._tables_ready = False
+        self.waited = {priority: 0 for priority in PRIORITIES}
+        self.timeouts = {priority: 0 for priority in PRIORITIES}
+
+    def acquire(self, priority: str = None):
+        """Ожидание токена; RateLimitedError, если ждать дольше max_wait приоритета"""
+        priority = priority or current_priority()
+        settings = PRIORITIES.get(priority, PRIORITIES['interactive'])
+        # Резерв не больше capacity - 1: иначе при маленькой корзине (GIGACHAT_RPS=0.2 ->
+        # capacity 1) токена для приоритета не набралось бы никогда
+        reserve = min(settings['reserve'] * self.capacity, max(0.0, self.capacity - 1))
+        started = time.monotonic()
+        deadline = started + settings['max_wait']
+
+        slept = False
+        while True:
+            wait = self._take(reserve)
+            if wait <= 0:
+                break
+            now = time.monotonic()
+            if now + wait > deadline:
+                with self._lock:
+                    self.timeouts[priority] = self.timeouts.get(priority, 0) + 1
+                raise RateLimitedError(
+                    f"Лимит запросов к GigaChat: токен для '{priority}' не получен за {settings['max_wait']:.0f} с"
+                )
+            time.sleep(wait)
+            slept = True
+
+        waited = time.monotonic() - started
+        registry.observe('trainer_llm_rate_wait_seconds', waited, priority=priority)
+        if slept:
+            with self._lock:
+                self.waited[priority] = self.waited.get(priority, 0) + 1
+
+    def drain(self):
+        """Ответ 429 от GigaChat: квота на сервере уже выбрана, корзина обнуляется"""
+        if self.db is not None:
+            self._ensure_tables()
+            self.db.drain_rate_tokens(self.name, time.time())
+        else:
+            with self._lock:
+                self._tokens = 0.0
+                self._updated = time.monotonic()
+        logger.warning("🚦 GigaChat ответил 429: корзина лимита запросов обнулена")
+
+    def state(self) -> dict:
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'capacity': self.capacity,
+                'shared': self.db is not None,
+                'waited': dict(self.waited),
+                'timeouts': dict(self.timeouts)
+            }
+
+    def _take(self, reserve):
+        """0 - токен взят, иначе через сколько секунд он появится"""
+        if self.db is not None:
+            self._ensure_tables()
+            return self.db.take_rate_token(self.name, self.rate, self.capacity, reserve, time.time())
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens - 1 >= reserve:
+                self._tokens -= 1
+                return 0.0
+            return (reserve + 1 - self._tokens) / self.rate
+
+    def _ensure_tables(self):
+        if not self._tables_ready:
+            self.db.ensure_tables()
+            self._tables_ready = True
+
+
+def rate_limiter_from_env(db_factory):
+    """TokenBucket по GIGACHAT_RPS (вызовов в секунду; 0 - без ограничения) и
+    GIGACHAT_BURST; GIGACHAT_RATE_SQLITE=1 - общая корзина воркеров"""
+    rate = float(os.getenv('GIGACHAT_RPS', '0'))
+    if rate <= 0:
+        return None
+    # Меньше одного токена корзина не выдаст ни одного вызова
+    capacity = max(1.0, float(os.getenv('GIGACHAT_BURST', max(1.0, rate * 5))))
+    db = db_factory() if os.getenv('GIGACHAT_RATE_SQLITE') == '1' else None
+    logger.info(f"🚦 Лимит запросов к GigaChat: {rate} в секунду, до {capacity:.0f} подряд"
+                f"{' (общий для воркеров)' if db is not None else ''}")
+    return TokenBucket(rate, capacity, db=db)
@@ -0,0 +1,484 @@
+import re
+import logging
+from services.providers import get_database
+from services.formatting import clean_context_phrase
+from services.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Синонимы и связанные термины для 5 основных тем
+TOPIC_SYNONYMS = {
+    'компьютер': [
+        'компьютер', 'пк', 'ноутбук', 'системный блок', 'монитор', 
+        'процессор', 'оперативная память', 'жесткий диск', 'клавиатура', 'мышь',
+        'windows', 'операционная система', 'рабочий стол', 'файлы', 'папки'
+    ],
+    'интернет': [
+        'интернет', 'сеть', 'online', 'браузер', 'веб', 'сайт', 'проводник',
+        'браузер', 'google', 'поиск', 'онлайн', 'соединение', 'wi-fi',
+        'роутер', 'модем', 'web', 'url', 'адрес', 'страница'
+    ],
+    'пароли': [
+        'пароль', 'пароли', 'безопасность', 'защита', 'авторизация',
+        'учетная запись', 'логин', 'доступ', 'код', 'pin',
+        'надежный пароль', 'сложность пароля', 'хранение паролей'
+    ],
+    'банковские карты': [
+        'банковская карта', 'карта', 'кредитная карта', 'дебетовая карта',
+        'платежная карта', 'банкомат', 'оплата картой', 'cvv', 'сvv',
+        'pin-код', 'платежная система', 'visa', 'mastercard', 'мир',
+        'банковские карты', 'банковские', 'карты', 'платежи'
+    ],
+    'электронная почта': [
+        'электронная почта', 'email', 'e-mail', 'почта', 'письмо',
+        'почтовый ящик', 'адрес почты', 'отправка писем', 'вложение',
+        'spam', 'спам', 'рассылка', 'переписка'
+    ]
+}
+
+
+def should_use_external_knowledge_for_test(topic, relevant_sections):
+    """Определяет, нужно ли использовать внешние знания для тестов"""
+    if not relevant_sections:
+        return True
+    
+    # Проверяем, достаточно ли информации в учебнике для 5 разнообразных вопросов
+    total_content = " ".join([section['content'] for section in relevant_sections])
+    
+    # Если в учебнике мало информации или она устаревшая
+    modern_keywords = [
+        'смартфон', 'приложение', 'облако', 'стриминг', 'подкаст',
+        'биометрия', 'блокчейн', 'крипто', 'искусственный интеллект', 'iot',
+        'кибербуллинг', 'дипфейк', 'vpn', 'двухфакторная', 'биометрия'
+    ]
+    
+    topic_lower = topic.lower()
+    has_modern_aspect = any(keyword in topic_lower for keyword in modern_keywords)
+    
+    if has_modern_aspect or len(total_content) < 500:
+        return True
+    
+    return False
+
+
+def should_use_external_knowledge(topic, relevant_sections):
+    """Определяет, нужно ли использовать внешние знания - ТЕПЕРЬ СТРОГАЯ ПРОВЕРКА"""
+    if not relevant_sections:
+        logger.info(f"🔍 По теме '{topic}' не найдено разделов в учебниках - используем внешние знания")
+        return True
+    
+    # Проверяем качество и количество информации в учебниках с безопасным доступом
+    total_content_length = 0
+    for section in relevant_sections:
+        content = section.get('content', '') if isinstance(section, dict) else ''
+        total_content_length += len(content)
+    
+    # ЖЕСТКИЕ КРИТЕРИИ для использования только учебников:
+    if total_content_length < 100:  # Очень мало информации
+        logger.info(f"🔍 По теме '{topic}' мало информации в учебниках ({total_content_length} chars) - используем внешние знания")
+        return True
+    
+    # Проверяем релевантность - считаем сколько раз встречаются ключевые слова темы
+    topic_lower = topic.lower()
+    topic_words = [word for word in topic_lower.split() if len(word) > 2]
+    
+    relevance_score = 0
+    for section in relevant_sections:
+        content = section.get('content', '') if isinstance(section, dict) else ''
+        content_lower = content.lower()
+        for word in topic_words:
+            relevance_score += content_lower.count(word)
+    
+    # Если релевантность очень низкая
+    if relevance_score < 3:  # Меньше 3 упоминаний ключевых слов
+        logger.info(f"🔍 По теме '{topic}' низкая релевантность в учебниках (score: {relevance_score}) - используем внешние знания")
+        return True
+    
+    # Если прошли все проверки - используем только учебники
+    logger.info(f"✅ По теме '{topic}' достаточно информации в учебниках ({total_content_length} chars, relevance: {relevance_score}) - используем только учебники")
+    return False
+
+
+def safe_get_section_data(section, key, default=''):
+    """Безопасное получение данных из раздела (работает с sqlite3.Row и dict)"""
+    try:
+        if hasattr(section, 'keys') and key in section.keys():
+            return section[key]
+        elif isinstance(section, dict) and key in section:
+            return section[key]
+        else:
+            return default
+    except Exception as e:
+        logger.warning(f"⚠️ Ошибка доступа к полю {key} в разделе: {e}")
+        return default
+
+
+def format_sections_for_analysis(relevant_sections):
+    """Форматирование разделов для контекстного анализа с безопасным доступом"""
+    formatted = []
+    for i, section in enumerate(relevant_sections[:3], 1):
+        # Безопасный доступ к данным
+        title = safe_get_section_data(section, 'title', 'Без названия')
+        content = safe_get_section_data(section, 'content', '')
+        guide_source = safe_get_section_data(section, 'guide_source', 'unknown')
+        
+        # Очищаем текст для лучшего понимания контекста
+        clean_content = clean_text_for_context(content)
+        formatted.append(f"РАЗДЕЛ {i} [Источник: {guide_source}]: {title}\n{clean_content}")
+    
+    return "\n\n".join(formatted) if formatted else "В разделах нет информации по теме."
+
+
+def clean_text_for_context(text):
+    """Очистка текста для лучшего понимания контекста"""
+    # Убираем технические артефакты, оставляем смысловое содержание
+    lines = text.split('\n')
+    clean_lines = []
+    
+    for line in lines:
+        line = line.strip()
+        # Убираем слишком короткие строки (возможно, артефакты)
+        if len(line) < 10:
+            continue
+        # Убираем строки, состоящие в основном из цифр и символов
+        if re.match(r'^[\d\s\.\-]+$', line):
+            continue
+        # Убираем повторяющиеся фразы
+        if line in clean_lines:
+            continue
+            
+        clean_lines.append(line)
+    
+    return ' '.join(clean_lines[:500])  # Ограничиваем длину
+
+
+def extract_key_concepts(relevant_sections, topic):
+    """Извлечение ключевых концепций из разделов"""
+    concepts = set()
+    
+    for section in relevant_sections[:2]:
+        content = section['content'].lower()
+        
+        # Ищем смысловые конструкции
+        sentences = re.split(r'[.!?]+', content)
+        for sentence in sentences:
+            sentence = sentence.strip()
+            if len(sentence) > 30 and topic.lower() in sentence:
+                # Извлекаем ключевые фразы
+                words = re.findall(r'\b[\w]{5,}\b', sentence)
+                if len(words) > 3:
+                    concept = ' '.join(words[:3])
+                    concepts.add(concept)
+    
+    return list(concepts)[:5]
+
+
+@timed('coverage')
+def check_textbook_coverage(topic, relevant_sections):
+    """Проверяет, достаточно ли информации в учебниках для темы"""
+    if not relevant_sections:
+        return False, "Нет информации в учебниках"
+    
+    # Анализируем содержание с безопасным доступом к полям
+    total_chars = 0
+    unique_sources = set()
+    
+    for section in relevant_sections:
+        # Безопасный доступ к полю content
+        content = section.get('content', '') if isinstance(section, dict) else ''
+        total_chars += len(content)
+        
+        # Безопасный доступ к полю guide_source
+        guide_source = section.get('guide_source', 'unknown') if isinstance(section, dict) else 'unknown'
+        unique_sources.add(guide_source)
+    
+    # Критерии достаточности информации
+    if total_chars < 200:
+        return False, f"Мало информации ({total_chars} символов)"
+    
+    if len(unique_sources) < 1:
+        return False, "Информация только из одного источника"
+    
+    # Проверяем глубину покрытия темы
+    topic_words = set(topic.lower().split())
+    coverage_score = 0
+    
+    for section in relevant_sections:
+        content = section.get('content', '') if isinstance(section, dict) else ''
+        content_lower = content.lower()
+        for word in topic_words:
+            if word in content_lower:
+                coverage_score += 1
+    
+    if coverage_score < len(topic_words):
+        return False, f"Неполное покрытие темы (score: {coverage_score})"
+    
+    return True, f"Достаточно информации ({total_chars} символов, {len(unique_sources)} источников)"
+
+
+@timed('retrieval')
+def get_relevant_sections(topic):
+    """Получение релевантных разделов из БД по теме - РАСШИРЕННАЯ ВЕРСИЯ"""
+    try:
+        sections = get_database().get_guide_sections(limit=200)  # Увеличиваем лимит
+        relevant = []
+        
+        topic_lower = topic.lower()
+        topic_words = [word for word in topic_lower.split() if len(word) > 2]
+        
+        logger.info(f"🔍 Расширенный поиск по теме '{topic}': проверяем {len(sections)} разделов")
+        
+        # Добавляем синонимы для популярных тем
+        topic_synonyms = get_topic_synonyms(topic)
+        all_search_terms = [topic_lower] + topic_synonyms
+        
+        for section in sections:
+            title = section['section_title'].lower()
+            content = section['section_content'].lower()
+            
+            score = 0
+            
+            # Поиск по всем терминам (основной теме и синонимам)
+            for search_term in all_search_terms:
+                # Повышаем вес заголовков
+                if search_term in title:
+                    score += 25
+                if search_term in content:
+                    score += 10
+                    
+            # Учитываем отдельные слова
+            for word in topic_words:
+                if word in title:
+                    score += 8
+                if word in content:
+                    score += 3
+            
+            # Снижаем порог релевантности еще больше
+            if score >= 1:
+                relevant.append({
+                    'title': section['section_title'],
+                    'content': section['section_content'],
+                    'score': score,
+                    'page': section['page_number']
+                })
+        
+        relevant.sort(key=lambda x: x['score'], reverse=True)
+        
+        logger.info(f"📚 По теме '{topic}' найдено разделов: {len(relevant)}")
+        for section in relevant[:5]:
+            logger.info(f"   - '{section['title']}' (score: {section['score']}, {len(section['content'])} chars)")
+        
+        return relevant[:5]  # Возвращаем топ-5 результатов
+        
+    except Exception as e:
+        logger.error(f"❌ Ошибка поиска разделов: {e}")
+        return []
+
+
+def canonical_topic(topic):
+    """Основная тема (ключ TOPIC_SYNONYMS), к которой относится запрос, или None"""
+    # ФИКС: Нормализуем тему
+    topic_lower = topic.lower().strip()
+
+    # Сначала проверяем точное соответствие
+    if topic_lower in TOPIC_SYNONYMS:
+        return topic_lower
+
+    # Затем проверяем частичные совпадения
+    for key, synonyms in TOPIC_SYNONYMS.items():
+        if topic_lower in synonyms:
+            return key
+
+    return None
+
+
+def get_topic_synonyms(topic):
+    """Получение синонимов и связанных терминов для 5 основных тем"""
+    key = canonical_topic(topic)
+    return TOPIC_SYNONYMS[key] if key else []
+
+
+def format_concrete_sections(relevant_sections):
+    """Форматирование КОНКРЕТНЫХ разделов с извлечением смысла"""
+    concrete_parts = []
+    
+    for i, section in enumerate(relevant_sections[:4], 1):
+        # Извлекаем конкретные предложения по теме
+        specific_content = extract_specific_content(section['content'])
+        if specific_content:
+            concrete_parts.append(f"--- РАЗДЕЛ {i}: {section['title']} ---\n{specific_content}")
+    
+    return "\n\n".join(concrete_parts) if concrete_parts else "В разделах есть общая информация по теме."
+
+
+def extract_specific_content(text):
+    """Извлечение конкретного содержательного контента"""
+    sentences = re.split(r'[.!?]+', text)
+    relevant_sentences = []
+    
+    for sentence in sentences:
+        sentence = sentence.strip()
+        # Отбираем только содержательные предложения
+        if (len(sentence) > 25 and 
+            not re.match(r'^[\\d\\s\\-\\.]+$', sentence) and
+            'оглавление' not in sentence.lower() and
+            'страница' not in sentence.lower()):
+            relevant_sentences.append(sentence)
+    
+    # Ограничиваем количество, но обеспечиваем качество
+    return '. '.join(relevant_sentences[:8]) + '.'
+
+
+def analyze_topic_specifics(topic, relevant_sections):
+    """Анализ специфики темы для лучшего контекста"""
+    all_content = " ".join([section['content'] for section in relevant_sections[:3]])
+    
+    # Анализируем, о чем конкретно говорится в контексте темы
+    analysis_parts = []
+    
+    # Ищем конкретные применения
+    usage_patterns = [
+        r'для чего (используется|применяется)[^.!?]*' + re.escape(topic),
+        r'как (работает|использовать)[^.!?]*' + re.escape(topic),
+        r'функции[^.!?]*' + re.escape(topic),
+        topic + r' (позволяет|нужен|помогает)[^.!?]*'
+    ]
+    
+    for pattern in usage_patterns:
+        matches = re.findall(pattern, all_content.lower())
+        if matches:
+            analysis_parts.append(f"Найдено применение: {matches[0][:100]}...")
+    
+    # Ищем конкретные инструкции
+    instruction_patterns = [
+        r'как (настроить|установить|подключить)[^.!?]*' + re.escape(topic),
+        r'правила?[^.!?]*' + re.escape(topic),
+        r'советы?[^.!?]*' + re.escape(topic)
+    ]
+    
+    for pattern in instruction_patterns:
+        if re.search(pattern, all_content.lower()):
+            analysis_parts.append("Есть конкретные инструкции по использованию")
+            break
+    
+    return "; ".join(analysis_parts) if analysis_parts else "Общая информация о теме"
+
+
+def extract_specific_facts(topic, relevant_sections):
+    """Извлечение конкретных фактов по теме"""
+    facts = []
+    
+    for section in relevant_sections[:2]:
+        content = section['content']
+        sentences = re.split(r'[.!?]+', content)
+        
+        for sentence in sentences:
+            sentence = sentence.strip()
+            if (len(sentence) > 30 and 
+                topic.lower() in sentence.lower() and
+                any(keyword in sentence.lower() for keyword in ['кнопка', 'меню', 'файл', 'папка', 'окно', 'экран'])):
+                facts.append(sentence)
+    
+    return facts[:3]  # Возвращаем не более 3 фактов
+
+
+def format_sections_for_deep_analysis(relevant_sections):
+    """Форматирование разделов для глубокого контекстного анализа"""
+    formatted = []
+    for i, section in enumerate(relevant_sections[:3], 1):
+        # Берем больше контекста для глубокого анализа
+        meaningful_content = extract_meaningful_content(section['content'])
+        formatted.append(f"РАЗДЕЛ {i}: {section['title']}\n{meaningful_content}")
+    
+    return "\n\n" + "="*50 + "\n\n".join(formatted) + "\n" + "="*50
+
+
+def extract_meaningful_content(text, max_length=800):
+    """Извлечение осмысленного контента с сохранением контекста"""
+    # Разбиваем на предложения
+    sentences = re.split(r'[.!?]+', text)
+    meaningful_sentences = []
+    
+    for sentence in sentences:
+        sentence = sentence.strip()
+        # Отбираем содержательные предложения (не слишком короткие и не технический мусор)
+        if (len(sentence) > 20 and 
+            not re.match(r'^[\d\s\-\.]+$', sentence) and
+            not any(word in sentence.lower() for word in ['оглавление', 'страница', 'глава'])):
+            meaningful_sentences.append(sentence)
+    
+    # Объединяем, ограничивая длину
+    result = '. '.join(meaningful_sentences[:15]) + '.'
+    if len(result) > max_length:
+        result = result[:max_length] + "..."
+    
+    return result
+
+
+def analyze_context_keywords(relevant_sections, topic):
+    """Анализ ключевых слов контекста"""
+    all_content = " ".join([section['content'] for section in relevant_sections[:2]])
+    content_lower = all_content.lower()
+    
+    # Ищем контекстные паттерны
+    patterns = {
+        'primary_context': find_primary_context(content_lower, topic),
+        'key_aspects': find_key_aspects(content_lower, topic),
+        'practical_benefit': find_practical_benefit(content_lower, topic)
+    }
+    
+    return patterns
+
+
+def find_primary_context(content, topic):
+    """Поиск основного контекста"""
+    context_indicators = [
+        r'для\s+\w+\s+нужно', r'используется\s+для', r'позволяет',
+        r'с\s+помощью', r'при\s+работе'
+    ]
+    
+    for indicator in context_indicators:
+        matches = re.findall(f"{indicator}[^.!?]*{topic}[^.!?]*[.!?]", content)
+        if matches:
+            # Берем первое совпадение и очищаем
+            match = matches[0]
+            return clean_context_phrase(match)
+    
+    return "работы с компьютером"
+
+
+def find_key_aspects(content, topic):
+    """Поиск ключевых аспектов"""
+    # Ищем перечисления и списки
+    list_indicators = [r'во-первых[^.!?]*', r'также[^.!?]*', r'кроме того[^.!?]*']
+    
+    aspects = []
+    for indicator in list_indicators:
+        pattern = f"{indicator}[^.!?]*{topic}[^.!?]*[.!?]"
+        matches = re.findall(pattern, content)
+        for match in matches:
+            aspect = clean_context_phrase(match)
+            if aspect and aspect not in aspects:
+                aspects.append(aspect)
+    
+    if aspects:
+        return ", ".join(aspects[:2])
+    
+    return "основным принципам и практическому применению"
+
+
+def find_practical_benefit(content, topic):
+    """Поиск практической пользы"""
+    benefit_indicators = [
+        r'помогает[^.!?]*', r'упрощает[^.!?]*', r'ускоряет[^.!?]*',
+        r'позволяет[^.!?]*', r'дает возможность[^.!?]*'
+    ]
+    
+    for indicator in benefit_indicators:
+        pattern = f"{indicator}[^.!?]*{topic}[^.!?]*[.!?]"
+        matches = re.findall(pattern, content)
+        if matches:
+            benefit = clean_context_phrase(matches[0])
+            return benefit.replace(topic, "этого")
+    
+    return "эффективно решать повседневные задачи"
@@ -0,0 +1,67 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Объединение одинаковых одновременных вычислений.
+
+    Первый запрос с ключом выполняет функцию, остальные с тем же ключом
+    ждут его и получают тот же результат (или то же исключение). После
+    завершения ключ освобождается: следующий запрос считает заново.
+    Работает в пределах процесса (воркера gunicorn).
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """Результат func() для key и признак, что он получен от чужого вызова"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                leader = True
+
+        if not leader:
+            logger.info(f"🤝 Присоединяемся к уже идущей генерации: {key}")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = func()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+            if flight.waiters:
+                logger.info(f"🤝 Результат генерации {key} разделен еще с {flight.waiters} запросами")
+
+        return flight.result, False
+
+    def in_flight(self) -> int:
+        """Число выполняющихся сейчас вычислений"""
+        with self._lock:
+            return len(self._flights)
+
+
+# Общий для процесса объединитель генераций теории и тестов
+generation_flights = SingleFlight()
@@ -1,5 +1,7 @@
 import logging
 from services.gigachat_service import GigaChatService
+from services.metrics import timed
+from services.rate_limiter import llm_priority
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +40,7 @@ class SpellChecker:
             "антивирус": "защита от вирусов"
         }
 
+    @timed('spell_check')
     def correct_spelling(self, topic):
         """Исправление опечаток в теме - ТОЛЬКО при наличии реальных ошибок"""
         # Сначала проверяем в нашем словаре
@@ -93,7 +96,8 @@ class SpellChecker:
 Если текст правильный, верни его БЕЗ ИЗМЕНЕНИЙ.
 """
 
-            response = self.gigachat.client.chat(prompt)
+            with llm_priority('spell_check'):
+                response = self.gigachat.chat(prompt, cache=True)
             corrected = response.choices[0].message.content.strip()
             
             # Убираем кавычки если нейросеть их добавила
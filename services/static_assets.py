@@ -0,0 +1,116 @@
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+
+try:
+    # Необязательная зависимость: без нее сжатие только gzip. Импорт один раз
+    # при загрузке модуля - неудачный import не кэшируется и на каждом ответе
+    # заново обходил бы sys.path
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Ответы меньше этого размера не сжимаются: выигрыш съедают заголовки сжатия
+MIN_COMPRESS_BYTES = 512
+
+# Ссылка с отпечатком содержимого неизменна: браузер кэширует ее на год
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Порядок предпочтения при согласовании Accept-Encoding
+ENCODINGS = ('br', 'gzip')
+
+
+def available_encodings() -> tuple:
+    """Поддерживаемые сервером сжатия в порядке предпочтения"""
+    return ENCODINGS if brotli is not None else ('gzip',)
+
+
+def compress(body: bytes, encoding: str, fast: bool = False) -> bytes:
+    """Сжатие тела в encoding; fast - уровень для ответов, сжимаемых на каждый запрос"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=5 if fast else 11)
+    # mtime=0 - одинаковое содержимое дает побайтно одинаковый gzip
+    return gzip.compress(body, compresslevel=6 if fast else 9, mtime=0)
+
+
+def compress_variants(body: bytes) -> dict:
+    """Сжатые варианты тела: {'br': ..., 'gzip': ...}; br - при установленном brotli.
+
+    Варианты, которые не меньше исходного тела, не возвращаются.
+    """
+    if len(body) < MIN_COMPRESS_BYTES:
+        return {}
+
+    variants = {encoding: compress(body, encoding) for encoding in available_encodings()}
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(body)}
+
+
+def choose_encoding(accept_encodings, encodings):
+    """Лучшее сжатие из encodings (варианты или их названия), которое принимает
+    клиент (werkzeug Accept), или None"""
+    for encoding in ENCODINGS:
+        if encoding in encodings and accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def content_digest(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:16]
+
+
+class StaticAssets:
+    """Статические файлы интерфейса, подготовленные при запуске.
+
+    Для каждого файла из static/ считается отпечаток содержимого (он входит
+    в ссылку /assets/<отпечаток>/<файл>, поэтому ссылку можно кэшировать
+    навсегда) и заранее готовятся сжатые gzip/brotli варианты: запрос
+    отдает готовые байты без чтения диска и сжатия.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self._assets = {}
+        self.load()
+
+    def load(self):
+        """Чтение и сжатие всех файлов папки (повторный вызов - после их изменения)"""
+        assets = {}
+        raw_bytes = 0
+        compressed_bytes = 0
+
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, self.folder).replace(os.sep, '/')
+                with open(path, 'rb') as file:
+                    body = file.read()
+
+                variants = compress_variants(body)
+                assets[filename] = {
+                    'body': body,
+                    'fingerprint': content_digest(body)[:12],
+                    'mimetype': mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                    'variants': variants
+                }
+                raw_bytes += len(body)
+                compressed_bytes += min([len(body)] + [len(data) for data in variants.values()])
+
+        self._assets = assets
+        logger.info(f"📦 Статика подготовлена: {len(assets)} файлов, {raw_bytes // 1024} КБ -> "
+                    f"{compressed_bytes // 1024} КБ в сжатом виде"
+                    f"{'' if brotli is not None else ' (brotli не установлен, только gzip)'}")
+
+    def get(self, filename: str):
+        """Подготовленный файл или None"""
+        return self._assets.get(filename)
+
+    def url(self, filename: str):
+        """Ссылка с отпечатком или None, если файла нет среди подготовленных"""
+        asset = self._assets.get(filename)
+        if asset is None:
+            return None
+        return f"/assets/{asset['fingerprint']}/{filename}"
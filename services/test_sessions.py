@@ -0,0 +1,184 @@
+import json
+import time
+import uuid
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class TestSessionStore:
+    """Серверное хранилище выданных тестов.
+
+    Тесты держатся в памяти (LRU) и сохраняются в таблицу user_sessions:
+    создание записывается сразу, чтобы тест был виден другим воркерам,
+    а прогресс (ответы, оценка) пишется отложенно фоновым потоком.
+    """
+
+    def __init__(self, db, max_items: int = 1000, flush_interval: float = 2.0):
+        self.db = db
+        self.max_items = max_items
+        self.flush_interval = flush_interval
+        self._items = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._writer = None
+        self._tables_ready = False
+
+    def create(self, test_data: dict, test_id: str = None) -> str:
+        """Сохранение нового теста, возвращает его идентификатор"""
+        self._ensure_tables()
+        test_id = test_id or uuid.uuid4().hex
+
+        session = {
+            'test_data': test_data,
+            'current_step': 0,
+            'score': 0,
+            'completed': False
+        }
+        self.db.save_user_session(
+            test_id,
+            len(test_data.get('questions', [])),
+            json.dumps(test_data, ensure_ascii=False)
+        )
+        self._remember(test_id, session)
+
+        logger.info(f"💾 Тест сохранен в сессии {test_id}: {len(test_data.get('questions', []))} вопросов")
+        return test_id
+
+    def save_quiz(self, quiz: dict) -> str:
+        """Сохранение одиночного вопроса под его стабильным id (см. quiz_id):
+        проверка ответа получает от браузера только id и номер варианта.
+
+        Вопрос общий для всех учеников, поэтому записывается один раз: уже
+        сохраненный (в памяти или в user_sessions) не перезаписывается.
+        """
+        if self.get(quiz['id']) is not None:
+            return quiz['id']
+        return self.create({'kind': 'quiz', 'questions': [quiz]}, test_id=quiz['id'])
+
+    def get_test(self, test_id: str):
+        """Сессия выданного теста или None; одиночные вопросы (save_quiz) тестом
+        не считаются - их прогресс был бы общим для всех учеников"""
+        session = self.get(test_id)
+        if session is None or session['test_data'].get('kind') == 'quiz':
+            return None
+        return session
+
+    def get_quiz(self, quiz_id: str):
+        """Сохраненный одиночный вопрос или None"""
+        session = self.get(quiz_id)
+        if session is None or session['test_data'].get('kind') != 'quiz':
+            return None
+        return session['test_data']['questions'][0]
+
+    def get(self, test_id: str):
+        """Получение сессии теста из памяти или из БД"""
+        with self._lock:
+            session = self._items.get(test_id)
+            if session is not None:
+                self._items.move_to_end(test_id)
+                return session
+
+        self._ensure_tables()
+        row = self.db.get_user_session(test_id)
+        if row is None or not row['training_data_json']:
+            return None
+
+        session = {
+            'test_data': json.loads(row['training_data_json']),
+            'current_step': row['current_step'],
+            'score': row['score'],
+            'completed': bool(row['completed'])
+        }
+        self._remember(test_id, session)
+        return session
+
+    def record_result(self, test_id: str, answered_count: int, score: int) -> bool:
+        """Фиксация результата проверки (запись в БД - отложенная).
+
+        Засчитывается только первая проверка теста: для уже проверенного
+        возвращается False и ничего не записывается.
+        """
+        with self._lock:
+            session = self._items.get(test_id)
+            if (session is not None and session['completed']) or test_id in self._pending:
+                return False
+            if session is not None:
+                session['current_step'] = answered_count
+                session['score'] = score
+                session['completed'] = True
+            self._pending[test_id] = (answered_count, score, True, test_id)
+
+        self._start_writer()
+        self._wakeup.set()
+        return True
+
+    def flush(self):
+        """Запись накопленных изменений прогресса в user_sessions"""
+        with self._lock:
+            updates = list(self._pending.values())
+            self._pending.clear()
+
+        if not updates:
+            return
+
+        try:
+            self.db.update_user_sessions(updates)
+        except Exception as e:
+            logger.error(f"❌ Ошибка записи прогресса сессий: {e}")
+            with self._lock:
+                for update in updates:
+                    self._pending.setdefault(update[3], update)
+
+    def _remember(self, test_id, session):
+        with self._lock:
+            self._items[test_id] = session
+            self._items.move_to_end(test_id)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def _ensure_tables(self):
+        if not self._tables_ready:
+            self.db.ensure_tables()
+            self._tables_ready = True
+
+    def _start_writer(self):
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is not None:
+                return
+            self._writer = threading.Thread(target=self._writer_loop, name='session-writer', daemon=True)
+            self._writer.start()
+        atexit.register(self.flush)
+
+    def _writer_loop(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            # Небольшая пауза собирает несколько проверок в одну транзакцию
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+def public_test_data(test_data: dict) -> dict:
+    """Копия теста для браузера - без правильных ответов и объяснений"""
+    public = {key: value for key, value in test_data.items() if key != 'questions'}
+    public['questions'] = [
+        {
+            'id': question.get('id', index),
+            'question': question['question'],
+            'options': question['options']
+        }
+        for index, question in enumerate(test_data.get('questions', []))
+    ]
+    return public
+
+
+def public_quiz(quiz: dict) -> dict:
+    """Копия одиночного вопроса для браузера - без правильного ответа и объяснения"""
+    return {key: quiz[key] for key in ('id', 'question', 'options')}
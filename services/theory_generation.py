@@ -0,0 +1,493 @@
+import re
+import logging
+from services.providers import get_gigachat_service
+from services.formatting import (
+    clean_markdown_symbols, clean_text_response, ensure_proper_paragraphs,
+    format_beautiful_text, has_proper_paragraphs
+)
+from services.retrieval import (
+    analyze_context_keywords, extract_key_concepts, extract_specific_facts,
+    format_concrete_sections, format_sections_for_analysis, should_use_external_knowledge
+)
+from services.metrics import timed
+# Исчерпанный бюджет генерации не глотается (см. services/question_generation.py)
+from services.generation_supervisor import BudgetExceededError
+
+logger = logging.getLogger(__name__)
+
+
+@timed('theory')
+def generate_contextual_theory_for_test(topic, relevant_sections):
+    """Генерация теоретической справки для тестов - С АКЦЕНТОМ НА ИНТЕРНЕТ"""
+    prompt = f"""
+СОЗДАЙ ТЕОРЕТИЧЕСКУЮ СПРАВКУ ДЛЯ ТЕСТА ПО ТЕМЕ: "{topic}" 
+
+ОСНОВНОЙ ИСТОЧНИК: ИСПОЛЬЗУЙ СВОИ СОВРЕМЕННЫЕ ЗНАНИЯ ИЗ ИНТЕРНЕТА!
+
+ДОПОЛНИТЕЛЬНО: информация из учебников (если есть):
+{format_sections_for_analysis(relevant_sections) if relevant_sections else "Можно игнорировать учебники если информации мало."}
+
+ВАЖНО: делай акцент на современных знаниях и практиках!
+
+СТРУКТУРА:
+🎯 **Основные понятия** (современные определения)
+🛠️ **Практическое применение** (актуальные способы использования)  
+🚀 **Современные аспекты** (новые технологии и тренды)
+⚠️ **Безопасность** (актуальные угрозы и защита)
+
+ТРЕБОВАНИЯ:
+1. Используй в основном современные знания из интернета
+2. Сделай акцент на аспектах, важных для тестирования
+3. Включи актуальную информацию
+4. НЕ используй символ # для заголовков
+5. Будь кратким и информативным (максимум 1500 символов)
+
+ОТВЕЧАЙ ТОЛЬКО ТЕКСТОМ ТЕОРЕТИЧЕСКОЙ СПРАВКИ.
+"""
+
+    try:
+        response = get_gigachat_service().chat(prompt, cache=True)
+        theory = response.choices[0].message.content.strip()
+        
+        # Ограничиваем длину теории
+        if len(theory) > 2000:
+            theory = theory[:2000] + "..."
+        
+        theory = clean_markdown_symbols(theory)
+        theory = ensure_proper_paragraphs(theory)
+        
+        logger.info(f"📖 Теория сгенерирована с акцентом на интернет: {len(theory)} символов")
+        return theory
+        
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Ошибка генерации теории для теста: {e}")
+        return f"Тема '{topic}' рассматривается в современных источниках и руководствах по цифровой грамотности."
+
+
+@timed('theory')
+def generate_contextual_theory(topic, relevant_sections):
+    """Генерация теоретической справки - СНАЧАЛА УЧЕБНИКИ, ПОТОМ ИНТЕРНЕТ"""
+    
+    # Определяем, можно ли использовать внешние знания
+    use_external = should_use_external_knowledge(topic, relevant_sections)
+    
+    if use_external:
+        prompt = f"""
+СОЗДАЙ КРАСИВОЕ, СТРУКТУРИРОВАННОЕ ОБЪЯСНЕНИЕ ПО ТЕМЕ: "{topic}" С ЧЕТКИМИ АБЗАЦАМИ
+
+ВАЖНО: НЕ используй символ # для заголовков. Используй эмодзи и жирный текст для структуры.
+
+ИНФОРМАЦИЯ ИЗ УЧЕБНИКОВ ПО ЦИФРОВОЙ ГРАМОТНОСТИ:
+{format_sections_for_analysis(relevant_sections) if relevant_sections else "В учебниках нет информации по этой теме."}
+
+ВАЖНО: В учебниках недостаточно информации по этой теме, поэтому МОЖНО использовать свои современные знания.
+
+ОЧЕНЬ ВАЖНЫЕ ТРЕБОВАНИЯ:
+1. ✅ СНАЧАЛА проверь информацию в учебниках выше
+2. ✅ ЕСЛИ в учебниках есть информация - используй её как основу
+3. ✅ ЕСЛИ информации недостаточно - дополни своими знаниями
+4. ✅ ЕСЛИ информации нет - полностью полагайся на свои знания
+5. ✅ ОБЯЗАТЕЛЬНО разбивай текст на АБЗАЦЫ
+6. ❌ НЕ используй символ # для заголовков
+
+СТРУКТУРА ОБЪЯСНЕНИЯ:
+🌟 **Основная концепция** (1-2 абзаца)
+
+🎯 **Как это работает** (2-3 абзаца с подпунктами)
+
+🛠️ **Практическое применение** (2-3 абзаца с примерами)
+
+💡 **Полезные советы** (1-2 абзаца с рекомендациями)
+
+⚠️ **Важные моменты** (1-2 абзаца с предупреждениями)
+
+ОТВЕЧАЙ ТОЛЬКО ОТФОРМАТИРОВАННЫМ ТЕКСТОМ, без дополнительных комментариев.
+"""
+    else:
+        prompt = f"""
+СОЗДАЙ КРАСИВОЕ, СТРУКТУРИРОВАННОЕ ОБЪЯСНЕНИЕ ПО ТЕМЕ: "{topic}" С ЧЕТКИМИ АБЗАЦАМИ
+
+ИСПОЛЬЗУЙ ТОЛЬКО ИНФОРМАЦИЮ ИЗ УЧЕБНИКОВ:
+
+ИНФОРМАЦИЯ ИЗ УЧЕБНИКОВ ПО ЦИФРОВОЙ ГРАМОТНОСТИ:
+{format_sections_for_analysis(relevant_sections)}
+
+КРИТИЧЕСКИ ВАЖНЫЕ ПРАВИЛА:
+1. ❗ ИСПОЛЬЗУЙ ТОЛЬКО информацию из предоставленных учебников
+2. ❗ НЕ используй свои знания или информацию из интернета
+3. ❗ НЕ придумывай информацию
+4. ❗ Если в учебниках нет полной информации - объясни только то, что есть
+5. ✅ ОБЯЗАТЕЛЬНО разбивай текст на АБЗАЦЫ
+6. ❌ НЕ используй символ # для заголовков
+
+СТРУКТУРА ОБЪЯСНЕНИЯ:
+🌟 **Основная концепция** (1-2 абзаца)
+
+🎯 **Как это работает** (2-3 абзаца с подпунктами)
+
+🛠️ **Практическое применение** (2-3 абзаца с примерами)
+
+💡 **Полезные советы** (1-2 абзаца с рекомендациями)
+
+⚠️ **Важные моменты** (1-2 абзаца с предупреждениями)
+
+ОТВЕЧАЙ ТОЛЬКО ОТФОРМАТИРОВАННЫМ ТЕКСТОМ, без дополнительных комментариев.
+"""
+
+    try:
+        response = get_gigachat_service().chat(prompt, cache=True)
+        theory = response.choices[0].message.content.strip()
+        
+        # УДАЛЯЕМ ТОЛЬКО СИМВОЛЫ #, сохраняя ВСЕ остальное форматирование
+        theory = clean_markdown_symbols(theory)
+        
+        # Дополнительное форматирование для гарантии правильных абзацев
+        theory = ensure_proper_paragraphs(theory)
+        
+        # Проверяем качество и при необходимости дополнительно форматируем
+        if not has_proper_paragraphs(theory) or '#' in theory:
+            logger.warning("⚠️ Теория содержит # или плохо отформатирована, применяем дополнительное форматирование")
+            theory = format_beautiful_text(theory, topic)
+            
+        return theory
+        
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Ошибка генерации теории: {e}")
+        theory = create_meaningful_theory(topic, relevant_sections)
+        return format_beautiful_text(theory, topic)
+
+
+def generate_fallback_explanation(topic):
+    """Создание объяснения при невозможности получить ответ от нейросети"""
+    fallback_explanations = {
+        "кибербезопасность": """
+🌟 **Основная концепция**
+
+Кибербезопасность - это защита компьютерных систем, сетей и данных от цифровых атак. Она включает методы предотвращения несанкционированного доступа, использования, раскрытия и уничтожения информации.
+
+🎯 **Как это работает**
+
+Современная кибербезопасность использует многоуровневый подход:
+
+- **Защита периметра** - брандмауэры и системы обнаружения вторжений
+- **Защита конечных точек** - антивирусы на устройствах пользователей  
+- **Шифрование данных** - преобразование информации в нечитаемый формат
+- **Аутентификация** - проверка подлинности пользователей
+
+🛠️ **Практическое применение**
+
+Для обычного пользователя важно:
+- Устанавливать обновления безопасности
+- Использовать надежные пароли
+- Остерегаться фишинговых писем
+- Регулярно делать резервные копии данных
+
+💡 **Полезные советы**
+
+Всегда обновляйте программное обеспечение до последней версии. Используйте двухфакторную аутентификацию везде, где это возможно.
+
+⚠️ **Важные моменты**
+
+Никогда не переходите по подозрительным ссылкам в письмах и не скачивайте вложения от неизвестных отправителей.
+""",
+        "цифровая грамотность": """
+🌟 **Основная концепция**
+
+Цифровая грамотность - это совокупность знаний и навыков, необходимых для безопасного и эффективного использования цифровых технологий в повседневной жизни.
+
+🎯 **Как это работает**
+
+Цифровая грамотность включает несколько ключевых областей:
+
+- **Технические навыки** - работа с устройствами и программами
+- **Информационная грамотность** - поиск и оценка информации
+- **Коммуникационные навыки** - общение в цифровой среде
+- **Безопасность** - защита личных данных
+
+🛠️ **Практическое применение**
+
+Освоение цифровой грамотности позволяет:
+- Эффективно работать с компьютером и смартфоном
+- Находить нужную информацию в интернете
+- Использовать онлайн-сервисы и госуслуги
+- Общаться через мессенджеры и социальные сети
+
+💡 **Полезные советы**
+
+Начинайте с основ: научитесь уверенно работать с файлами, папками и основными программами. Постепенно осваивайте более сложные навыки.
+
+⚠️ **Важные моменты**
+
+Не бойтесь экспериментировать, но всегда сохраняйте важные данные. Современные технологии созданы для людей, и каждый может научиться их использовать.
+"""
+    }
+    
+    # Ищем подходящее объяснение по ключевым словам
+    topic_lower = topic.lower()
+    for key, explanation in fallback_explanations.items():
+        if key in topic_lower:
+            return explanation
+    
+    # Общее объяснение, если тема не распознана
+    return f"""
+🌟 **Изучение темы: {topic}**
+
+Эта тема связана с цифровой грамотностью и современными технологиями. Для подробного изучения рекомендую обратиться к актуальным источникам информации и практиковаться в использовании соответствующих инструментов.
+
+💡 **Совет по изучению**
+
+Начните с практического применения - попробуйте использовать изучаемую технологию в реальных ситуациях. Это поможет лучше понять принципы работы и закрепить знания.
+"""
+
+
+def enhance_with_external_knowledge(base_explanation, topic):
+    """Дополняет объяснение внешними знаниями при необходимости"""
+    enhancement_prompt = f"""
+ДОПОЛНИ СЛЕДУЮЩЕЕ ОБЪЯСНЕНИЕ АКТУАЛЬНОЙ ИНФОРМАЦИЕЙ ИЗ СОВРЕМЕННЫХ ИСТОЧНИКОВ:
+
+ТЕМА: {topic}
+
+БАЗОВОЕ ОБЪЯСНЕНИЕ:
+{base_explanation}
+
+ЗАДАЧА:
+- Добавь современные примеры и практические советы
+- Укажи актуальные сервисы и инструменты (если применимо)
+- Включи информацию о последних тенденциях
+- Сохрани структуру и форматирование
+
+ВЕРНИ ТОЛЬКО ДОПОЛНЕННЫЙ ТЕКСТ БЕЗ КОММЕНТАРИЕВ.
+"""
+    
+    try:
+        response = get_gigachat_service().chat(enhancement_prompt, cache=True)
+        enhanced = response.choices[0].message.content.strip()
+        return enhanced
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Ошибка дополнения внешними знаниями: {e}")
+        return base_explanation
+
+
+def is_low_quality_theory(theory):
+    """Проверка качества теоретической справки"""
+    # Проверяем длину
+    if len(theory) < 150:
+        return True
+    
+    # Проверяем наличие списков и перечислений (признак низкого качества)
+    if theory.count('-') > 3 or theory.count('•') > 3:
+        return True
+    
+    # Проверяем, что это не просто набор фактов
+    sentences = re.split(r'[.!?]+', theory)
+    if len(sentences) < 4:
+        return True
+    
+    return False
+
+
+def create_meaningful_theory(topic, relevant_sections):
+    """Создание осмысленной теоретической справки вручную"""
+    if not relevant_sections:
+        return f"Тема '{topic}' рассматривается в руководстве по цифровой грамотности. Рекомендуется изучить соответствующие разделы для получения практических навыков."
+    
+    # Анализируем содержание разделов для создания осмысленного объяснения
+    key_concepts = extract_key_concepts(relevant_sections, topic)
+    
+    if key_concepts:
+        theory = f"В руководстве рассматривается тема '{topic}' в контексте {key_concepts[0]}. "
+        if len(key_concepts) > 1:
+            theory += f"Основное внимание уделяется {', '.join(key_concepts[1:3])}. "
+        theory += "Эти знания помогут вам уверенно использовать компьютер в повседневных задачах."
+    else:
+        theory = f"Тема '{topic}' важна для освоения цифровой грамотности. В руководстве представлены практические рекомендации по использованию соответствующих технологий в бытовых ситуациях."
+    
+    return theory
+
+
+def create_detailed_explanation(topic, section, correct_idx):
+    """Создание детального пояснения для ответа"""
+    section_preview = section['content'][:150] + "..." if len(section['content']) > 150 else section['content']
+    
+    explanations = [
+        f"✅ Этот ответ правильный, потому что он соответствует информации из раздела '{section['title']}' (страница {section['page']}). В руководстве указано: '{section_preview}'",
+        
+        f"📚 Правильный ответ основан на материалах руководства. В разделе '{section['title']}' на странице {section['page']} объясняется: '{section_preview}'",
+        
+        f"🎯 Этот вариант верный, так как он точно отражает содержание руководства. Согласно разделу '{section['title']}': '{section_preview}'",
+        
+        f"💡 Да, это правильный ответ! В руководстве по цифровой грамотности в разделе '{section['title']}' (стр. {section['page']}) говорится: '{section_preview}'",
+        
+        f"🌟 Верно! Этот ответ соответствует информации из руководства. В разделе '{section['title']}' на странице {section['page']} указано: '{section_preview}'"
+    ]
+    
+    import random
+    return random.choice(explanations)
+
+
+def generate_deep_context_explanation(topic, relevant_sections):
+    """Генерация глубокого контекстного объяснения - С ФОРМАТИРОВАНИЕМ"""
+    
+    prompt = f"""
+ТЫ - ЭКСПЕРТ-ПРЕПОДАВАТЕЛЬ ПО ЦИФРОВОЙ ГРАМОТНОСТИ. ДАЙ КАЧЕСТВЕННОЕ ОБЪЯСНЕНИЕ ПО ТЕМЕ: "{topic.upper()}"
+
+КОНКРЕТНЫЙ МАТЕРИАЛ ИЗ РУКОВОДСТВА:
+{format_concrete_sections(relevant_sections)}
+ТВОЯ ЗАДАЧА:
+СОСТАВЬ СТРУКТУРИРОВАННОЕ ОБЪЯСНЕНИЕ С ЧЕТКОЙ СТРУКТУРОЙ:
+
+Основная концепция:
+- Кратко объясни суть темы
+
+Как это работает:
+- Опиши механизм работы
+- Используй конкретные примеры из руководства
+
+Практическое применение:
+- Как именно использовать на практике
+- Пошаговые рекомендации
+
+Важные моменты:
+- Ключевые аспекты для запоминания
+- Частые ошибки и как их избежать
+
+ТРЕБОВАНИЯ К ФОРМАТУ:
+- Используй заголовки с двоеточием в конце
+- Используй маркированные списки через дефис
+- Выделяй **важные термины** двойными звездочками
+- Разделяй блоки пустыми строками
+- Давай конкретные примеры из руководства
+
+ОТВЕЧАЙ ТОЛЬКО ТЕКСТОМ ОБЪЯСНЕНИЯ, без вступлений и заключений.
+"""
+    
+    try:
+        # УБЕРИТЕ max_tokens - этот параметр не поддерживается
+        response = get_gigachat_service().chat(prompt)
+        explanation = response.choices[0].message.content.strip()
+        
+        # Проверяем и улучшаем качество
+        explanation = enhance_explanation_quality(explanation, topic, relevant_sections)
+        
+        return explanation
+        
+    except BudgetExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Ошибка генерации объяснения: {e}")
+        return create_specific_explanation(topic, relevant_sections)
+
+
+def enhance_explanation_quality(explanation, topic, relevant_sections):
+    """Улучшение качества объяснения"""
+    # Проверяем длину
+    if len(explanation) < 150:
+        logger.warning("⚠️ Объяснение слишком короткое, добавляем детали")
+        explanation = add_specific_details(explanation, topic, relevant_sections)
+    
+    # Проверяем конкретику
+    if not has_specific_details(explanation):
+        logger.warning("⚠️ Объяснение слишком общее, добавляем конкретику")
+        explanation = create_specific_explanation(topic, relevant_sections)
+    
+    # Очищаем текст
+    explanation = clean_text_response(explanation)
+    
+    return explanation
+
+
+def has_specific_details(text):
+    """Проверка наличия конкретных деталей"""
+    # Ищем конкретные глаголы и инструкции
+    specific_indicators = [
+        'нажать', 'выбрать', 'перетащить', 'щелкнуть', 'открыть',
+        'закрыть', 'настроить', 'использовать', 'подключить',
+        'левая кнопка', 'правая кнопка', 'колесико', 'курсор'
+    ]
+    
+    text_lower = text.lower()
+    return any(indicator in text_lower for indicator in specific_indicators)
+
+
+def add_specific_details(explanation, topic, relevant_sections):
+    """Добавление конкретных деталей к объяснению"""
+    # Извлекаем конкретные факты из разделов
+    specific_facts = extract_specific_facts(topic, relevant_sections)
+    
+    if specific_facts:
+        return explanation + " " + " ".join(specific_facts[:2])
+    else:
+        return create_specific_explanation(topic, relevant_sections)
+
+
+def create_specific_explanation(topic, relevant_sections):
+    """Создание конкретного объяснения на основе данных"""
+    if not relevant_sections:
+        return f"В руководстве рассматривается тема '{topic}'. Рекомендуется изучить соответствующие разделы для получения подробной информации."
+    
+    # Собираем конкретные детали из разделов
+    specific_details = []
+    
+    for section in relevant_sections[:2]:
+        # Ищем предложения с конкретными действиями
+        sentences = re.split(r'[.!?]+', section['content'])
+        for sentence in sentences:
+            if (topic.lower() in sentence.lower() and 
+                len(sentence) > 40 and
+                any(verb in sentence.lower() for verb in ['нажать', 'выбрать', 'открыть', 'закрыть', 'перейти'])):
+                specific_details.append(sentence.strip())
+    
+    if specific_details:
+        base = f"Согласно руководству, {topic} используется следующим образом: "
+        return base + " ".join(specific_details[:2])
+    else:
+        # Используем заголовки разделов для контекста
+        sections_context = ", ".join([section['title'] for section in relevant_sections[:2]])
+        return f"Тема '{topic}' рассматривается в разделах {sections_context}. В руководстве представлены практические рекомендации по работе с этим инструментом."
+
+
+def is_low_quality_explanation(explanation):
+    """Проверка качества объяснения"""
+    if len(explanation) < 200:
+        return True
+    
+    # Проверяем на перечисление фактов без объяснения
+    sentences = re.split(r'[.!?]+', explanation)
+    if len(sentences) < 5:
+        return True
+    
+    # Проверяем на наличие глубоких объяснительных конструкций
+    deep_patterns = [
+        r'помогает', r'позволяет', r'нужно чтобы', r'важно потому что',
+        r'как если бы', r'представьте что', r'это похоже на'
+    ]
+    
+    explanation_lower = explanation.lower()
+    deep_matches = sum(1 for pattern in deep_patterns if re.search(pattern, explanation_lower))
+    
+    return deep_matches < 2
+
+
+def create_quality_context_explanation(topic, relevant_sections):
+    """Создание качественного контекстного объяснения на основе данных"""
+    if not relevant_sections:
+        return f"Тема '{topic}' рассматривается в руководстве по цифровой грамотности. Это важный аспект, который поможет вам лучше понимать работу с компьютерными технологиями."
+    
+    # Анализируем содержание для создания осмысленного объяснения
+    context_keywords = analyze_context_keywords(relevant_sections, topic)
+    
+    if context_keywords:
+        explanation = f"В руководстве тема '{topic}' рассматривается в контексте {context_keywords['primary_context']}. "
+        explanation += f"Основное внимание уделяется {context_keywords['key_aspects']}. "
+        explanation += f"Это помогает пользователям {context_keywords['practical_benefit']}. "
+        explanation += "Понимание этой темы сделает работу с компьютером более комфортной и эффективной."
+    else:
+        explanation = f"Тема '{topic}' - важный элемент цифровой грамотности. В руководстве представлены практические рекомендации по использованию этого инструмента в повседневных задачах, что поможет вам стать более уверенным пользователем."
+    
+    return explanation
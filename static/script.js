@@ -2,8 +2,149 @@
 let isProcessing = false;
 let currentQuiz = null;
 let currentFullTest = null;
+let currentTestId = null;
 let currentQuestionIndex = 0;
 let userTestAnswers = [];
+// Постепенная выдача теста: вопросы приходят по мере генерации
+const FULL_TEST_QUESTION_COUNT = 5;
+let fullTestComplete = true;
+let waitingForQuestion = false;
+let fullTestRequest = 0;
+
+// ===== Запросы к API =====
+// Все запросы идут через apiRequest: одинаковый запрос, который уже
+// выполняется, не отправляется повторно, а запросы экрана отменяются при
+// уходе с него (abortRequests). Объяснения тем кэшируются в sessionStorage
+// по основной теме и версии контента сервера.
+
+const CACHE_VERSION = document.body.dataset.cacheVersion || '0';
+const inflightRequests = new Map();
+const requestControllers = { chat: new Set(), test: new Set() };
+
+// JSON-запрос: { httpStatus, data }. scope - экран, с которым связан запрос,
+// dedupKey - признак одинаковых запросов (по умолчанию метод, адрес и тело)
+function apiRequest(url, { method = 'GET', body = null, scope = 'chat', dedupKey = null } = {}) {
+    const key = dedupKey || `${method} ${url} ${body ? JSON.stringify(body) : ''}`;
+    if (inflightRequests.has(key)) {
+        return inflightRequests.get(key);
+    }
+
+    const controller = new AbortController();
+    requestControllers[scope].add(controller);
+
+    const request = fetch(url, {
+        method: method,
+        headers: body ? { 'Content-Type': 'application/json' } : {},
+        body: body ? JSON.stringify(body) : undefined,
+        signal: controller.signal
+    })
+        .then(async response => ({ httpStatus: response.status, data: await response.json() }))
+        .finally(() => {
+            inflightRequests.delete(key);
+            requestControllers[scope].delete(controller);
+        });
+
+    inflightRequests.set(key, request);
+    return request;
+}
+
+// Отмена запросов экрана (или всех), например при уходе с экрана теста
+function abortRequests(scope = null) {
+    const scopes = scope ? [scope] : Object.keys(requestControllers);
+    scopes.forEach(name => {
+        requestControllers[name].forEach(controller => controller.abort());
+        requestControllers[name].clear();
+    });
+}
+
+function isAbortError(error) {
+    return error && error.name === 'AbortError';
+}
+
+function normalizeTopicText(topic) {
+    return topic.trim().toLowerCase().replace(/\s+/g, ' ');
+}
+
+function readCache(key) {
+    try {
+        const value = sessionStorage.getItem(key);
+        return value ? JSON.parse(value) : null;
+    } catch (e) {
+        return null;
+    }
+}
+
+function writeCache(key, value) {
+    try {
+        sessionStorage.setItem(key, JSON.stringify(value));
+    } catch (e) {
+        // Хранилище переполнено или недоступно - работаем без кэша
+        console.warn('⚠️ Кэш объяснений недоступен:', e);
+    }
+}
+
+// Удаление объяснений прошлых версий контента
+function pruneLessonCache() {
+    try {
+        Object.keys(sessionStorage)
+            .filter(key => key.startsWith('lesson') && !key.includes(`:${CACHE_VERSION}:`))
+            .forEach(key => sessionStorage.removeItem(key));
+    } catch (e) {
+        // sessionStorage недоступен (приватный режим) - кэша нет
+    }
+}
+
+// Объяснение темы: из кэша браузера или с сервера.
+// Введенный текст запоминается как синоним основной темы из ответа сервера,
+// само объяснение хранится по основной теме (без сообщения об исправлении)
+async function fetchLesson(topic) {
+    const typed = normalizeTopicText(topic);
+    const aliasKey = `lesson-alias:${CACHE_VERSION}:${typed}`;
+    const alias = readCache(aliasKey);
+    if (alias) {
+        const lesson = readCache(`lesson:${CACHE_VERSION}:${alias.topic}`);
+        if (lesson) {
+            return { status: 'success', from_cache: true, correction_info: alias.correction_info, ...lesson };
+        }
+    }
+
+    const { data } = await apiRequest('/api/learn-topic', {
+        method: 'POST',
+        body: { topic: topic },
+        dedupKey: `learn-topic ${typed}`
+    });
+
+    if (data.status === 'success' && data.cache && data.cache.version === CACHE_VERSION) {
+        writeCache(aliasKey, { topic: data.cache.topic, correction_info: data.correction_info });
+        if (!(data.correction_info && data.correction_info.was_corrected)) {
+            writeCache(`lesson:${CACHE_VERSION}:${data.cache.topic}`, {
+                explanation: data.explanation,
+                sources_used: data.sources_used
+            });
+        }
+    }
+    return data;
+}
+
+// Уход со страницы - незавершенные запросы больше не нужны
+window.addEventListener('pagehide', () => abortRequests());
+pruneLessonCache();
+
+// Постоянный идентификатор ученика: по нему сервер не повторяет уже виденные вопросы
+function getLearnerId() {
+    try {
+        let learnerId = localStorage.getItem('learnerId');
+        if (!learnerId) {
+            learnerId = (window.crypto && crypto.randomUUID)
+                ? crypto.randomUUID()
+                : Date.now().toString(36) + Math.random().toString(36).slice(2);
+            localStorage.setItem('learnerId', learnerId);
+        }
+        return learnerId;
+    } catch (e) {
+        return null;
+    }
+}
 
 // Инициализация
 document.addEventListener('DOMContentLoaded', function() {
@@ -20,7 +161,7 @@ function focusInput() {
 }
 
 // Отправка сообщения (один урок)
-async function sendMessage() {
+function sendMessage() {
     if (isProcessing) return;
     
     const input = document.getElementById('messageInput');
@@ -31,29 +172,32 @@ async function sendMessage() {
         return;
     }
 
+    requestLesson(message);
+}
+
+// Выбор темы из быстрого доступа
+function selectTopic(topic) {
+    if (isProcessing) return;
+
+    requestLesson(topic, `🔍 Ищу информацию по теме "${topic}"...`);
+}
+
+// Запрос объяснения темы и вывод его в чат
+async function requestLesson(topic, statusMessage = '') {
     isProcessing = true;
-    updateUIForProcessing(true);
+    updateUIForProcessing(true, statusMessage);
+    hideQuizSection();
     
     try {
         // Добавляем сообщение пользователя в чат (прокрутка вниз)
-        addMessageToChat('user', `Хочу изучить тему: "${message}"`);
+        addMessageToChat('user', `Хочу изучить тему: "${topic}"`);
+        const input = document.getElementById('messageInput');
         input.value = '';
         
         // Сбрасываем высоту textarea
         input.style.height = 'auto';
         
-        // Отправляем запрос на сервер
-        const response = await fetch('/api/learn-topic', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                topic: message
-            })
-        });
-        
-        const data = await response.json();
+        const data = await fetchLesson(topic);
         
         if (data.status === 'success') {
             let explanation = data.explanation;
@@ -61,16 +205,22 @@ async function sendMessage() {
             // Если есть информация об исправлении опечатки, форматируем специально
             if (data.correction_info && data.correction_info.was_corrected) {
                 explanation = formatBotMessageWithCorrection(explanation, data.correction_info);
-                addMessageToChat('bot', explanation, true, true); // true - прокрутить к началу
+                addMessageToChat('bot', explanation, true, true); // true - сообщение уже отформатировано, true - прокрутить к началу
             } else {
                 // Обычное форматирование с прокруткой к началу
                 addMessageToChat('bot', explanation, false, true); // true - прокрутить к началу
             }
+
+            // Вопрос на закрепление (из банка вопросов темы, если он уже накоплен)
+            if (data.quiz) {
+                showQuizSection(data.quiz);
+            }
         } else {
             throw new Error(data.error || 'Неизвестная ошибка');
         }
         
     } catch (error) {
+        if (isAbortError(error)) return;
         console.error('❌ Ошибка отправки сообщения:', error);
         addMessageToChat('bot', '❌ ' + (error.message || 'Произошла ошибка при обработке вашего запроса. Пожалуйста, попробуйте еще раз.'), false, true);
     } finally {
@@ -200,28 +350,65 @@ function autoNumberLists(formattedText) {
     return numberedText;
 }
 
+// Ожидание фонового задания генерации: результат задания или ошибка.
+// onPartial получает частичный результат, пока задание выполняется
+async function waitForJob(jobId, intervalMs = 1000, onPartial = null) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+        const { httpStatus, data: job } = await apiRequest(`/api/jobs/${jobId}`, { scope: 'test' });
+
+        if (job.status === 'running' && job.partial && onPartial) {
+            onPartial(job.partial);
+        }
+        if (job.status === 'done') {
+            return job.result;
+        }
+        if (job.status === 'failed' || httpStatus === 404) {
+            return { status: 'error', error: job.error || 'Задание не найдено' };
+        }
+    }
+}
+
 // Запуск полного теста
 async function startFullTest(topic) {
     if (isProcessing) return;
 
     isProcessing = true;
     updateUIForProcessing(true, `Генерирую тест из 5 вопросов по теме "${topic}"...`);
+    const request = ++fullTestRequest;
+    fullTestComplete = true;
 
     try {
-        const response = await fetch('/api/generate-full-test', {
+        let { data } = await apiRequest('/api/generate-full-test', {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
+            body: {
+                topic: topic,
+                learner_id: getLearnerId(),
+                async: true,
+                progressive: true
             },
-            body: JSON.stringify({
-                topic: topic
-            })
+            scope: 'test'
         });
         
-        const data = await response.json();
+        if (data.status === 'queued') {
+            // Генерация идет в фоновом задании - тест начинается с первого
+            // готового вопроса, остальные дописываются по мере готовности
+            data = await waitForJob(data.job_id, 500, partial => {
+                if (request === fullTestRequest) {
+                    applyPartialTest(partial.test_data);
+                }
+            });
+        }
+        if (request !== fullTestRequest) {
+            // Ученик уже ушел с экрана теста
+            return;
+        }
         
-        if (data.status === 'success') {
+        if (data.status === 'success' && !fullTestComplete) {
+            completeFullTest(data);
+        } else if (data.status === 'success') {
             currentFullTest = data.test_data;
+            currentTestId = data.test_id;
             userTestAnswers = new Array(currentFullTest.questions.length).fill(null);
             currentQuestionIndex = 0;
             
@@ -232,7 +419,12 @@ async function startFullTest(topic) {
         }
         
     } catch (error) {
+        if (isAbortError(error)) return;
         console.error('❌ Ошибка генерации теста:', error);
+        if (!fullTestComplete && request === fullTestRequest) {
+            alert('❌ Не удалось догрузить вопросы теста. Попробуйте еще раз.');
+            goToMainScreen();
+        }
         
     } finally {
         isProcessing = false;
@@ -240,6 +432,78 @@ async function startFullTest(topic) {
     }
 }
 
+// Частичный тест из задания: первый готовый вопрос открывает экран теста
+function applyPartialTest(testData) {
+    if (!testData.questions.length) return;
+
+    if (!currentFullTest) {
+        currentFullTest = testData;
+        currentTestId = null;
+        fullTestComplete = false;
+        userTestAnswers = [];
+        currentQuestionIndex = 0;
+        syncTestAnswers();
+        updateUIForProcessing(false);
+        showFullTestScreen();
+        return;
+    }
+
+    if (testData.questions.length > currentFullTest.questions.length) {
+        currentFullTest.questions = testData.questions;
+        syncTestAnswers();
+        onQuestionsArrived();
+    }
+}
+
+// Готовый тест после частичного: вопросы те же, добавляются недостающие
+function completeFullTest(data) {
+    const shown = currentFullTest.questions;
+    const same = shown.every((question, index) =>
+        data.test_data.questions[index] && data.test_data.questions[index].question === question.question);
+
+    currentFullTest = data.test_data;
+    currentTestId = data.test_id;
+    fullTestComplete = true;
+
+    if (!same) {
+        // Генерация началась заново - показываем итоговый тест с начала
+        waitingForQuestion = false;
+        userTestAnswers = new Array(currentFullTest.questions.length).fill(null);
+        currentQuestionIndex = 0;
+        showFullTestScreen();
+        return;
+    }
+
+    userTestAnswers = userTestAnswers.slice(0, currentFullTest.questions.length);
+    syncTestAnswers();
+    onQuestionsArrived();
+}
+
+function syncTestAnswers() {
+    while (userTestAnswers.length < currentFullTest.questions.length) {
+        userTestAnswers.push(null);
+    }
+}
+
+// Пришли новые вопросы: продолжаем, если ученик ждал следующий
+function onQuestionsArrived() {
+    if (waitingForQuestion && currentQuestionIndex < currentFullTest.questions.length - 1) {
+        waitingForQuestion = false;
+        currentQuestionIndex++;
+        showQuestion(currentQuestionIndex);
+        return;
+    }
+    waitingForQuestion = false;
+    updateProgress(currentQuestionIndex);
+    updateNavigationButtons(currentQuestionIndex);
+}
+
+// Число вопросов теста (пока тест догружается - ожидаемое)
+function testQuestionTotal() {
+    const loaded = currentFullTest.questions.length;
+    return fullTestComplete ? loaded : Math.max(loaded, FULL_TEST_QUESTION_COUNT);
+}
+
 
 
 // Показать экран полного теста
@@ -318,29 +582,39 @@ function updateProgress(index) {
     const progressFill = document.getElementById('progressFill');
     const progressText = document.getElementById('progressText');
     
-    const progress = ((index + 1) / currentFullTest.questions.length) * 100;
+    const progress = ((index + 1) / testQuestionTotal()) * 100;
     progressFill.style.width = `${progress}%`;
-    progressText.textContent = `Вопрос ${index + 1} из ${currentFullTest.questions.length}`; // Будет показывать "из 5"
+    progressText.textContent = `Вопрос ${index + 1} из ${testQuestionTotal()}`; // Будет показывать "из 5"
 }
 
 // Обновление кнопок навигации
 function updateNavigationButtons(index) {
     document.getElementById('prevBtn').disabled = index === 0;
     
-    if (index === currentFullTest.questions.length - 1) {
+    if (index === testQuestionTotal() - 1) {
         document.getElementById('nextBtn').style.display = 'none';
         document.getElementById('submitBtn').style.display = 'block';
+        // Проверка возможна, когда сервер сохранил тест целиком
+        document.getElementById('submitBtn').disabled = !fullTestComplete;
     } else {
         document.getElementById('nextBtn').style.display = 'block';
         document.getElementById('submitBtn').style.display = 'none';
     }
     
     // Проверяем, есть ли ответ на текущий вопрос
-    document.getElementById('nextBtn').disabled = userTestAnswers[index] === null;
+    const nextBtn = document.getElementById('nextBtn');
+    nextBtn.textContent = waitingForQuestion ? 'Вопрос готовится...' : 'Далее →';
+    nextBtn.disabled = userTestAnswers[index] === null || waitingForQuestion;
 }
 
 // Следующий вопрос
 function nextQuestion() {
+    if (currentQuestionIndex === currentFullTest.questions.length - 1 && !fullTestComplete) {
+        // Следующий вопрос еще генерируется - перейдем к нему, когда придет
+        waitingForQuestion = true;
+        updateNavigationButtons(currentQuestionIndex);
+        return;
+    }
     if (currentQuestionIndex < currentFullTest.questions.length - 1) {
         currentQuestionIndex++;
         showQuestion(currentQuestionIndex);
@@ -371,19 +645,15 @@ async function submitFullTest() {
     updateUIForProcessing(true, 'Проверяю ответы...');
 
     try {
-        const response = await fetch('/api/check-full-test', {
+        const { data } = await apiRequest('/api/check-full-test', {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
+            body: {
+                test_id: currentTestId,
+                user_answers: userTestAnswers
             },
-            body: JSON.stringify({
-                user_answers: userTestAnswers,
-                test_data: currentFullTest
-            })
+            scope: 'test'
         });
         
-        const data = await response.json();
-        
         if (data.status === 'success') {
             showResultsScreen(data);
         } else {
@@ -391,6 +661,7 @@ async function submitFullTest() {
         }
         
     } catch (error) {
+        if (isAbortError(error)) return;
         console.error('❌ Ошибка проверки теста:', error);
         alert('❌ Произошла ошибка при проверке теста.');
     } finally {
@@ -495,8 +766,13 @@ function goToMainScreen() {
     // Показываем экран чата
     document.getElementById('chatScreen').classList.add('active');
     
-    // Очищаем данные теста
+    // Очищаем данные теста; догружаемый тест больше не нужен
+    abortRequests('test');
+    fullTestRequest++;
+    fullTestComplete = true;
+    waitingForQuestion = false;
     currentFullTest = null;
+    currentTestId = null;
     userTestAnswers = [];
     currentQuestionIndex = 0;
     
@@ -618,7 +894,7 @@ function showQuizSection(quiz) {
     // Добавляем варианты ответов
     quiz.options.forEach((option, index) => {
         const optionElement = document.createElement('div');
-        optionElement.className = 'quiz-option';
+        optionElement.className = 'question-option quiz-option';
         optionElement.innerHTML = `
             <div class="option-number">${index + 1}</div>
             <div class="option-text">${option}</div>
@@ -627,11 +903,9 @@ function showQuizSection(quiz) {
         quizOptions.appendChild(optionElement);
     });
     
-    // Показываем блок
+    // Показываем блок под объяснением (прокрутка остается у начала объяснения)
+    currentQuiz = quiz;
     quizSection.style.display = 'block';
-    
-    // Прокручиваем к тесту
-    quizSection.scrollIntoView({ behavior: 'smooth' });
 }
 
 // Скрыть блок с тестом
@@ -660,19 +934,14 @@ async function selectQuizAnswer(answerIndex, element) {
     
     // Отправляем ответ на сервер
     try {
-        const response = await fetch('/api/check-answer', {
+        const { data } = await apiRequest('/api/check-answer', {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                answer_index: answerIndex,
-                quiz_data: currentQuiz
-            })
+            body: {
+                quiz_id: currentQuiz.id,
+                answer_index: answerIndex
+            }
         });
         
-        const data = await response.json();
-        
         if (data.status === 'success') {
             // Показываем результат
             showQuizResult(data.result, answerIndex);
@@ -681,6 +950,7 @@ async function selectQuizAnswer(answerIndex, element) {
         }
         
     } catch (error) {
+        if (isAbortError(error)) return;
         console.error('❌ Ошибка проверки ответа:', error);
         addMessageToChat('bot', '❌ Произошла ошибка при проверке ответа.');
     }
@@ -708,7 +978,7 @@ function showQuizResult(result, selectedIndex) {
     
     // Показываем кнопку для продолжения
     const continueButton = document.createElement('button');
-    continueButton.className = 'continue-btn';
+    continueButton.className = 'nav-btn continue-btn';
     continueButton.textContent = 'Изучить следующую тему →';
     continueButton.onclick = () => {
         hideQuizSection();
@@ -811,67 +1081,6 @@ function updateUIForProcessing(processing, message = '') {
     }
 }
 
-// Выбор темы из быстрого доступа
-function selectTopic(topic) {
-    if (isProcessing) return;
-    
-    const input = document.getElementById('messageInput');
-    input.value = topic;
-    
-    // Добавляем сообщение пользователя в чат (прокрутка вниз)
-    addMessageToChat('user', `Хочу изучить тему: "${topic}"`);
-    input.value = '';
-    
-    // Сбрасываем высоту textarea
-    input.style.height = 'auto';
-    
-    // Отправляем запрос на сервер
-    sendTopicRequest(topic);
-}
-
-// Отправка запроса по выбранной теме
-async function sendTopicRequest(topic) {
-    isProcessing = true;
-    updateUIForProcessing(true, `🔍 Ищу информацию по теме "${topic}"...`);
-    
-    try {
-        const response = await fetch('/api/learn-topic', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                topic: topic
-            })
-        });
-        
-        const data = await response.json();
-        
-        if (data.status === 'success') {
-            let explanation = data.explanation;
-            
-            // Если есть информация об исправлении опечатки, форматируем специально
-            if (data.correction_info && data.correction_info.was_corrected) {
-                explanation = formatBotMessageWithCorrection(explanation, data.correction_info);
-                addMessageToChat('bot', explanation, true, true); // true - сообщение уже отформатировано, true - прокрутить к началу
-            } else {
-                // Обычное форматирование с прокруткой к началу
-                addMessageToChat('bot', explanation, false, true); // true - прокрутить к началу
-            }
-        } else {
-            throw new Error(data.error || 'Неизвестная ошибка');
-        }
-        
-    } catch (error) {
-        console.error('❌ Ошибка отправки сообщения:', error);
-        addMessageToChat('bot', '❌ ' + (error.message || 'Произошла ошибка при обработке вашего запроса. Пожалуйста, попробуйте еще раз.'), false, true);
-    } finally {
-        isProcessing = false;
-        updateUIForProcessing(false);
-        focusInput();
-    }
-}
-
 // Отправка по Enter (без Shift)
 document.getElementById('messageInput').addEventListener('keypress', function(event) {
     if (event.key === 'Enter' && !event.shiftKey) {
@@ -905,52 +1114,3 @@ document.getElementById('messageInput').addEventListener('input', function() {
     this.style.height = 'auto';
     this.style.height = (this.scrollHeight) + 'px';
 });
-
-async function sendMessage() {
-    if (isProcessing) return;
-    
-    const input = document.getElementById('messageInput');
-    const message = input.value.trim();
-    
-    if (!message) {
-        alert('Пожалуйста, введите тему для изучения');
-        return;
-    }
-
-    isProcessing = true;
-    updateUIForProcessing(true);
-    
-    try {
-        // Добавляем сообщение пользователя в чат
-        addMessageToChat('user', `Хочу изучить тему: "${message}"`);
-        input.value = '';
-        
-        // Отправляем запрос на сервер
-        const response = await fetch('/api/learn-topic', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                topic: message
-            })
-        });
-        
-        const data = await response.json();
-        
-        if (data.status === 'success') {
-            // Добавляем объяснение помощника
-            addMessageToChat('bot', data.explanation);
-        } else {
-            throw new Error(data.error || 'Неизвестная ошибка');
-        }
-        
-    } catch (error) {
-        console.error('❌ Ошибка отправки сообщения:', error);
-        addMessageToChat('bot', '❌ Произошла ошибка при обработке вашего запроса. Пожалуйста, попробуйте еще раз.');
-    } finally {
-        isProcessing = false;
-        updateUIForProcessing(false);
-        focusInput();
-    }
-}
\ No newline at end of file
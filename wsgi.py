@@ -0,0 +1,7 @@
+"""Точка входа WSGI для продакшена: gunicorn -c gunicorn.conf.py wsgi:app"""
+from app import create_app
+
+# Прогрев кэша (CACHE_WARMUP=1) запускается в каждом воркере хуком
+# post_worker_init из gunicorn.conf.py: при preload_app = True этот модуль
+# импортируется в мастере, и поток прогрева не пережил бы fork
+app = create_app()